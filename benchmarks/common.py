@@ -0,0 +1,89 @@
+""" Общие помощники для бенчмарков.
+Каждый бенчмарк работает с отдельной базой <db_name>_bench на том же сервере PostgreSQL,
+что и приложение (локальный docker из docker-compose.yml), поэтому рабочие данные не затрагиваются.
+"""
+
+import statistics
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Sequence
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.configurations.database import Database
+from src.configurations.settings import get_settings
+from src.models import books, changes, idempotency, jobs, sellers, stats  # noqa F401 - регистрируем модели в metadata
+from src.models.base import BaseModel
+
+# Настройки базы и приложения бенчмарков. Бенчмарки шлют все запросы от одного клиента:
+# лимиты запросов (src/middlewares/rate_limit.py) исказили бы замеры
+BENCH_SETTINGS = get_settings().model_copy(update={"rate_limit_enabled": False})
+
+BENCH_DB_NAME = f"{BENCH_SETTINGS.db_name}_bench"
+
+
+def bench_database_url() -> str:
+    return BENCH_SETTINGS.database_url.rsplit("/", 1)[0] + f"/{BENCH_DB_NAME}"
+
+
+# Создает пустую базу для бенчмарка и удаляет ее по завершении
+@asynccontextmanager
+async def _bench_db(keep: bool) -> AsyncIterator[None]:
+    admin_engine = create_async_engine(BENCH_SETTINGS.database_url, isolation_level="AUTOCOMMIT")
+    async with admin_engine.connect() as connection:
+        await connection.execute(text(f'DROP DATABASE IF EXISTS "{BENCH_DB_NAME}"'))
+        await connection.execute(text(f'CREATE DATABASE "{BENCH_DB_NAME}"'))
+
+    try:
+        yield
+    finally:
+        if not keep:
+            async with admin_engine.connect() as connection:
+                await connection.execute(text(f'DROP DATABASE IF EXISTS "{BENCH_DB_NAME}"'))
+        await admin_engine.dispose()
+
+
+# Пустая база для бенчмарка со схемой из моделей и простой движок к ней
+@asynccontextmanager
+async def bench_engine(keep: bool = False, **engine_kwargs) -> AsyncIterator[AsyncEngine]:
+    async with _bench_db(keep):
+        engine = create_async_engine(bench_database_url(), **engine_kwargs)
+        async with engine.begin() as connection:
+            await connection.run_sync(BaseModel.metadata.create_all)
+
+        try:
+            yield engine
+        finally:
+            await engine.dispose()
+
+
+# То же, но с движками приложения (src/configurations/database.py) для create_app(database=...):
+# ручки получают сессии через обычные зависимости, как в рабочем воркере, а приложение - настройки базы (BENCH_SETTINGS)
+@asynccontextmanager
+async def bench_database(keep: bool = False, **engine_options) -> AsyncIterator[Database]:
+    async with _bench_db(keep), Database(bench_database_url(), settings=BENCH_SETTINGS, **engine_options) as database:
+        await database.create_tables()
+        yield database
+
+
+# Перцентили задержки в миллисекундах по списку замеров в секундах
+def latency_summary(samples: Sequence[float]) -> dict:
+    ms = sorted(sample * 1000 for sample in samples)
+    if not ms:
+        return {"count": 0}
+
+    quantiles = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def write_results(path: str, results: dict) -> None:
+    with open(path, "wb") as file:
+        file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
@@ -0,0 +1,129 @@
+""" Бенчмарк сжатия и форматов больших ответов: байты на проводе и CPU на один ответ.
+
+Страницы книг и продавцов строятся тем же кодом, что и в ручках get_all_books и get_all_sellers,
+на данных из отдельной базы, затем каждое тело прогоняется через CompressionMiddleware с разными кодировками
+и уровнями сжатия. Для каждого сочетания записываются:
+    wire_bytes     - размер тела, которое уходит клиенту;
+    ratio          - во сколько раз тело меньше несжатого JSON;
+    cpu_ms         - CPU процесса на сжатие одного ответа (time.process_time, минимум по раундам);
+    encode_cpu_ms  - CPU на кодирование страницы в JSON или MessagePack (без БД).
+brotli, zstandard и msgpack необязательны: их варианты пропускаются, если пакеты не установлены.
+
+Запуск из корня проекта:
+    python -m benchmarks.compression --rows 1000 --rounds 20 --output compression.json
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import bench_engine, write_results
+from benchmarks.serialization import seed
+from src.configurations.settings import Settings, get_settings
+from src.middlewares.compression import ENCODERS, CompressionMiddleware
+from src.routers.v1.books import _load_books_page
+from src.routers.v1.sellers import _load_sellers_page
+from src.services.serialization import MSGPACK_MEDIA_TYPE, msgpack, page_response
+
+# Кодировка, настройка уровня и проверяемые уровни
+LEVELS = {
+    "identity": (None, [None]),
+    "gzip": ("compression_gzip_level", [1, 3, 5, 9]),
+    "br": ("compression_brotli_quality", [1, 4, 11]),
+    "zstd": ("compression_zstd_level", [1, 3, 9]),
+}
+
+
+def min_cpu_ms(operation, rounds: int) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(rounds):
+        started = time.process_time()
+        result = operation()
+        best = min(best, time.process_time() - started)
+    return round(best * 1000, 3), result
+
+
+async def wire_bytes(body: bytes, media_type: str, encoding: str, settings: Settings) -> bytes:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", media_type.encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    sent = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.body":
+            sent.append(message["body"])
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+    await CompressionMiddleware(app, settings, minimum_size=0, encodings=(encoding,))(scope, None, send)
+    return b"".join(sent)
+
+
+async def measure(body: bytes, media_type: str, rounds: int, json_size: int) -> dict:
+    results = {}
+    for encoding, (setting, levels) in LEVELS.items():
+        if encoding != "identity" and encoding not in ENCODERS:
+            continue
+        for level in levels:
+            settings = get_settings().model_copy(update={setting: level} if setting else {})
+            label = encoding if level is None else f"{encoding}-{level}"
+
+            best = float("inf")
+            for _ in range(rounds):
+                started = time.process_time()
+                wire = body if encoding == "identity" else await wire_bytes(body, media_type, encoding, settings)
+                best = min(best, time.process_time() - started)
+
+            results[label] = {
+                "wire_bytes": len(wire),
+                "ratio": round(json_size / len(wire), 2),
+                "cpu_ms": round(best * 1000, 3),
+            }
+            print(f"  {label:<12} bytes={len(wire):>10} ratio={json_size / len(wire):>6.2f} cpu={best * 1000:>8.3f}ms")
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {"benchmark": "compression", "rows": args.rows, "rounds": args.rounds, "pages": {}}
+    formats = {"json": None}
+    if msgpack is not None:
+        formats["msgpack"] = MSGPACK_MEDIA_TYPE
+
+    async with bench_engine() as engine:
+        await seed(engine, args.rows)
+        async with async_sessionmaker(engine)() as session:
+            pages = {
+                "books_page": (await _load_books_page(session, args.rows, None, None, None, None, None))[1],
+                "sellers_page": (await _load_sellers_page(session, args.rows, None))[1],
+            }
+
+    for page, content in pages.items():
+        results["pages"][page] = {}
+        json_size = len(page_response(content, '"etag"', None).body)
+        for fmt, accept in formats.items():
+            encode_cpu_ms, response = min_cpu_ms(lambda: page_response(content, '"etag"', accept), args.rounds)
+            print(f"{page} {fmt}: encode cpu={encode_cpu_ms:.3f}ms")
+            results["pages"][page][fmt] = {
+                "encode_cpu_ms": encode_cpu_ms,
+                "encodings": await measure(response.body, response.media_type, args.rounds, json_size),
+            }
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response compression and MessagePack: wire bytes and CPU per response")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per page")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
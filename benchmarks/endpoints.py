@@ -0,0 +1,381 @@
+""" Нагрузочный бенчмарк всех ручек books_router и sellers_router.
+
+Наполняет отдельную базу (<db_name>_bench) через модели приложения, затем гоняет каждую ручку
+с фиксированной конкурентностью прямо через ASGI-приложение (без сети) и считает для каждой ручки
+p50/p95/p99, пропускную способность и число SQL-запросов на один HTTP-запрос.
+Результаты пишутся в JSON, чтобы сравнивать их между коммитами.
+
+Запуск из корня проекта (нужен локальный PostgreSQL из docker-compose.yml):
+    python -m benchmarks.endpoints --sellers 10000 --books 1000000 --concurrency 32 --output before.json
+    python -m benchmarks.endpoints ... --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import datetime
+import itertools
+import random
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import httpx
+import orjson
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from benchmarks.common import bench_database, latency_summary, write_results
+from src.main import create_app
+from src.models.books import Book
+from src.models.jobs import Job
+from src.models.sellers import Seller
+from src.routers.v1.books import books_router
+from src.routers.v1.jobs import jobs_router
+from src.routers.v1.sellers import sellers_router
+from src.routers.v1.stats import stats_router
+from src.services.bulk import bulk_insert_books
+from src.services.cache import NullCache
+from src.services.passwords import hash_password
+from src.services.stats import refresh_global_stats
+
+SEED_BATCH_SIZE = 10_000
+SELLER_PASSWORD = "secret"
+BULK_BATCH_SIZE = 100
+JOBS_COUNT = 100
+
+# Счетчик SQL-запросов текущего HTTP-запроса. Каждый рабочий таск выставляет свой.
+_query_counter: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("query_counter", default=None)
+
+
+@dataclass
+class BenchContext:
+    rng: random.Random
+    seller_ids: list[int]
+    book_ids: list[int]
+    # Отдельные пулы для удаления, чтобы удаления не мешали остальным ручкам
+    deletable_book_ids: list[int]
+    deletable_seller_ids: list[int]
+    job_ids: list[int]
+    counter: itertools.count = field(default_factory=itertools.count)
+
+    def seller_id(self) -> int:
+        return self.rng.choice(self.seller_ids)
+
+    def book_id(self) -> int:
+        return self.rng.choice(self.book_ids)
+
+    def job_id(self) -> int:
+        return self.rng.choice(self.job_ids)
+
+    def new_book(self) -> dict:
+        return {
+            "title": f"Bench {next(self.counter)}",
+            "author": "Bench Author",
+            "count_pages": 300,
+            "year": 2024,
+            "seller_id": self.seller_id(),
+        }
+
+
+@dataclass
+class Scenario:
+    make_request: Callable[[BenchContext], tuple[str, str, dict]]
+    # Тяжелые ручки (выгрузка всего каталога) гоняются меньшее число раз
+    requests_factor: float = 1.0
+
+
+# Сценарий для каждой ручки: ключ - (метод, путь из роутера). Если в роутере появилась ручка
+# без сценария, бенчмарк падает - так он всегда покрывает все ручки.
+SCENARIOS: dict[tuple[str, str], Scenario] = {
+    ("POST", "/books/"): Scenario(lambda ctx: ("POST", "/api/v1/books/", {"json": ctx.new_book()})),
+    ("POST", "/books/bulk"): Scenario(
+        lambda ctx: ("POST", "/api/v1/books/bulk", {"json": [ctx.new_book() for _ in range(BULK_BATCH_SIZE)]})
+    ),
+    ("PUT", "/books/bulk"): Scenario(
+        lambda ctx: (
+            "PUT",
+            "/api/v1/books/bulk",
+            {
+                "json": [
+                    {"id": book_id, "title": "Bulk", "author": "Bench", "year": 2025, "pages": 10}
+                    for book_id in ctx.rng.sample(ctx.book_ids, BULK_BATCH_SIZE)
+                ],
+                "params": {"mode": "best_effort"},
+            },
+        )
+    ),
+    ("DELETE", "/books/bulk"): Scenario(
+        lambda ctx: (
+            "DELETE",
+            "/api/v1/books/bulk",
+            {"json": [ctx.deletable_book_ids.pop() for _ in range(BULK_BATCH_SIZE)], "params": {"mode": "best_effort"}},
+        ),
+        requests_factor=0.05,
+    ),
+    ("GET", "/books/"): Scenario(
+        lambda ctx: ("GET", "/api/v1/books/", {"params": {"limit": 100, "seller_id": ctx.seller_id()}})
+    ),
+    ("GET", "/books/export"): Scenario(
+        lambda ctx: ("GET", "/api/v1/books/export", {"params": {"format": "ndjson"}}),
+        requests_factor=0.01,
+    ),
+    ("GET", "/books/search"): Scenario(
+        lambda ctx: ("GET", "/api/v1/books/search", {"params": {"q": f"bench {ctx.rng.randint(1, 999)}"}})
+    ),
+    # Лента изменений с начала: при наполнении базы триггеры записали изменение на каждую книгу и продавца
+    ("GET", "/books/changes"): Scenario(lambda ctx: ("GET", "/api/v1/books/changes", {"params": {"limit": 100}})),
+    ("GET", "/books/{book_id}"): Scenario(lambda ctx: ("GET", f"/api/v1/books/{ctx.book_id()}", {})),
+    ("PUT", "/books/{book_id}"): Scenario(
+        lambda ctx: (
+            "PUT",
+            f"/api/v1/books/{ctx.book_id()}",
+            {"json": {"title": "Updated", "author": "Bench", "year": 2025, "pages": 42}},
+        )
+    ),
+    ("DELETE", "/books/{book_id}"): Scenario(
+        lambda ctx: ("DELETE", f"/api/v1/books/{ctx.deletable_book_ids.pop()}", {})
+    ),
+    ("POST", "/seller/"): Scenario(
+        lambda ctx: (
+            "POST",
+            "/api/v1/seller/",
+            {
+                "json": {
+                    "first_name": "Bench",
+                    "last_name": "Seller",
+                    "e_mail": f"new{next(ctx.counter)}@bench.example.com",
+                    "password": "secret",
+                }
+            },
+        )
+    ),
+    ("POST", "/seller/login"): Scenario(
+        lambda ctx: (
+            "POST",
+            "/api/v1/seller/login",
+            {"json": {"e_mail": f"seller{ctx.rng.randrange(len(ctx.seller_ids))}@bench.example.com", "password": SELLER_PASSWORD}},
+        )
+    ),
+    ("GET", "/seller/"): Scenario(lambda ctx: ("GET", "/api/v1/seller/", {"params": {"limit": 100}})),
+    ("GET", "/seller/changes"): Scenario(lambda ctx: ("GET", "/api/v1/seller/changes", {"params": {"limit": 100}})),
+    ("GET", "/seller/{seller_id}"): Scenario(lambda ctx: ("GET", f"/api/v1/seller/{ctx.seller_id()}", {})),
+    ("GET", "/seller/{seller_id}/books"): Scenario(lambda ctx: ("GET", f"/api/v1/seller/{ctx.seller_id()}/books", {})),
+    ("GET", "/seller/{seller_id}/books/export"): Scenario(
+        lambda ctx: ("GET", f"/api/v1/seller/{ctx.seller_id()}/books/export", {})
+    ),
+    ("GET", "/seller/{seller_id}/stats"): Scenario(lambda ctx: ("GET", f"/api/v1/seller/{ctx.seller_id()}/stats", {})),
+    ("PUT", "/seller/{seller_id}"): Scenario(
+        lambda ctx: (
+            "PUT",
+            f"/api/v1/seller/{ctx.seller_id()}",
+            {"json": {"first_name": "Updated", "last_name": "Seller", "e_mail": f"upd{next(ctx.counter)}@bench.example.com"}},
+        )
+    ),
+    ("DELETE", "/seller/{seller_id}"): Scenario(
+        lambda ctx: ("DELETE", f"/api/v1/seller/{ctx.deletable_seller_ids.pop()}", {}),
+        requests_factor=0.1,
+    ),
+    ("GET", "/stats"): Scenario(lambda ctx: ("GET", "/api/v1/stats", {})),
+    # Ручка только ставит задачу в очередь (воркеры задач в бенчмарке не запускаются)
+    ("POST", "/stats/rebuild"): Scenario(
+        lambda ctx: ("POST", "/api/v1/stats/rebuild", {"params": {"seller_id": ctx.seller_id()}}),
+        requests_factor=0.1,
+    ),
+    ("GET", "/jobs/{job_id}"): Scenario(lambda ctx: ("GET", f"/api/v1/jobs/{ctx.job_id()}", {})),
+}
+
+
+def collect_routes() -> list[tuple[str, str]]:
+    routes = []
+    for router in (books_router, sellers_router, stats_router, jobs_router):
+        for route in router.routes:
+            routes.extend((method, route.path) for method in sorted(route.methods))
+
+    missing = [route for route in routes if route not in SCENARIOS]
+    if missing:
+        raise RuntimeError(f"No benchmark scenario for routes: {missing}")
+    return routes
+
+
+async def seed(engine: AsyncEngine, sellers_count: int, books_count: int, rng: random.Random) -> BenchContext:
+    session_factory = async_sessionmaker(engine)
+    # Один хэш на всех продавцов: логин проверяет настоящий хэш, а наполнение не тратит время на CPU
+    password_hash = await hash_password(SELLER_PASSWORD)
+    async with session_factory() as session:
+        for start in range(0, sellers_count, SEED_BATCH_SIZE):
+            rows = [
+                {"first_name": "Seller", "last_name": str(i), "e_mail": f"seller{i}@bench.example.com", "password": password_hash}
+                for i in range(start, min(start + SEED_BATCH_SIZE, sellers_count))
+            ]
+            await session.execute(insert(Seller), rows)
+        seller_ids = (await session.execute(select(Seller.id).order_by(Seller.id))).scalars().all()
+
+        book_ids = []
+        for start in range(0, books_count, SEED_BATCH_SIZE):
+            rows = [
+                {
+                    "title": f"Bench {i}",
+                    "author": f"Author {rng.randint(1, 1000)}",
+                    "year": rng.randint(2020, 2025),
+                    "pages": rng.randint(50, 1000),
+                    "seller_id": rng.choice(seller_ids),
+                }
+                for i in range(start, min(start + SEED_BATCH_SIZE, books_count))
+            ]
+            book_ids.extend(await bulk_insert_books(session, rows))
+
+        # Сводка общей статистики (в приложении ее пересчитывает фоновая задача)
+        await refresh_global_stats(session)
+
+        # Завершенные задачи для ручки статуса задачи
+        jobs = [{"kind": "rebuild_stats", "status": "succeeded", "attempts": 1, "max_attempts": 1}] * JOBS_COUNT
+        job_ids = (await session.execute(insert(Job).returning(Job.id), jobs)).scalars().all()
+        await session.commit()
+
+    # Последние 10% книг и продавцов отдаем ручкам удаления
+    deletable_books = max(len(book_ids) // 10, 1)
+    deletable_sellers = max(len(seller_ids) // 10, 1)
+    return BenchContext(
+        rng=rng,
+        seller_ids=list(seller_ids[:-deletable_sellers]),
+        book_ids=book_ids[:-deletable_books],
+        deletable_book_ids=book_ids[-deletable_books:],
+        deletable_seller_ids=list(seller_ids[-deletable_sellers:]),
+        job_ids=list(job_ids),
+    )
+
+
+# Ручки работают с базой бенчмарка через обычные зависимости сессий (app.state.database),
+# SQL-запросы считаются по ее движку
+def count_queries(engine: AsyncEngine) -> None:
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count_query(*args):
+        if (counter := _query_counter.get()) is not None:
+            counter[0] += 1
+
+
+async def bench_route(
+    client: httpx.AsyncClient, ctx: BenchContext, scenario: Scenario, requests_count: int, concurrency: int
+) -> dict:
+    total = max(int(requests_count * scenario.requests_factor), 1)
+    remaining = iter(range(total))
+    samples, query_counts, statuses = [], [], {}
+
+    async def worker():
+        counter = [0]
+        _query_counter.set(counter)
+        for _ in remaining:
+            try:
+                method, url, kwargs = scenario.make_request(ctx)
+            except IndexError:  # закончились записи для удаления
+                return
+            counter[0] = 0
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+            samples.append(time.perf_counter() - started)
+            query_counts.append(counter[0])
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+
+    if not samples:
+        return {"count": 0, "statuses": {}}
+
+    return {
+        **latency_summary(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "queries_per_request": round(sum(query_counts) / len(query_counts), 2),
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results: dict, baseline_path: str) -> None:
+    with open(baseline_path, "rb") as file:
+        baseline = orjson.loads(file.read())
+
+    print(f"\nComparison with {baseline_path} ({baseline['meta'].get('revision')}):")
+    for name, current in results["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if not previous or not previous["count"] or not current["count"]:
+            continue
+        change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0
+        print(f"  {name:<45} p95 {previous['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} ms ({change:+.1f}%)")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    routes = collect_routes()
+    rng = random.Random(args.seed)
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "sellers": args.sellers,
+            "books": args.books,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "with_cache": args.with_cache,
+        },
+        "endpoints": {},
+    }
+
+    pool_size = max(args.concurrency, 5)
+    async with bench_database(keep=args.keep, pool_size=pool_size, max_overflow=0) as database:
+        print(f"Seeding {args.sellers} sellers and {args.books} books...")
+        ctx = await seed(database.engine, args.sellers, args.books, rng)
+        # Без --with-cache у приложения пустой кэш, чтобы замерялась работа с БД
+        app = create_app(database=database, cache=None if args.with_cache else NullCache())
+        count_queries(database.engine)
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for method, path in routes:
+                name = f"{method} {path}"
+                summary = await bench_route(client, ctx, SCENARIOS[(method, path)], args.requests, args.concurrency)
+                results["endpoints"][name] = summary
+                if not summary["count"]:
+                    print(f"{name:<45} skipped: no test data left")
+                    continue
+                print(
+                    f"{name:<45} p50={summary['p50_ms']:>8.2f}ms p95={summary['p95_ms']:>8.2f}ms "
+                    f"p99={summary['p99_ms']:>8.2f}ms rps={summary['throughput_rps']:>8.1f} "
+                    f"queries={summary['queries_per_request']} errors={summary['errors']}"
+                )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency benchmark for all v1 endpoints")
+    parser.add_argument("--sellers", type=int, default=10_000)
+    parser.add_argument("--books", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--with-cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--keep", action="store_true", help="Do not drop the benchmark database afterwards")
+    parser.add_argument("--output", help="Path to write JSON results")
+    parser.add_argument("--compare", help="Previous JSON results to compare p95 against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, results)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
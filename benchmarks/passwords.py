@@ -0,0 +1,129 @@
+""" Бенчмарк хэширования паролей: пропускная способность регистраций и влияние наплыва логинов на чтение.
+
+1. Регистрация: POST /api/v1/seller/ с заданной конкурентностью - сколько регистраций в секунду
+   выдерживает процесс при текущих параметрах scrypt и размере пула хэширования.
+2. Наплыв логинов: задержка GET /api/v1/seller/{id} сначала без нагрузки, затем одновременно
+   с потоком POST /api/v1/seller/login. Если хэширование блокирует цикл событий, p95 чтения
+   вырастет на время хэша; с пулом потоков оно почти не должно меняться.
+
+Запуск из корня проекта:
+    python -m benchmarks.passwords --signups 500 --logins 500 --concurrency 32 --output passwords.json
+    PASSWORD_HASH_WORKERS=4 PASSWORD_SCRYPT_N=32768 python -m benchmarks.passwords ...
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+
+import httpx
+from sqlalchemy import insert, select
+
+from benchmarks.common import BENCH_SETTINGS, bench_database, latency_summary, write_results
+from src.main import create_app
+from src.models.sellers import Seller
+from src.services.cache import NullCache
+from src.services.passwords import hash_password
+
+SELLERS_COUNT = 1000
+PASSWORD = "secret"
+
+
+async def timed_requests(client: httpx.AsyncClient, make_request, total: int, concurrency: int) -> dict:
+    remaining = iter(range(total))
+    samples, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = make_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            samples.append(time.perf_counter() - started)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - started
+    return {**latency_summary(samples), "throughput_rps": round(len(samples) / elapsed, 2), "errors": errors}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    counter = itertools.count()
+    settings = BENCH_SETTINGS
+    results = {
+        "benchmark": "passwords",
+        "meta": {
+            "concurrency": args.concurrency,
+            "password_hash_workers": settings.password_hash_workers,
+            "scrypt": {"n": settings.password_scrypt_n, "r": settings.password_scrypt_r, "p": settings.password_scrypt_p},
+        },
+    }
+
+    async with bench_database(pool_size=args.concurrency * 2, max_overflow=0) as database:
+        password_hash = await hash_password(PASSWORD, settings=settings)
+        async with database.session_factory() as session:
+            await session.execute(
+                insert(Seller),
+                [
+                    {"first_name": "Seller", "last_name": str(i), "e_mail": f"seller{i}@bench.example.com", "password": password_hash}
+                    for i in range(SELLERS_COUNT)
+                ],
+            )
+            seller_ids = (await session.execute(select(Seller.id))).scalars().all()
+            await session.commit()
+
+        app = create_app(database=database, cache=NullCache())
+
+        def signup():
+            e_mail = f"new{next(counter)}@bench.example.com"
+            return "POST", "/api/v1/seller/", {"json": {"first_name": "New", "last_name": "Seller", "e_mail": e_mail, "password": PASSWORD}}
+
+        def login():
+            e_mail = f"seller{rng.randrange(SELLERS_COUNT)}@bench.example.com"
+            return "POST", "/api/v1/seller/login", {"json": {"e_mail": e_mail, "password": PASSWORD}}
+
+        def read():
+            return "GET", f"/api/v1/seller/{rng.choice(seller_ids)}", {}
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            results["signup"] = await timed_requests(client, signup, args.signups, args.concurrency)
+            results["read_idle"] = await timed_requests(client, read, args.reads, args.concurrency)
+
+            # Чтения идут одновременно с наплывом логинов, каждому потоку - половина конкурентности
+            storm, reads = await asyncio.gather(
+                timed_requests(client, login, args.logins, args.concurrency),
+                timed_requests(client, read, args.reads, max(args.concurrency // 2, 1)),
+            )
+            results["login_storm"] = storm
+            results["read_during_storm"] = reads
+
+    for name in ("signup", "read_idle", "login_storm", "read_during_storm"):
+        summary = results[name]
+        print(
+            f"{name:<18} p50={summary['p50_ms']:>8.2f}ms p95={summary['p95_ms']:>8.2f}ms "
+            f"p99={summary['p99_ms']:>8.2f}ms rps={summary['throughput_rps']:>8.1f} errors={summary['errors']}"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Password hashing benchmark: signups and login storm")
+    parser.add_argument("--signups", type=int, default=500)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=2000, help="Seller reads per phase")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
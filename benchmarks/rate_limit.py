@@ -0,0 +1,100 @@
+""" Бенчмарк накладных расходов лимитера запросов (src/middlewares/rate_limit.py) на один запрос.
+
+Запросы подаются прямо в ASGI-интерфейс пустого приложения, которое сразу отвечает 200, -
+без сети, ручек и БД. Сравниваются:
+    baseline - приложение без лимитера;
+    memory   - RateLimitMiddleware с ведрами в памяти процесса;
+    redis    - RateLimitMiddleware с ведрами в Redis (если указан --redis-url).
+Лимиты выставлены так, чтобы ни один запрос не был отклонен: замеряется стоимость проверки,
+а не отказов. Клиенты (IP-адреса) и классы ручек чередуются, чтобы работали разные ведра.
+
+Запуск из корня проекта:
+    python -m benchmarks.rate_limit --requests 100000 --clients 1000 --output rate_limit.json
+    python -m benchmarks.rate_limit ... --redis-url redis://127.0.0.1:6379/15
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+from typing import Optional
+
+from benchmarks.common import latency_summary, write_results
+from src.configurations.settings import get_settings
+from src.middlewares.rate_limit import RateLimitMiddleware
+from src.services.rate_limit import InMemoryRateLimiter, RateLimiter, RateLimitRule, RedisRateLimiter
+
+PATHS = [("GET", "/api/v1/books/1"), ("GET", "/api/v1/books/"), ("POST", "/api/v1/books/")]
+
+# Лимиты, которые бенчмарк заведомо не превысит
+RULES = {route_class: RateLimitRule(rate=1e9, burst=10**9) for route_class in ("read", "list", "write")}
+
+
+async def empty_app(scope, receive, send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run_scenario(app, requests: int, clients: int) -> dict:
+    statuses = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    scopes = [
+        {"type": "http", "method": method, "path": path, "headers": [], "client": (f"10.0.{i // 256}.{i % 256}", 1234)}
+        for i in range(clients)
+        for method, path in PATHS
+    ]
+    samples = []
+    for scope in itertools.islice(itertools.cycle(scopes), requests):
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        samples.append(time.perf_counter() - started)
+
+    assert all(status == 200 for status in statuses), "Benchmark requests must not be rate limited"
+    return {**latency_summary(samples), "mean_us": round(sum(samples) / len(samples) * 1e6, 3)}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    limiters: dict[str, Optional[RateLimiter]] = {"baseline": None, "memory": InMemoryRateLimiter()}
+    if args.redis_url:
+        limiters["redis"] = RedisRateLimiter.from_url(args.redis_url)
+
+    results = {"requests": args.requests, "clients": args.clients, "scenarios": {}}
+    for name, limiter in limiters.items():
+        app = empty_app if limiter is None else RateLimitMiddleware(empty_app, get_settings(), limiter=limiter, rules=RULES)
+        await run_scenario(app, min(args.requests, 1000), args.clients)  # Прогрев
+        results["scenarios"][name] = await run_scenario(app, args.requests, args.clients)
+
+    baseline = results["scenarios"]["baseline"]["mean_us"]
+    for name, scenario in results["scenarios"].items():
+        scenario["overhead_us"] = round(scenario["mean_us"] - baseline, 3)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rate limiter per-request overhead benchmark")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--clients", type=int, default=1000, help="Distinct client IPs")
+    parser.add_argument("--redis-url", help="Also measure the Redis backend")
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for name, scenario in results["scenarios"].items():
+        print(
+            f"{name:10} mean={scenario['mean_us']:8.2f}us  p99={scenario['p99_ms'] * 1000:8.2f}us  "
+            f"overhead={scenario['overhead_us']:8.2f}us"
+        )
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
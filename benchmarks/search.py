@@ -0,0 +1,109 @@
+""" Бенчмарк полнотекстового поиска: задержка GET /api/v1/books/search в зависимости от размера каталога.
+Выполняет тот же SQL, что и ручка (src/services/search.py), напрямую через движок.
+
+Запуск из корня проекта:
+    python -m benchmarks.search --sizes 10000 100000 1000000 --queries 200 --output search.json
+"""
+
+import argparse
+import asyncio
+import random
+import string
+import time
+
+from sqlalchemy import Integer, String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from benchmarks.common import bench_engine, latency_summary, write_results
+from src.services.search import book_search_query
+
+VOCABULARY_SIZE = 5000
+SELLERS_COUNT = 100
+
+# Каталог наращивается прямо в базе через generate_series: название и автор из двух случайных слов словаря
+SEED_BOOKS_SQL = text(
+    """
+    INSERT INTO books_table (title, author, year, pages, seller_id)
+    SELECT
+        words[1 + floor(random() * cardinality(words))::int] || ' ' || words[1 + floor(random() * cardinality(words))::int],
+        words[1 + floor(random() * cardinality(words))::int] || ' ' || words[1 + floor(random() * cardinality(words))::int],
+        2020 + floor(random() * 6)::int,
+        50 + floor(random() * 950)::int,
+        seller_ids[1 + floor(random() * cardinality(seller_ids))::int]
+    FROM generate_series(1, :count), (SELECT :words AS words, :seller_ids AS seller_ids) AS params
+    """
+).bindparams(bindparam("words", type_=ARRAY(String)), bindparam("seller_ids", type_=ARRAY(Integer)))
+
+
+def make_vocabulary(rng: random.Random) -> list[str]:
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(VOCABULARY_SIZE)]
+
+
+def make_search_text(rng: random.Random, vocabulary: list[str]) -> str:
+    # Как при автодополнении: одно-два слова, последнее введено не до конца
+    words = rng.sample(vocabulary, rng.randint(1, 2))
+    words[-1] = words[-1][: rng.randint(2, len(words[-1]))]
+    return " ".join(words)
+
+
+async def run(sizes: list[int], queries: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    results = {"benchmark": "search", "queries_per_size": queries, "sizes": []}
+
+    async with bench_engine() as engine:
+        async with engine.begin() as connection:
+            seller_ids = (
+                await connection.execute(
+                    text(
+                        "INSERT INTO sellers_table (first_name, last_name, e_mail, password) "
+                        "SELECT 'Seller', 'Bench', 'seller' || i || '@bench.example.com', 'secret' "
+                        "FROM generate_series(1, :count) AS i RETURNING id"
+                    ),
+                    {"count": SELLERS_COUNT},
+                )
+            ).scalars().all()
+
+        current_size = 0
+        for size in sorted(sizes):
+            async with engine.begin() as connection:
+                await connection.execute(
+                    SEED_BOOKS_SQL, {"count": size - current_size, "words": vocabulary, "seller_ids": list(seller_ids)}
+                )
+                await connection.execute(text("ANALYZE books_table"))
+            current_size = size
+
+            samples, matched = [], 0
+            async with engine.connect() as connection:
+                for _ in range(queries):
+                    query = book_search_query(make_search_text(rng, vocabulary), limit=20)
+                    started = time.perf_counter()
+                    rows = (await connection.execute(query)).all()
+                    samples.append(time.perf_counter() - started)
+                    matched += len(rows)
+
+            summary = {"catalog_size": size, "avg_rows": round(matched / queries, 2), **latency_summary(samples)}
+            results["sizes"].append(summary)
+            print(
+                f"{size:>10} books: p50={summary['p50_ms']:.2f}ms p95={summary['p95_ms']:.2f}ms "
+                f"p99={summary['p99_ms']:.2f}ms avg_rows={summary['avg_rows']}"
+            )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search latency vs catalog size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes, args.queries, args.seed))
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
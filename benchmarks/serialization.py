@@ -0,0 +1,142 @@
+""" Бенчмарк сериализации больших ответов: CPU на 10 тысяч строк до и после быстрого пути.
+
+Для списка книг, списка продавцов и страницы книг продавца сравниваются два пути
+на одних и тех же данных:
+    pydantic  - как было раньше: ORM-объекты -> response_model (from_attributes) -> dict -> orjson,
+                то есть то, что делает FastAPI для ORJSONResponse с response_model;
+    orjson    - текущие ручки из src/routers/v1: выбор колонок Core-запросом и orjson.dumps
+                списка словарей (src/services/serialization.py).
+CPU считается по time.process_time() процесса приложения: загрузка строк драйвером, построение
+объектов и сериализация. Время самого PostgreSQL в другом процессе сюда не входит.
+
+Запуск из корня проекта:
+    python -m benchmarks.serialization --rows 10000 --rounds 20 --output serialization.json
+"""
+
+import argparse
+import asyncio
+import time
+
+import orjson
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from benchmarks.common import bench_engine, latency_summary, write_results
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.routers.v1.books import get_all_books
+from src.routers.v1.sellers import get_all_sellers, get_seller_books
+from src.schemas.books import ReturnedAllbooks
+from src.schemas.sellers import ReturnedAllSellers, ReturnedSellerBooks
+
+# Старый путь: ORM-объекты и проверка/сериализация через response_model
+async def pydantic_books(session, rows: int, _seller_id: int) -> bytes:
+    books = (await session.execute(select(Book).order_by(Book.id).limit(rows))).scalars().all()
+    return orjson.dumps(ReturnedAllbooks.model_validate({"books": books, "next_cursor": None}).model_dump(mode="json"))
+
+
+async def pydantic_sellers(session, rows: int, _seller_id: int) -> bytes:
+    sellers = (await session.execute(select(Seller).order_by(Seller.id).limit(rows))).scalars().all()
+    return orjson.dumps(ReturnedAllSellers.model_validate({"sellers": sellers, "next_cursor": None}).model_dump(mode="json"))
+
+
+async def pydantic_seller_books(session, rows: int, seller_id: int) -> bytes:
+    books = (await session.execute(select(Book).where(Book.seller_id == seller_id).order_by(Book.id).limit(rows))).scalars().all()
+    return ReturnedSellerBooks.model_validate({"books": books, "next_cursor": None}).model_dump_json().encode()
+
+
+# Новый путь: сами ручки. limit передается напрямую, минуя ограничение page_size_max из Query
+async def orjson_books(session, rows: int, _seller_id: int) -> bytes:
+    response = await get_all_books(
+        session, if_none_match=None, limit=rows, cursor=None, author=None, year_from=None, year_to=None, seller_id=None
+    )
+    return response.body
+
+
+async def orjson_sellers(session, rows: int, _seller_id: int) -> bytes:
+    return (await get_all_sellers(session, if_none_match=None, limit=rows, cursor=None)).body
+
+
+async def orjson_seller_books(session, rows: int, seller_id: int) -> bytes:
+    return (await get_seller_books(seller_id, session, if_none_match=None, limit=rows, cursor=None)).body
+
+
+PATHS = {
+    "books_page": (pydantic_books, orjson_books),
+    "sellers_page": (pydantic_sellers, orjson_sellers),
+    "seller_books": (pydantic_seller_books, orjson_seller_books),
+}
+
+
+# Один продавец со всеми книгами (для страницы его книг) и столько же продавцов без книг (для списка продавцов)
+async def seed(engine: AsyncEngine, rows: int) -> int:
+    async with engine.begin() as connection:
+        sellers = [
+            {"first_name": "Seller", "last_name": str(i), "e_mail": f"seller{i}@bench.example.com", "password": "x"}
+            for i in range(rows)
+        ]
+        seller_id = (await connection.execute(insert(Seller).returning(Seller.id), sellers)).scalars().first()
+        await connection.execute(
+            text(
+                "INSERT INTO books_table (title, author, year, pages, seller_id) "
+                "SELECT 'Bench ' || i, 'Author', 2024, 100, :seller_id FROM generate_series(1, :rows) AS i"
+            ),
+            {"seller_id": seller_id, "rows": rows},
+        )
+        await connection.execute(text("ANALYZE sellers_table, books_table"))
+    return seller_id
+
+
+async def measure(engine: AsyncEngine, operation, rows: int, rounds: int, seller_id: int) -> dict:
+    session_factory = async_sessionmaker(engine)
+    cpu, samples, size = [], [], 0
+
+    for _ in range(rounds):
+        # Каждый раунд - новая сессия, как у отдельного запроса
+        async with session_factory() as session:
+            cpu_started, started = time.process_time(), time.perf_counter()
+            size = len(await operation(session, rows, seller_id))
+            samples.append(time.perf_counter() - started)
+            cpu.append(time.process_time() - cpu_started)
+
+    return {
+        **latency_summary(samples),
+        "cpu_ms_per_10k_rows": round(min(cpu) * 1000 * 10_000 / rows, 2),
+        "cpu_ms_per_10k_rows_mean": round(sum(cpu) / len(cpu) * 1000 * 10_000 / rows, 2),
+        "response_bytes": size,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {"benchmark": "serialization", "rows": args.rows, "rounds": args.rounds, "paths": {}}
+
+    async with bench_engine() as engine:
+        seller_id = await seed(engine, args.rows)
+        for name, paths in PATHS.items():
+            results["paths"][name] = {}
+            for label, operation in zip(("pydantic", "orjson"), paths):
+                await measure(engine, operation, args.rows, 2, seller_id)  # прогрев
+                summary = await measure(engine, operation, args.rows, args.rounds, seller_id)
+                results["paths"][name][label] = summary
+                print(
+                    f"{name:<14} {label:<9} cpu/10k={summary['cpu_ms_per_10k_rows']:>8.2f}ms "
+                    f"p50={summary['p50_ms']:>8.2f}ms p95={summary['p95_ms']:>8.2f}ms bytes={summary['response_bytes']}"
+                )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pydantic response_model vs Core rows + orjson serialization")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows per response")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
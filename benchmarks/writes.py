@@ -0,0 +1,198 @@
+""" Бенчмарк изменяющих ручек: загрузка объекта в ORM и его изменение против одного запроса с RETURNING.
+
+Для каждой операции (обновление и удаление книги, обновление продавца, удаление продавца со всеми книгами)
+сравниваются два пути на одних и тех же данных:
+    orm        - как было раньше: session.get(), изменение объекта и flush; при удалении продавца
+                 его книги загружаются в память и удаляются ORM по одной (cascade="all, delete-orphan");
+    statement  - текущие ручки из src/routers/v1: один UPDATE/DELETE ... RETURNING,
+                 книги продавца удаляет сама БД (ON DELETE CASCADE).
+Для каждого пути считаются задержка, число SQL-запросов и пиковая память Python (tracemalloc).
+
+Запуск из корня проекта:
+    python -m benchmarks.writes --operations 500 --seller-books 100000 --output writes.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+import tracemalloc
+
+from fastapi import Response
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from benchmarks.common import bench_engine, latency_summary, write_results
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.routers.v1.books import delete_book, update_book
+from src.routers.v1.sellers import BOOKS_STATE, delete_seller, update_seller
+from src.schemas.books import BookUpdate
+from src.schemas.sellers import SellerUpdate
+from src.services.cache import NullCache
+
+BOOK_UPDATE = BookUpdate(title="Updated", author="Bench", year=2025, pages=42)
+CACHE = NullCache()
+SELLER_COUNTER = itertools.count()
+
+
+def _seller_update(seller_id: int) -> SellerUpdate:
+    return SellerUpdate(first_name="Updated", last_name="Seller", e_mail=f"updated{seller_id}@bench.example.com")
+
+
+# Старый путь (ручки до перехода на UPDATE/DELETE ... RETURNING): строка загружается в сессию
+# под блокировкой, изменяется и записывается через flush
+async def orm_update_book(session, book_id: int) -> None:
+    book = await session.get(Book, book_id, with_for_update=True)
+    book.title, book.author, book.year, book.pages = BOOK_UPDATE.title, BOOK_UPDATE.author, BOOK_UPDATE.year, BOOK_UPDATE.pages
+    await session.flush()
+
+
+async def orm_delete_book(session, book_id: int) -> None:
+    await session.delete(await session.get(Book, book_id, with_for_update=True))
+    await session.flush()
+
+
+# После изменения продавец перечитывался (refresh), а ETag считался отдельным запросом
+async def orm_update_seller(session, seller_id: int) -> None:
+    seller_update = _seller_update(seller_id)
+    seller = await session.get(Seller, seller_id, with_for_update=True)
+    seller.first_name, seller.last_name, seller.e_mail = seller_update.first_name, seller_update.last_name, seller_update.e_mail
+    await session.flush()
+    await session.refresh(seller)
+    await session.execute(select(Seller.id, Seller.version, BOOKS_STATE).where(Seller.id == seller_id))
+
+
+# Книги продавца загружались в память (id - для сброса кэша, объекты - для cascade="all, delete-orphan")
+# и удалялись ORM по одной
+async def orm_delete_seller(session, seller_id: int) -> None:
+    seller = await session.get(Seller, seller_id, with_for_update=True)
+    await session.execute(select(Book.id).where(Book.seller_id == seller_id))
+    for book in (await session.execute(select(Book).where(Book.seller_id == seller_id))).scalars():
+        await session.delete(book)
+    await session.delete(seller)
+    await session.flush()
+
+
+# Новый путь: сами ручки, один UPDATE/DELETE ... RETURNING
+async def statement_update_book(session, book_id: int) -> None:
+    await update_book(book_id, BOOK_UPDATE, session, CACHE, Response())
+
+
+async def statement_delete_book(session, book_id: int) -> None:
+    await delete_book(book_id, session, CACHE)
+
+
+async def statement_update_seller(session, seller_id: int) -> None:
+    await update_seller(seller_id, _seller_update(seller_id), session, CACHE, Response())
+
+
+async def statement_delete_seller(session, seller_id: int) -> None:
+    await delete_seller(seller_id, session, CACHE)
+
+
+PATHS = {
+    "update_book": (orm_update_book, statement_update_book),
+    "delete_book": (orm_delete_book, statement_delete_book),
+    "update_seller": (orm_update_seller, statement_update_seller),
+    "delete_seller": (orm_delete_seller, statement_delete_seller),
+}
+
+
+async def seed_sellers(engine: AsyncEngine, count: int, books_per_seller: int) -> list[int]:
+    async with engine.begin() as connection:
+        rows = [
+            {"first_name": "Seller", "last_name": "Bench", "e_mail": f"seller{next(SELLER_COUNTER)}@bench.example.com", "password": "x"}
+            for _ in range(count)
+        ]
+        seller_ids = (await connection.execute(insert(Seller).returning(Seller.id), rows)).scalars().all()
+        if books_per_seller:
+            await connection.execute(
+                text(
+                    "INSERT INTO books_table (title, author, year, pages, seller_id) "
+                    "SELECT 'Bench ' || i, 'Author', 2024, 100, seller_id "
+                    "FROM unnest(CAST(:seller_ids AS integer[])) AS seller_id, generate_series(1, :books) AS i"
+                ),
+                {"seller_ids": list(seller_ids), "books": books_per_seller},
+            )
+        # Свежая статистика, чтобы планировщик выбирал индекс по seller_id, как на рабочей базе
+        await connection.execute(text("ANALYZE sellers_table, books_table"))
+    return list(seller_ids)
+
+
+async def book_ids_of(engine: AsyncEngine, seller_ids: list[int]) -> list[int]:
+    async with engine.connect() as connection:
+        query = select(Book.id).where(Book.seller_id.in_(seller_ids)).order_by(Book.id)
+        return list((await connection.execute(query)).scalars().all())
+
+
+async def measure(engine: AsyncEngine, operation, ids: list[int], statements: list[int]) -> dict:
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    samples, queries, peaks = [], [], []
+
+    for object_id in ids:
+        tracemalloc.start()
+        statements[0] = 0
+        started = time.perf_counter()
+        async with session_factory() as session:
+            await operation(session, object_id)
+            await session.commit()
+        samples.append(time.perf_counter() - started)
+        queries.append(statements[0])
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        **latency_summary(samples),
+        "queries_per_operation": round(sum(queries) / len(queries), 2),
+        "peak_memory_kb": round(max(peaks) / 1024, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    results = {"benchmark": "writes", "operations": args.operations, "seller_books": args.seller_books, "paths": {}}
+
+    async with bench_engine() as engine:
+        statements = [0]
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count_statement(*_):
+            statements[0] += 1
+
+        for name, paths in PATHS.items():
+            results["paths"][name] = {}
+            for label, operation in zip(("orm", "statement"), paths):
+                # Для каждого пути - свои свежие данные, чтобы пути не влияли друг на друга
+                if name == "delete_seller":
+                    ids = await seed_sellers(engine, args.sellers_to_delete, args.seller_books)
+                elif name == "update_seller":
+                    ids = await seed_sellers(engine, args.operations, 10)
+                else:
+                    sellers = await seed_sellers(engine, max(args.operations // 100, 1), 100)
+                    ids = (await book_ids_of(engine, sellers))[: args.operations]
+
+                summary = await measure(engine, operation, ids, statements)
+                results["paths"][name][label] = summary
+                print(
+                    f"{name:<14} {label:<10} p50={summary['p50_ms']:>9.2f}ms p95={summary['p95_ms']:>9.2f}ms "
+                    f"queries={summary['queries_per_operation']:>8} peak_memory={summary['peak_memory_kb']:>10.1f}KB"
+                )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-then-mutate vs single-statement write paths")
+    parser.add_argument("--operations", type=int, default=500, help="Book and seller updates/deletes per path")
+    parser.add_argument("--seller-books", type=int, default=100_000, help="Books of each deleted seller")
+    parser.add_argument("--sellers-to-delete", type=int, default=3)
+    parser.add_argument("--output", help="Path to write JSON results")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
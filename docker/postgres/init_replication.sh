@@ -0,0 +1,9 @@
+#!/bin/bash
+# Пользователь и доступ для потоковой репликации (используется сервисом db_replica)
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD 'replicator_pass';
+EOSQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
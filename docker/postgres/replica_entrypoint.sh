@@ -0,0 +1,15 @@
+#!/bin/bash
+# Реплика только для чтения: при первом запуске копирует данные с основной базы
+# через pg_basebackup и дальше получает изменения потоковой репликацией.
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_isready -h db -p 5432; do
+        sleep 1
+    done
+
+    pg_basebackup -h db -p 5432 -U replicator -D "$PGDATA" -R -X stream -P
+    chmod 0700 "$PGDATA"
+fi
+
+exec postgres
@@ -0,0 +1,60 @@
+""" Точка входа для запуска приложения в продакшене:
+    python -m src [--host 0.0.0.0] [--port 8000] [--workers N]
+
+Запускает N процессов uvicorn (по умолчанию - по числу ядер), каждый со своим циклом событий
+и своим пулом соединений с БД. Если установлены uvloop и httptools, используются они.
+Управляющий процесс перезапускает упавшие воркеры; по SIGTERM воркеры перестают принимать
+новые соединения, дожидаются завершения начатых запросов (не дольше SERVER_GRACEFUL_TIMEOUT)
+и закрывают соединения с БД. По SIGHUP воркеры перезапускаются по одному.
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+
+import uvicorn
+
+from src.configurations.logs import configure_logging, logging_config
+from src.configurations.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run the Book Library App with multiple uvicorn workers")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="0 - one worker per CPU core")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    # Управляющий процесс пишет в тот же формат логов, что и воркеры
+    configure_logging()
+    logger.info("Starting %d workers on %s:%d (loop=%s, http=%s)", workers, args.host, args.port, loop, http)
+
+    uvicorn.run(
+        "src.main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        lifespan="on",
+        timeout_graceful_shutdown=settings.server_graceful_timeout,
+        timeout_keep_alive=settings.server_keep_alive,
+        # JSON-логи через очередь (src/configurations/logs.py) настраиваются в каждом воркере
+        log_config=logging_config(),
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import asyncio
+import itertools
 import logging
+import time
 
-from typing import AsyncGenerator, Callable, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Optional, Sequence
+from fastapi import HTTPException, Request
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
@@ -9,61 +16,245 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from src.models.base import BaseModel
-from src.configurations.settings import settings
+from src.configurations.migrations import check_schema, stamp_schema, upgrade_schema
+from src.configurations.settings import Settings, get_settings
+from src.services.cache import run_invalidations
+from src.services.query_stats import instrument_engine
 
-__all__ = ["global_init", "get_async_session", "create_db_and_tables"]
+__all__ = [
+    "PRIMARY",
+    "Database",
+    "get_database",
+    "get_async_session",
+    "get_async_read_session",
+    "get_async_primary_read_session",
+    "PRIMARY_PIN_COOKIE",
+    "READ_PRIMARY",
+    "READ_PINNED",
+    "READ_REPLICA",
+    "read_source",
+    "session_settings",
+]
 
-logger = logging.getLogger("__name__")
+logger = logging.getLogger(__name__)
 
-__async_engine: Optional[AsyncEngine] = None
-__session_factory: Optional[Callable[[], AsyncSession]] = None
+# Имя основной базы в реестре движков. Реплики называются replica1, replica2, ...
+PRIMARY = "primary"
 
-SQLALCHEMY_DATABASE_URL = settings.database_url
+# Cookie, в которой хранится время (unix timestamp), до которого клиент читает с основной базы.
+# Ставится после успешной записи, чтобы клиент сразу видел свои изменения, даже если реплика отстает.
+PRIMARY_PIN_COOKIE = "primary_pin_until"
 
+# Откуда читает сессия: основная база, основная база для клиента с PRIMARY_PIN_COOKIE или реплика.
+# От этого зависит, можно ли отдавать ответ из общего кэша и склеивать чтения, и можно ли класть
+# прочитанное в кэш (см. get_book в src/routers/v1/books.py).
+READ_PRIMARY = "primary"
+READ_PINNED = "pinned"
+READ_REPLICA = "replica"
 
-def global_init() -> None:
-    global __async_engine, __session_factory
 
-    if __session_factory:
-        return
+# Все движки приложения считают и замеряют свои SQL-запросы (см. src/services/query_stats.py).
+# engine_options переопределяют настройки пула и движка (например, pool_size в бенчмарках или echo в тестах).
+def _create_engine(url: str, settings: Settings, **engine_options: Any) -> AsyncEngine:
+    options = {
+        "echo": settings.db_echo,
+        "pool_size": settings.max_connection_count,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {"statement_cache_size": settings.db_statement_cache_size},
+        **engine_options,
+    }
+    return instrument_engine(create_async_engine(url=url, **options), slow_query_ms=settings.db_slow_query_ms)
 
-    if not __async_engine:
-        __async_engine = create_async_engine(url=SQLALCHEMY_DATABASE_URL, echo=True)
 
-    __session_factory = async_sessionmaker(__async_engine)
+# Реестр движков и фабрик сессий одного приложения: основная база и реплики для чтения.
+# Создается в lifespan воркера и хранится в app.state.database, поэтому в одном процессе могут
+# работать несколько приложений со своими базами (тесты, бенчмарки). Движки не подключаются к БД
+# до первого запроса, а dispose() закрывает все их соединения.
+# settings - настройки приложения (по умолчанию get_settings()). Они же лежат в session.info
+# каждой сессии, и сервисы читают их через session_settings().
+class Database:
+    def __init__(
+            self,
+            url: str,
+            replica_urls: Sequence[str] = (),
+            settings: Optional[Settings] = None,
+            **engine_options: Any,
+    ) -> None:
+        self.settings = settings if settings is not None else get_settings()
+        self.engines: dict[str, AsyncEngine] = {PRIMARY: _create_engine(url, self.settings, **engine_options)}
+        for number, replica_url in enumerate(replica_urls, start=1):
+            self.engines[f"replica{number}"] = _create_engine(replica_url, self.settings, **engine_options)
 
+        info = {"settings": self.settings}
+        self.session_factory = async_sessionmaker(self.engine, info=info)
+        self._replica_session_factories = [
+            async_sessionmaker(engine, info=info) for name, engine in self.engines.items() if name != PRIMARY
+        ]
+        self._replica_counter = itertools.count()
+        self._max_overflow = engine_options.get("max_overflow", self.settings.db_max_overflow)
 
-async def get_async_session() -> AsyncGenerator:
-    global __session_factory
+    # База по настройкам: DB_HOST/DB_NAME и реплики из DB_REPLICA_HOSTS
+    @classmethod
+    def from_settings(cls, settings: Optional[Settings] = None, **engine_options: Any) -> "Database":
+        settings = settings if settings is not None else get_settings()
+        return cls(settings.database_url, settings.database_replica_urls, settings, **engine_options)
 
-    if not __session_factory:
+    @property
+    def engine(self) -> AsyncEngine:
+        return self.engines[PRIMARY]
+
+    async def __aenter__(self) -> "Database":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.dispose()
+
+    # Фабрика сессий для чтения: реплика по кругу или та, у которой меньше всего занятых соединений.
+    # Без реплик или для клиента, который недавно писал (pinned), - основная база.
+    def read_session_factory(self, pinned: bool = False) -> async_sessionmaker:
+        replicas = self._replica_session_factories
+        if pinned or not replicas:
+            return self.session_factory
+
+        if self.settings.db_replica_strategy == "least_connections":
+            return min(replicas, key=lambda factory: factory.kw["bind"].pool.checkedout())
+
+        return replicas[next(self._replica_counter) % len(replicas)]
+
+    # Подготовка схемы БД при старте приложения в зависимости от db_startup_mode
+    async def prepare_schema(self) -> None:
+        if self.settings.db_startup_mode == "recreate":
+            await self.create_tables()
+        elif self.settings.db_startup_mode == "migrate":
+            await upgrade_schema(self.engine)
+        else:
+            await check_schema(self.engine)
+
+    # Удаляет и заново создает все таблицы. Все данные теряются - только для локальной разработки и тестов.
+    # Схема отмечается последней миграцией, поэтому потом такую базу можно обновлять через DB_STARTUP_MODE=migrate.
+    async def create_tables(self) -> None:
+        from src.models.books import Book
+        from src.models.changes import Change
+        from src.models.idempotency import IdempotencyKey
+        from src.models.jobs import Job
+        from src.models.stats import SellerStats
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(BaseModel.metadata.drop_all)
+            await conn.run_sync(BaseModel.metadata.create_all)
+            await stamp_schema(conn)
+
+    # Текущее состояние пула соединений основной базы. Помогает подобрать размер пула под конкретный деплой.
+    def pool_status(self) -> dict:
+        pool = self.engine.pool
+        return {
+            "pool_size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": self._max_overflow,
+        }
+
+    # Открывает соединения заранее, чтобы первые запросы после старта воркера не ждали
+    # установки соединения с БД (для всех движков: основной базы и реплик)
+    async def warm_up(self) -> None:
+        warmup = self.settings.db_pool_warmup
+        await asyncio.gather(*(_warm_up_engine(engine, warmup) for engine in self.engines.values()))
+
+    # Закрывает все соединения основной базы и реплик при остановке воркера,
+    # чтобы PostgreSQL не держал "осиротевшие" соединения до таймаута
+    async def dispose(self) -> None:
+        await asyncio.gather(*(engine.dispose() for engine in self.engines.values()))
+
+
+# Соединения берутся одновременно (иначе пул отдавал бы одно и то же) и возвращаются в пул открытыми.
+# warmup < 0 - весь пул.
+async def _warm_up_engine(engine: AsyncEngine, warmup: int) -> None:
+    pool_size = engine.pool.size()
+    count = pool_size if warmup < 0 else min(warmup, pool_size)
+    connections: list[AsyncConnection] = [engine.connect() for _ in range(count)]
+    try:
+        await asyncio.gather(*(connection.start() for connection in connections))
+        await asyncio.gather(*(connection.execute(text("SELECT 1")) for connection in connections))
+    finally:
+        await asyncio.gather(*(connection.close() for connection in connections if connection.sync_connection))
+
+
+# База приложения, обрабатывающего запрос (создается в lifespan, см. src/main.py)
+def get_database(request: Request) -> Database:
+    database: Optional[Database] = getattr(request.app.state, "database", None)
+    if database is None:
         raise ValueError(
-            {"message": "You must call global_init() before using this method"}
+            {"message": "Database is not initialized: the application lifespan has not started"}
         )
+    return database
+
+
+def _is_pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
 
-    session: AsyncSession = __session_factory()
 
+# Сессия закрывается в конце запроса. FastAPI кэширует зависимости в пределах запроса, поэтому
+# все зависимости одного запроса получают одну и ту же сессию. Соединение из пула берется только
+# при первом SQL-запросе: ручка, которая не обратилась к БД, не тратит ни соединение, ни COMMIT.
+# Ключи кэша, которые ручка отложила через invalidate_after_commit, сбрасываются только после COMMIT.
+@asynccontextmanager
+async def _session_scope(session: AsyncSession, commit: bool) -> AsyncGenerator:
     try:
         yield session
-        await session.commit()
+        if commit and session.in_transaction():
+            await session.commit()
+        await run_invalidations(session)
+    except HTTPException:
+        # Ответы 4xx - штатная ситуация, в лог как ошибки их не пишем
+        raise
     except Exception as e:
         logger.error("Raises exception: %s", e)
         raise e
     finally:
-        await session.rollback()
         await session.close()
 
 
-async def create_db_and_tables():
-    from src.models.books import Book
+async def get_async_session(request: Request) -> AsyncGenerator:
+    async with _session_scope(get_database(request).session_factory(), commit=True) as session:
+        yield session
 
-    global __async_engine
 
-    if __async_engine is None:
-        raise ValueError(
-            {"message": "You must call global_init() before using this method"}
-        )
+# Сессия для ручек, которые только читают данные. Отправляет запросы на реплику,
+# если реплики настроены и клиент недавно ничего не записывал. Источник чтения записывается в session.info.
+async def get_async_read_session(request: Request) -> AsyncGenerator:
+    database = get_database(request)
+    pinned = _is_pinned_to_primary(request)
+    factory = database.read_session_factory(pinned=pinned)
+    if pinned:
+        source = READ_PINNED
+    else:
+        source = READ_PRIMARY if factory is database.session_factory else READ_REPLICA
+
+    async with _session_scope(factory(info={"read_source": source}), commit=False) as session:
+        yield session
+
+
+# Сессия только для чтения с основной базы. Нужна ручкам с общим кэшем: при промахе они загружают
+# запись с основной базы и кладут ее в кэш по аренде, а реплика могла бы вернуть строку старше последней записи.
+# Соединение берется только при первом SQL-запросе, то есть только при промахе кэша.
+async def get_async_primary_read_session(request: Request) -> AsyncGenerator:
+    factory = get_database(request).session_factory
+    async with _session_scope(factory(info={"read_source": READ_PRIMARY}), commit=False) as session:
+        yield session
+
+
+# Источник чтения сессии. Сессии записи и тестовые сессии читают с основной базы.
+def read_source(session: AsyncSession) -> str:
+    return session.info.get("read_source", READ_PRIMARY)
+
 
-    async with __async_engine.begin() as conn:
-        await conn.run_sync(BaseModel.metadata.drop_all)
-        await conn.run_sync(BaseModel.metadata.create_all)
\ No newline at end of file
+# Настройки приложения, которому принадлежит сессия. Сессии вне Database - настройки по умолчанию.
+def session_settings(session: AsyncSession) -> Settings:
+    return session.info.get("settings") or get_settings()
@@ -0,0 +1,153 @@
+import atexit
+import contextvars
+import copy
+import logging
+import logging.config
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
+from src.configurations.settings import get_settings
+
+__all__ = [
+    "current_request_id",
+    "debug_sampled",
+    "sample_debug",
+    "log_sampled",
+    "JsonFormatter",
+    "logging_config",
+    "configure_logging",
+    "stop_logging",
+]
+
+# Логи пишутся в очередь в памяти, а в stdout их выводит отдельный поток (QueueListener).
+# Поэтому запись лога в обработчике запроса не блокирует цикл событий на вводе-выводе.
+# Каждая запись получает id HTTP-запроса (correlation id), в рамках которого она сделана.
+# Логирование настраивается на весь процесс, поэтому читает настройки окружения (get_settings),
+# а не настройки отдельного приложения.
+
+# id текущего HTTP-запроса (ставит RequestIdMiddleware). None - вне запроса.
+current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request_id", default=None)
+
+# Попал ли текущий запрос в выборку DEBUG-событий. Решение принимается один раз на запрос,
+# поэтому в лог попадают все DEBUG-события выбранных запросов, а не разрозненные строки.
+# None - вне запроса: решение принимается для каждой записи.
+debug_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar("debug_sampled", default=None)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+# Стандартные атрибуты LogRecord. Все остальные атрибуты записи - это поля из extra=
+# (кроме color_message, который uvicorn добавляет для цветного вывода в консоль).
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+    "request_id",
+    "color_message",
+}
+
+__listener: Optional[QueueListener] = None
+
+
+def sample_debug() -> bool:
+    return random.random() < get_settings().log_debug_sample_rate
+
+
+# Нужно ли писать DEBUG-событие в текущем контексте. Горячие места проверяют это вместе
+# с logger.isEnabledFor(logging.DEBUG) до того, как готовить данные для записи.
+def log_sampled() -> bool:
+    sampled = debug_sampled.get()
+    return sample_debug() if sampled is None else sampled
+
+
+# Добавляет в запись id запроса и отбрасывает DEBUG-записи запросов, не попавших в выборку.
+# Работает в потоке, который пишет лог, до постановки записи в очередь.
+class RequestContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and not log_sampled():
+            return False
+        record.request_id = current_request_id.get()
+        return True
+
+
+# Одна запись - одна строка JSON: время, уровень, логгер, сообщение, id запроса и поля из extra=
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+# В отличие от стандартного QueueHandler не склеивает сообщение с трейсбеком:
+# исключение передается отдельным полем, чтобы JSON-форматтер записал его в exc_info
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def stop_logging() -> None:
+    global __listener
+
+    if __listener is not None:
+        __listener.stop()  # Дописывает все записи, оставшиеся в очереди
+        __listener = None
+
+
+# Фабрика обработчика для dictConfig: запускает поток вывода и возвращает обработчик-очередь
+def queue_handler() -> QueueHandler:
+    global __listener
+
+    stop_logging()
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if get_settings().log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    __listener = QueueListener(log_queue, output)
+    __listener.start()
+
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    return handler
+
+
+# Конфигурация для logging.config.dictConfig. Ее же получает uvicorn (log_config),
+# поэтому логирование настраивается в каждом процессе-воркере.
+def logging_config() -> dict:
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "handlers": {"queue": {"()": queue_handler}},
+        "root": {"handlers": ["queue"], "level": get_settings().log_level},
+        # Логи uvicorn уходят в тот же обработчик через корневой логгер
+        "loggers": {
+            "uvicorn": {"handlers": [], "propagate": True},
+            "uvicorn.error": {"handlers": [], "propagate": True},
+            "uvicorn.access": {"handlers": [], "propagate": True},
+        },
+    }
+
+
+def configure_logging() -> None:
+    logging.config.dictConfig(logging_config())
+
+
+atexit.register(stop_logging)
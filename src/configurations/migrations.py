@@ -0,0 +1,96 @@
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+__all__ = ["alembic_config", "check_schema", "stamp_schema", "upgrade_schema"]
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Ключ advisory lock в PostgreSQL. Пока один воркер применяет миграции, остальные ждут,
+# поэтому одновременный старт нескольких воркеров/подов не выполняет DDL дважды.
+MIGRATIONS_LOCK_KEY = 7413205
+
+
+def alembic_config() -> Config:
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "src" / "migrations"))
+    return config
+
+
+def _head_revisions(config: Config) -> set[str]:
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+
+def _current_heads(sync_connection) -> tuple[str, ...]:
+    return MigrationContext.configure(sync_connection).get_current_heads()
+
+
+async def _current_revisions(engine: AsyncEngine) -> set[str]:
+    async with engine.connect() as connection:
+        return set(await connection.run_sync(_current_heads))
+
+
+# Только проверяет, что схема БД соответствует последней миграции. Никакого DDL,
+# один короткий запрос - подходит для старта каждого воркера при rolling restart.
+async def check_schema(engine: AsyncEngine) -> None:
+    expected = _head_revisions(alembic_config())
+    current = await _current_revisions(engine)
+
+    if current != expected:
+        raise RuntimeError(
+            {
+                "message": (
+                    "Database schema is not up to date, run 'alembic upgrade head' "
+                    "(for a database created by create_all() with the current models: 'alembic stamp head')"
+                ),
+                "current": sorted(current),
+                "expected": sorted(expected),
+            }
+        )
+
+
+# Применяет недостающие миграции под advisory lock. Блокировка берется на отдельном соединении
+# в режиме autocommit: если миграция упадет и ее транзакция откатится, снятие блокировки не упадет
+# с InFailedSQLTransaction и не скроет настоящую ошибку. Если не удастся и оно, блокировка снимется
+# вместе с соединением: оно закрывается, а не возвращается в пул.
+async def upgrade_schema(engine: AsyncEngine, revision: str = "head") -> None:
+    config = alembic_config()
+
+    def run_upgrade(sync_connection) -> None:
+        config.attributes["connection"] = sync_connection
+        command.upgrade(config, revision)
+
+    async with engine.connect() as lock_connection:
+        await lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        try:
+            async with engine.connect() as connection:
+                await connection.run_sync(run_upgrade)
+                await connection.commit()
+        finally:
+            try:
+                await lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            except Exception as e:
+                logger.warning("Failed to release migrations lock, closing its connection: %s", e)
+                await lock_connection.invalidate()
+
+
+
+# Отмечает схему как уже соответствующую ревизии, ничего не выполняя. Вызывается после create_all()
+# (DB_STARTUP_MODE=recreate), чтобы такую базу потом можно было обновлять миграциями.
+async def stamp_schema(connection: AsyncConnection, revision: str = "head") -> None:
+    config = alembic_config()
+
+    def run_stamp(sync_connection) -> None:
+        config.attributes["connection"] = sync_connection
+        command.stamp(config, revision, purge=True)
+
+    await connection.run_sync(run_stamp)
@@ -1,5 +1,11 @@
+from functools import lru_cache
+from typing import Annotated, Literal, Union
+
+from fastapi import Depends, Request
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+__all__ = ["Settings", "get_settings", "get_app_settings", "AppSettings"]
+
 
 class Settings(BaseSettings):
     # for PostgreSQL
@@ -8,12 +14,125 @@ class Settings(BaseSettings):
     db_username: str
     db_password: str
     db_test_name: str = "fastapi_project_test_db"
-    max_connection_count: int = 10
+    max_connection_count: int = 10  # Размер пула соединений (pool_size) в каждом воркере
+
+    # Настройки пула соединений и движка SQLAlchemy
+    db_max_overflow: int = 10  # Сколько соединений можно открыть сверх пула при пиковой нагрузке
+    db_pool_timeout: float = 30  # Сколько секунд ждать свободное соединение из пула
+    db_pool_recycle: int = 1800  # Через сколько секунд пересоздавать соединение (-1 - никогда)
+    db_pool_pre_ping: bool = True  # Проверять соединение перед выдачей из пула
+    db_statement_cache_size: int = 100  # Кэш подготовленных выражений asyncpg (0 - для pgbouncer)
+    db_echo: Union[bool, Literal["debug"]] = False  # Логировать SQL (True) или SQL вместе с результатами ("debug")
+    db_slow_query_ms: float = 500  # Запросы дольше этого порога пишутся в лог без параметров (0 - не писать)
+    db_pool_warmup: int = -1  # Сколько соединений открыть при старте воркера (-1 - весь пул, 0 - не прогревать)
+
+    # Что делать со схемой БД при старте:
+    # check - только проверить, что применена последняя миграция (по умолчанию, для продакшена);
+    # migrate - применить миграции (под advisory lock, безопасно для нескольких воркеров);
+    # recreate - удалить и создать все таблицы заново (только для локальной разработки!)
+    db_startup_mode: Literal["check", "migrate", "recreate"] = "check"
+
+    # Реплики для чтения: хосты через запятую, например "127.0.0.1:5446,127.0.0.1:5447"
+    db_replica_hosts: str = ""
+    db_replica_strategy: Literal["round_robin", "least_connections"] = "round_robin"
+    # Сколько секунд после записи клиент читает с основной базы (read-your-writes)
+    db_read_your_writes_seconds: float = 5
+
+    # Сервер (python -m src)
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0  # Число процессов-воркеров (0 - по числу ядер)
+    server_graceful_timeout: float = 30  # Сколько секунд при остановке ждать завершения начатых запросов
+    server_keep_alive: float = 5  # Сколько секунд держать открытым простаивающее keep-alive соединение
+
+    # Логирование (src/configurations/logs.py)
+    log_level: str = "INFO"
+    log_format: Literal["json", "text"] = "json"
+    log_debug_sample_rate: float = 0.01  # Доля HTTP-запросов, DEBUG-события которых попадают в лог
+
+    # Пагинация списков (keyset по id)
+    page_size_default: int = 100
+    page_size_max: int = 1000
+    # Сколько первых книг встраивается в карточку продавца (остальные - через /seller/{id}/books)
+    seller_detail_books: int = 20
+
+    # Максимальное число элементов в одном массовом запросе (/books/bulk)
+    bulk_max_items: int = 10000
+
+    # Сжатие ответов (src/middlewares/compression.py). Кодировки в порядке предпочтения сервера:
+    # br и zstd используются, только если установлены пакеты brotli и zstandard.
+    compression_enabled: bool = True
+    compression_min_size: int = 1024  # Ответы короче (в байтах) не сжимаются
+    compression_encodings: str = "zstd,br,gzip"
+    compression_gzip_level: int = 3  # Сжимает почти как 9 при CPU как у 1 (benchmarks/compression.py)
+    compression_brotli_quality: int = 4
+    compression_zstd_level: int = 3
+
+    # Кэш ответов для книги и продавца: "memory", "redis" или "none"
+    cache_backend: str = "memory"
+    cache_ttl_seconds: float = 60
+    cache_max_entries: int = 10000
+    redis_url: str = "redis://127.0.0.1:6379/0"
+
+    # Склеивать одинаковые параллельные чтения книг и продавцов в один запрос к БД (src/services/single_flight.py)
+    single_flight_enabled: bool = True
+
+    # Лимиты запросов на клиента (src/middlewares/rate_limit.py): скорость (запросов в секунду, 0 - без лимита)
+    # и допустимый всплеск для дешевых чтений, тяжелых списков и записи. Бэкенд: "memory" или "redis" (redis_url).
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_read_per_second: float = 50
+    rate_limit_read_burst: int = 100
+    rate_limit_list_per_second: float = 5
+    rate_limit_list_burst: int = 20
+    rate_limit_write_per_second: float = 10
+    rate_limit_write_burst: int = 20
+    rate_limit_concurrency: int = 10  # Сколько запросов клиента одновременно выполняет воркер (0 - без лимита)
+    rate_limit_stream_concurrency: int = 4  # То же для лент изменений (long-poll и SSE), считается отдельно
+    rate_limit_api_keys: str = ""  # Известные API-ключи через запятую: лимиты считаются по ключу, а не по IP
+    rate_limit_trust_forwarded: bool = False  # Брать IP клиента из X-Forwarded-For (только за своим балансировщиком)
+
+    # Лента изменений книг и продавцов (src/services/changes.py)
+    changes_wait_max_seconds: float = 30  # Наибольшее ожидание long-poll (параметр wait)
+    changes_poll_seconds: float = 5  # Как часто перечитывать ленту при ожидании, даже без уведомлений
+    changes_stream_seconds: float = 300  # Сколько секунд держать поток SSE до переподключения клиента
+    changes_retention_days: float = 7  # Сколько хранится журнал изменений (очистка: python -m src.services.changes)
+
+    # Сколько секунд хранится ответ на POST-запрос с заголовком Idempotency-Key
+    idempotency_ttl_seconds: float = 86400
+
+    # Фоновые задачи (src/services/jobs.py). Воркеры задач запускаются в каждом процессе приложения.
+    jobs_enabled: bool = True
+    jobs_concurrency: int = 2  # Сколько задач процесс выполняет одновременно
+    jobs_poll_interval: float = 1  # Как часто проверять очередь, когда она пуста (секунды)
+    jobs_max_attempts: int = 5
+    jobs_backoff_seconds: float = 2  # Задержка перед первым повтором, дальше удваивается
+    jobs_backoff_max_seconds: float = 300
+    jobs_lease_seconds: float = 600  # Через сколько секунд задачу упавшего воркера забирает другой
+
+    # Через сколько секунд после изменения книг пересчитывается общая статистика (/api/v1/stats).
+    # Все изменения за это время попадают в один пересчет.
+    stats_refresh_delay_seconds: float = 1
+
+    # Хэширование паролей продавцов (scrypt). Параметры сохраняются в хэше: после их изменения
+    # пароль перехэшируется при следующем логине.
+    password_hash_workers: int = 2  # Сколько потоков может одновременно считать хэши
+    password_scrypt_n: int = 2**14  # Стоимость по CPU и памяти (степень двойки)
+    password_scrypt_r: int = 8  # Размер блока
+    password_scrypt_p: int = 1  # Параллелизм
 
     @property
     def database_url(self) -> str:
         return f"postgresql+asyncpg://{self.db_username}:{self.db_password}@{self.db_host}/{self.db_name}"
 
+    @property
+    def database_replica_urls(self) -> list[str]:
+        hosts = [host.strip() for host in self.db_replica_hosts.split(",") if host.strip()]
+        return [
+            f"postgresql+asyncpg://{self.db_username}:{self.db_password}@{host}/{self.db_name}"
+            for host in hosts
+        ]
+
     @property
     def database_test_url(self) -> str:
         return f"postgresql+asyncpg://{self.db_username}:{self.db_password}@{self.db_host}/{self.db_test_name}"
@@ -21,4 +140,18 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
-settings = Settings()
\ No newline at end of file
+# Настройки по умолчанию: из переменных окружения и .env. Читаются при первом обращении, а не при импорте.
+# Приложение получает свой экземпляр (create_app(settings=...), src/main.py) и хранит его в app.state.settings,
+# поэтому в одном процессе могут работать приложения с разными настройками (тесты, бенчмарки).
+# Напрямую get_settings() используют только точки входа процесса: сервер, миграции, утилиты командной строки.
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+# Зависимость для ручек: настройки приложения, обрабатывающего запрос
+def get_app_settings(request: Request) -> Settings:
+    return request.app.state.settings
+
+
+AppSettings = Annotated[Settings, Depends(get_app_settings)]
\ No newline at end of file
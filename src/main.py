@@ -1,30 +1,143 @@
-from contextlib import asynccontextmanager
+import time
+
+# Время начала импорта приложения - для разбивки времени старта воркера
+IMPORT_STARTED = time.perf_counter()
+
+import logging
+import os
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
 
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
-from src.configurations.database import create_db_and_tables, global_init
-from src.routers import v1_router
-from icecream import ic
+from src.configurations.database import Database
+from src.configurations.settings import Settings, get_settings
+from src.middlewares.compression import CompressionMiddleware
+from src.middlewares.metrics import RequestMetricsMiddleware
+from src.middlewares.rate_limit import RateLimitMiddleware
+from src.middlewares.replicas import PrimaryPinMiddleware
+from src.middlewares.request_id import RequestIdMiddleware
+from src.routers import health_router, metrics_router, v1_router
+from src.services.changes import ChangeNotifier
+from src.services.jobs import JobRunner
+from src.services.cache import CacheBackend, create_cache
+from src.services.passwords import create_password_executor
+from src.services.single_flight import SingleFlights
+
+logger = logging.getLogger(__name__)
 
 
+# Замеряет длительность этапа старта в миллисекундах
+@contextmanager
+def _timed(timings: dict, stage: str):
+    started = time.perf_counter()
+    yield
+    timings[stage] = (time.perf_counter() - started) * 1000
+
+
+# Старт воркера по этапам: создание движков, проверка/миграция схемы, прогрев пула соединений,
+# запуск слушателя ленты изменений и воркеров фоновых задач. Остановка (SIGTERM) начинается после того,
+# как сервер дождался завершения начатых запросов: даем доработать фоновым задачам, закрываем
+# соединения с БД и пул хэширования паролей.
+# Движки живут в app.state.database. Если база передана в create_app (тесты, бенчмарки), lifespan
+# использует ее и не закрывает: ее закрывает тот, кто создал.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    ic("I am here!")
-    global_init()
-    await create_db_and_tables()
+    timings = {"import": (IMPORT_FINISHED - IMPORT_STARTED) * 1000}
+    settings: Settings = app.state.settings
+    owns_database = getattr(app.state, "database", None) is None
+    with _timed(timings, "engine"):
+        if owns_database:
+            app.state.database = Database.from_settings(settings)
+    database: Database = app.state.database
+    with _timed(timings, "schema"):
+        await database.prepare_schema()
+    with _timed(timings, "pool_warmup"):
+        await database.warm_up()
+
+    # Уведомления о новых изменениях для long-poll и SSE ленты изменений
+    await app.state.change_notifier.start(database.engine)
+
+    job_runner = JobRunner(database.session_factory, app.state) if settings.jobs_enabled else None
+    if job_runner:
+        job_runner.start()
+
+    logger.info(
+        "Worker %d started in %.1f ms (%s)",
+        os.getpid(),
+        sum(timings.values()),
+        ", ".join(f"{stage}={duration:.1f}ms" for stage, duration in timings.items()),
+    )
     yield
 
+    if job_runner:
+        await job_runner.stop(settings.server_graceful_timeout)
+    await app.state.change_notifier.stop()
+    if owns_database:
+        await database.dispose()
+        del app.state.database
+    # Новый пул не запускает потоки до первого хэширования и нужен, только если приложение стартует снова
+    app.state.password_executor.shutdown(wait=True)
+    app.state.password_executor = create_password_executor(settings)
+    logger.info("Worker %d stopped", os.getpid())
+
 
 # Само приложение fastApi. именно оно запускается сервером и служит точкой входа
 # в нем можно указать разные параметры для сваггера и для ручек (эндпоинтов).
-app = FastAPI(
-    title="Book Library App",
-    description="Учебное приложение для MTS Shad",
-    version="0.0.1",
-    default_response_class=ORJSONResponse,
-    responses={404: {"description": "Not found!"}},  # Подключаем быстрый сериализатор
-    lifespan=lifespan,
-)
+# Приложений в процессе может быть несколько (тесты, бенчмарки): у каждого свои база, кэш, склейка чтений,
+# пул хэширования паролей и слушатель изменений. Ручки получают их из app.state через зависимости.
+# Настройки тоже свои у каждого приложения (app.state.settings): по умолчанию - настройки переданной базы
+# или из окружения (get_settings). Middleware и фоновые задачи читают их при создании, а не при импорте.
+def create_app(
+        database: Optional[Database] = None,
+        cache: Optional[CacheBackend] = None,
+        settings: Optional[Settings] = None,
+) -> FastAPI:
+    if settings is None:
+        settings = database.settings if database is not None else get_settings()
+    app = FastAPI(
+        title="Book Library App",
+        description="Учебное приложение для MTS Shad",
+        version="0.0.1",
+        default_response_class=ORJSONResponse,
+        responses={404: {"description": "Not found!"}},  # Подключаем быстрый сериализатор
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+    if database is not None:
+        app.state.database = database
+    app.state.cache = cache if cache is not None else create_cache(settings)
+    app.state.single_flights = SingleFlights(settings.single_flight_enabled)
+    app.state.password_executor = create_password_executor(settings)
+    app.state.change_notifier = ChangeNotifier()
+
+    # Закрепление клиента за основной базой после записи нужно только при наличии реплик
+    has_replicas = len(database.engines) > 1 if database is not None else bool(settings.database_replica_urls)
+    if has_replicas:
+        app.add_middleware(PrimaryPinMiddleware, pin_seconds=settings.db_read_your_writes_seconds)
+
+    # Сжатие ответов внутри слоя метрик: время сжатия попадает в длительность запроса
+    if settings.compression_enabled:
+        app.add_middleware(CompressionMiddleware, settings=settings)
+
+    # Подсчет SQL-запросов и времени на каждый HTTP-запрос. Добавляется после остальных, чтобы быть внешним
+    # и учитывать время всех остальных middleware.
+    app.add_middleware(RequestMetricsMiddleware)
+
+    # Лимиты запросов снаружи от метрик: отклоненный запрос не доходит до остальных слоев и ручек,
+    # отказы считаются отдельной метрикой http_rate_limited_total
+    if settings.rate_limit_enabled:
+        app.add_middleware(RateLimitMiddleware, settings=settings)
+
+    # id запроса для логов - самый внешний слой, чтобы его получили записи всех middleware
+    app.add_middleware(RequestIdMiddleware)
+
+    app.include_router(v1_router)
+    app.include_router(health_router)
+    app.include_router(metrics_router)
+    return app
+
 
+app = create_app()
 
-app.include_router(v1_router)
\ No newline at end of file
+IMPORT_FINISHED = time.perf_counter()
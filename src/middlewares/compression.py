@@ -0,0 +1,191 @@
+import zlib
+from typing import Callable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations.settings import Settings
+from src.services.etag import variant_etag
+
+try:
+    import brotli
+except ImportError:  # brotli и zstandard необязательны: без них остается gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__all__ = ["CompressionMiddleware", "available_encodings", "negotiate_encoding"]
+
+# Сжимаются только текстовые форматы и MessagePack. Server-Sent Events не сжимаются:
+# сжатие буферизует данные, и события доходили бы до клиента с задержкой.
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/msgpack", "text/")
+NOT_COMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+# Потоковый кодировщик: compress для очередной части тела, finish - остаток в конце ответа
+class _Encoder:
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]) -> None:
+        self.compress = compress
+        self.finish = finish
+
+
+def _gzip_encoder(level: int) -> _Encoder:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return _Encoder(compressor.compress, compressor.flush)
+
+
+def _brotli_encoder(level: int) -> _Encoder:
+    compressor = brotli.Compressor(quality=level)
+    return _Encoder(compressor.process, compressor.finish)
+
+
+def _zstd_encoder(level: int) -> _Encoder:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return _Encoder(compressor.compress, compressor.flush)
+
+
+# Кодировщики по уровню сжатия
+ENCODERS: dict[str, Callable[[int], _Encoder]] = {"gzip": _gzip_encoder}
+if brotli is not None:
+    ENCODERS["br"] = _brotli_encoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd_encoder
+
+
+# Кодировки из настроек в порядке предпочтения сервера, для которых установлены библиотеки
+def available_encodings(settings: Settings) -> tuple[str, ...]:
+    names = (name.strip() for name in settings.compression_encodings.split(","))
+    return tuple(name for name in names if name in ENCODERS)
+
+
+def compression_levels(settings: Settings) -> dict[str, int]:
+    return {
+        "gzip": settings.compression_gzip_level,
+        "br": settings.compression_brotli_quality,
+        "zstd": settings.compression_zstd_level,
+    }
+
+
+# Выбор кодировки по Accept-Encoding: наибольший q у клиента, при равенстве - порядок сервера.
+# None - сжимать нечем или клиент не принимает ни одну из доступных кодировок.
+def negotiate_encoding(accept_encoding: str, encodings: tuple[str, ...]) -> Optional[str]:
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+# Сжимает ответы по Accept-Encoding (zstd, br, gzip - что установлено и разрешено в настройках приложения).
+# minimum_size и encodings подменяют настройки в тестах и бенчмарках.
+# Ответы меньше compression_min_size отдаются как есть: на коротком теле сжатие экономит меньше,
+# чем стоит по CPU. Потоковые ответы (выгрузки) сжимаются по частям. Сжатое тело - другие байты,
+# поэтому к строгому ETag добавляется суффикс кодировки ("<etag>-gzip"); If-None-Match и If-Match
+# сравнивают ETag без суффиксов (src/services/etag.py). Range-запросы не поддерживаются.
+class CompressionMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            settings: Settings,
+            minimum_size: Optional[int] = None,
+            encodings: Optional[tuple[str, ...]] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = settings.compression_min_size if minimum_size is None else minimum_size
+        self.encodings = available_encodings(settings) if encodings is None else encodings
+        self.levels = compression_levels(settings)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = next((value for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        encoding = negotiate_encoding(accept_encoding.decode("latin-1"), self.encodings) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.levels[encoding], self.minimum_size))
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int) -> None:
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(raw=message.setdefault("headers", []))
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or content_type.startswith(NOT_COMPRESSIBLE_TYPES)
+            )
+            if not self.passthrough:
+                headers.add_vary_header("Accept-Encoding")
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            # Решение принимается по первой части тела: короткий ответ целиком отдается без сжатия
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+
+            self.encoder = ENCODERS[self.encoding](self.level)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            if (etag := headers.get("etag")) is not None:
+                headers["ETag"] = variant_etag(etag, self.encoding)
+            if more_body:
+                del headers["Content-Length"]
+                body = self.encoder.compress(body)
+            else:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = self.encoder.compress(body)
+        if not more_body:
+            body += self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,101 @@
+import logging
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import (
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    HTTP_REQUEST_DURATION,
+)
+from src.services.query_stats import QueryStats, current_query_stats
+
+__all__ = ["RequestMetricsMiddleware"]
+
+logger = logging.getLogger(__name__)
+
+# Метка для запросов, не попавших ни в одну ручку. Сырые пути в метки не пишем,
+# иначе число временных рядов в Prometheus растет без ограничений.
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+# Шаблон пути ручки, например "/api/v1/books/{book_id}". У ручек из подключенных роутеров
+# FastAPI хранит путь без префикса родителя ("/books/{book_id}"), поэтому префикс берем из
+# самого запроса: это все сегменты пути до тех, что соответствуют шаблону ручки.
+def _route_template(scope: Scope) -> str:
+    template = getattr(scope.get("route"), "path_format", None)
+    if template is None:
+        return UNMATCHED_ROUTE
+
+    segments = scope["path"].split("/")
+    prefix = "/".join(segments[: max(len(segments) - template.count("/"), 1)])
+    return prefix + template
+
+
+def _server_timing(stats: QueryStats, elapsed: float) -> str:
+    return f'db;dur={stats.total_time * 1000:.3f};desc="{stats.count} queries", app;dur={elapsed * 1000:.3f}'
+
+
+# Считает для каждого HTTP-запроса число SQL-запросов, суммарное время в БД и самый медленный запрос.
+# Отдает их клиенту в заголовке Server-Timing, пишет в лог и в гистограммы для /metrics.
+# Для стриминговых ответов заголовок отражает только запросы, выполненные до начала ответа.
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timing = _server_timing(stats, time.perf_counter() - started_at)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_query_stats.reset(token)
+            self._record(scope, stats, status_code, time.perf_counter() - started_at)
+
+    @staticmethod
+    def _record(scope: Scope, stats: QueryStats, status_code: int, elapsed: float) -> None:
+        method = scope["method"]
+        route = _route_template(scope)
+
+        HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route, status=str(status_code))
+        DB_QUERIES_PER_REQUEST.observe(stats.count, method=method, route=route)
+        DB_TIME_PER_REQUEST.observe(stats.total_time, method=method, route=route)
+
+        # Поля для лога собираются, только если уровень INFO включен
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        logger.info(
+            "%s %s -> %s in %.1f ms (%d queries, %.1f ms in db)",
+            method,
+            scope["path"],
+            status_code,
+            elapsed * 1000,
+            stats.count,
+            stats.total_time * 1000,
+            extra={
+                "method": method,
+                "route": route,
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round(elapsed * 1000, 3),
+                "db_queries": stats.count,
+                "db_time_ms": round(stats.total_time * 1000, 3),
+                "db_slowest_ms": round(stats.slowest_time * 1000, 3),
+                "db_slowest_statement": stats.slowest_statement,
+            },
+        )
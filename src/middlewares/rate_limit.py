@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import math
+import re
+from typing import Optional
+
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.configurations.settings import Settings
+from src.services.rate_limit import (
+    RATE_LIMITED,
+    RATE_LIMITER_ERRORS,
+    RateLimiter,
+    RateLimitRule,
+    create_rate_limiter,
+    rate_limit_rules,
+)
+
+__all__ = ["RateLimitMiddleware", "API_KEY_HEADER", "route_class"]
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = b"x-api-key"
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+
+# Служебные ручки мониторинга не ограничиваются
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+# Тяжелые чтения: страницы списков, поиск, выгрузки, ленты изменений и общая статистика.
+# Остальные GET - дешевые чтения по ключу.
+LIST_PATHS = re.compile(
+    r"/api/v1/(books/?|books/(search|export|changes)|seller/?|seller/changes|seller/[^/]+/books(/export)?|stats/?)"
+)
+
+# Ленты изменений держат соединение долго (long-poll, SSE), поэтому их одновременные запросы
+# считаются отдельно и не занимают места обычных запросов клиента
+STREAM_PATHS = re.compile(r"/api/v1/(books|seller)/changes")
+
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+TOO_MANY_REQUESTS_BODY = orjson.dumps({"detail": "Too many requests"})
+
+
+# Класс ручки для лимитов: "write" для изменяющих запросов, "list" для тяжелых чтений, "read" для остальных.
+# Определяется по методу и пути до маршрутизации, чтобы отклоненный запрос стоил как можно меньше.
+def route_class(method: str, path: str) -> str:
+    if method not in READ_METHODS:
+        return "write"
+    if LIST_PATHS.fullmatch(path):
+        return "list"
+    return "read"
+
+
+# Ограничивает скорость запросов каждого клиента по классам ручек (src/services/rate_limit.py)
+# и число его одновременно выполняющихся запросов. Клиент - это известный API-ключ из X-API-Key
+# или IP-адрес: неизвестные ключи не учитываются, иначе лимит обходился бы сменой ключа.
+# Ограничение одновременных запросов считается в каждом воркере отдельно: оно защищает пул
+# соединений воркера от одного клиента с медленными запросами. Для лент изменений - свой лимит
+# (stream_concurrency), открытый поток не мешает клиенту делать обычные запросы.
+# Лимиты и бэкенд берутся из настроек приложения (rate_limit_*), limiter и rules подменяют их в тестах и бенчмарках.
+class RateLimitMiddleware:
+    def __init__(
+            self,
+            app: ASGIApp,
+            settings: Settings,
+            limiter: Optional[RateLimiter] = None,
+            rules: Optional[dict[str, RateLimitRule]] = None,
+    ) -> None:
+        self.app = app
+        self.settings = settings
+        self._limiter = limiter
+        self.rules = rate_limit_rules(settings) if rules is None else rules
+        self.concurrency = settings.rate_limit_concurrency
+        self.stream_concurrency = settings.rate_limit_stream_concurrency
+        self.trust_forwarded = settings.rate_limit_trust_forwarded
+        # В ключах ведер (и в Redis) лежит не сам API-ключ, а его короткий хэш
+        self._api_keys = {
+            key.encode(): "key:" + hashlib.sha256(key.encode()).hexdigest()[:16]
+            for key in (key.strip() for key in settings.rate_limit_api_keys.split(","))
+            if key
+        }
+        self._in_flight: dict[str, int] = {}
+        self._streams_in_flight: dict[str, int] = {}
+
+    @property
+    def limiter(self) -> RateLimiter:
+        if self._limiter is None:
+            self._limiter = create_rate_limiter(self.settings)
+        return self._limiter
+
+    def _client(self, scope: Scope) -> str:
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == API_KEY_HEADER and value in self._api_keys:
+                return self._api_keys[value]
+            if name == FORWARDED_FOR_HEADER and self.trust_forwarded:
+                forwarded = value.split(b",", 1)[0].strip().decode("latin-1")
+
+        if forwarded:
+            return "ip:" + forwarded
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        client = self._client(scope)
+        request_class = route_class(scope["method"], scope["path"])
+        if STREAM_PATHS.fullmatch(scope["path"]):
+            counters, limit, reason = self._streams_in_flight, self.stream_concurrency, "stream_concurrency"
+        else:
+            counters, limit, reason = self._in_flight, self.concurrency, "concurrency"
+
+        in_flight = counters.get(client, 0)
+        if limit and in_flight >= limit:
+            RATE_LIMITED.inc(route_class=request_class, reason=reason)
+            await self._reject(send, retry_after=1)
+            return
+
+        # Запрос занимает место до обращения к лимитеру: пока ждем Redis, параллельные запросы
+        # того же клиента уже видят его в счетчике
+        counters[client] = in_flight + 1
+        try:
+            rule = self.rules.get(request_class)
+            if rule is not None and (wait := await self._acquire(f"{request_class}:{client}", rule, request_class)):
+                RATE_LIMITED.inc(route_class=request_class, reason="rate")
+                await self._reject(send, retry_after=math.ceil(wait))
+                return
+
+            await self.app(scope, receive, send)
+        finally:
+            remaining = counters[client] - 1
+            if remaining:
+                counters[client] = remaining
+            else:
+                del counters[client]
+
+    # Недоступный лимитер (например, упал Redis) не должен ронять API: запрос пропускается без проверки
+    async def _acquire(self, key: str, rule: RateLimitRule, request_class: str) -> float:
+        try:
+            return await self.limiter.acquire(key, rule)
+        except Exception as e:
+            RATE_LIMITER_ERRORS.inc(route_class=request_class)
+            logger.warning("Rate limiter failed, request is let through: %s", e)
+            return 0
+
+    @staticmethod
+    async def _reject(send: Send, retry_after: int) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(TOO_MANY_REQUESTS_BODY)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": TOO_MANY_REQUESTS_BODY})
@@ -0,0 +1,31 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations.database import PRIMARY_PIN_COOKIE
+
+__all__ = ["PrimaryPinMiddleware"]
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+# После успешной записи ставит клиенту cookie, с которой его чтения в течение
+# pin_seconds (db_read_your_writes_seconds) идут на основную базу (read-your-writes при отставании реплик).
+class PrimaryPinMiddleware:
+    def __init__(self, app: ASGIApp, pin_seconds: float) -> None:
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                pin_until = time.time() + self.pin_seconds
+                cookie = f"{PRIMARY_PIN_COOKIE}={pin_until:.3f}; Max-Age={int(self.pin_seconds) + 1}; Path=/; HttpOnly"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
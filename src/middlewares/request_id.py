@@ -0,0 +1,49 @@
+import re
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.configurations.logs import current_request_id, debug_sampled, sample_debug
+
+__all__ = ["RequestIdMiddleware", "REQUEST_ID_HEADER"]
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+# id от клиента или балансировщика принимаем, только если он короткий и без спецсимволов:
+# он попадает в логи и в заголовок ответа
+VALID_REQUEST_ID = re.compile(rb"[A-Za-z0-9._:-]{1,128}")
+
+
+def _incoming_request_id(scope: Scope) -> str:
+    for name, value in scope["headers"]:
+        if name == REQUEST_ID_HEADER and VALID_REQUEST_ID.fullmatch(value):
+            return value.decode()
+    return uuid.uuid4().hex
+
+
+# Присваивает каждому HTTP-запросу id (берет из X-Request-ID или генерирует), кладет его в контекст
+# логирования и возвращает клиенту в X-Request-ID. Здесь же решается, попадают ли в лог
+# DEBUG-события этого запроса (см. src/configurations/logs.py).
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _incoming_request_id(scope)
+        id_token = current_request_id.set(request_id)
+        sampled_token = debug_sampled.set(sample_debug())
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            debug_sampled.reset(sampled_token)
+            current_request_id.reset(id_token)
@@ -0,0 +1,77 @@
+"""initial schema: sellers and books with indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+Базы, созданные до миграций через create_all(), уже содержат обе таблицы в этой схеме, но без индексов.
+Миграция принимает их как есть: таблицы создаются, только если их нет, индексы - IF NOT EXISTS.
+Перед уникальным индексом на e_mail проверяется, что в данных нет повторов: иначе миграция
+останавливается со списком повторяющихся адресов, и их нужно исправить вручную.
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sellers_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=50), nullable=False),
+        sa.Column("last_name", sa.String(length=50), nullable=False),
+        sa.Column("e_mail", sa.String(length=100), nullable=False),
+        sa.Column("password", sa.String(length=128), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    _check_unique_emails()
+    op.create_index("ix_sellers_table_e_mail", "sellers_table", ["e_mail"], unique=True, if_not_exists=True)
+
+    op.create_table(
+        "books_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(length=50), nullable=False),
+        sa.Column("author", sa.String(length=100), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("pages", sa.Integer(), nullable=False),
+        sa.Column("seller_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["seller_id"], ["sellers_table.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_books_table_author", "books_table", ["author"], if_not_exists=True)
+    op.create_index("ix_books_table_year", "books_table", ["year"], if_not_exists=True)
+    op.create_index("ix_books_table_seller_id", "books_table", ["seller_id"], if_not_exists=True)
+
+
+# Повторяющиеся email в существующей таблице не удаляются автоматически: у каждого продавца свои книги
+def _check_unique_emails() -> None:
+    if context.is_offline_mode():
+        return
+
+    duplicates = op.get_bind().execute(
+        sa.text("SELECT e_mail FROM sellers_table GROUP BY e_mail HAVING count(*) > 1 ORDER BY e_mail LIMIT 20")
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            {"message": "sellers_table.e_mail has duplicates, fix them before upgrading", "e_mails": duplicates}
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_books_table_seller_id", table_name="books_table")
+    op.drop_index("ix_books_table_year", table_name="books_table")
+    op.drop_index("ix_books_table_author", table_name="books_table")
+    op.drop_table("books_table")
+
+    op.drop_index("ix_sellers_table_e_mail", table_name="sellers_table")
+    op.drop_table("sellers_table")
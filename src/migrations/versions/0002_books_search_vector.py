@@ -0,0 +1,38 @@
+"""full-text search vector over book title and author
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "books_table",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, ''))", persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_books_table_search_vector", "books_table", ["search_vector"], postgresql_using="gin"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_books_table_search_vector", table_name="books_table", postgresql_using="gin")
+    op.drop_column("books_table", "search_vector")
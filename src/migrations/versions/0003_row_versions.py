@@ -0,0 +1,28 @@
+"""row version columns for books and sellers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Значение по умолчанию на стороне сервера заполняет существующие строки без переписывания таблицы
+    op.add_column("sellers_table", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+    op.add_column("books_table", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("books_table", "version")
+    op.drop_column("sellers_table", "version")
@@ -0,0 +1,28 @@
+"""delete books together with their seller on the database side
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FK_NAME = "books_table_seller_id_fkey"
+
+
+def upgrade() -> None:
+    op.drop_constraint(FK_NAME, "books_table", type_="foreignkey")
+    op.create_foreign_key(FK_NAME, "books_table", "sellers_table", ["seller_id"], ["id"], ondelete="CASCADE")
+
+
+def downgrade() -> None:
+    op.drop_constraint(FK_NAME, "books_table", type_="foreignkey")
+    op.create_foreign_key(FK_NAME, "books_table", "sellers_table", ["seller_id"], ["id"])
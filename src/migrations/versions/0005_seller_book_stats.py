@@ -0,0 +1,66 @@
+"""incrementally maintained book statistics per seller
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _seller_id_column() -> sa.Column:
+    return sa.Column("seller_id", sa.Integer(), sa.ForeignKey("sellers_table.id", ondelete="CASCADE"), nullable=False)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "seller_stats_table",
+        _seller_id_column(),
+        sa.Column("book_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("total_pages", sa.BigInteger(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("seller_id"),
+    )
+    op.create_table(
+        "seller_year_stats_table",
+        _seller_id_column(),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("book_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("seller_id", "year"),
+    )
+    op.create_table(
+        "seller_author_stats_table",
+        _seller_id_column(),
+        sa.Column("author", sa.String(length=100), nullable=False),
+        sa.Column("book_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("seller_id", "author"),
+    )
+
+    # Начальные значения счетчиков по уже существующим книгам (то же, что rebuild_book_stats())
+    op.execute(
+        "INSERT INTO seller_stats_table (seller_id, book_count, total_pages) "
+        "SELECT s.id, count(b.id), coalesce(sum(b.pages), 0) "
+        "FROM sellers_table s LEFT JOIN books_table b ON b.seller_id = s.id GROUP BY s.id"
+    )
+    op.execute(
+        "INSERT INTO seller_year_stats_table (seller_id, year, book_count) "
+        "SELECT seller_id, year, count(*) FROM books_table GROUP BY seller_id, year"
+    )
+    op.execute(
+        "INSERT INTO seller_author_stats_table (seller_id, author, book_count) "
+        "SELECT seller_id, author, count(*) FROM books_table GROUP BY seller_id, author"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("seller_author_stats_table")
+    op.drop_table("seller_year_stats_table")
+    op.drop_table("seller_stats_table")
@@ -0,0 +1,107 @@
+"""change feed: updated_at columns, changes table and triggers
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {"book": "books_table", "seller": "sellers_table"}
+SNAPSHOTS = {
+    "book": "'id', id, 'title', title, 'author', author, 'year', year, 'pages', pages, "
+            "'seller_id', seller_id, 'version', version, 'updated_at', updated_at",
+    "seller": "'id', id, 'first_name', first_name, 'last_name', last_name, 'e_mail', e_mail, "
+              "'version', version, 'updated_at', updated_at",
+}
+
+
+def upgrade() -> None:
+    for table in TABLES.values():
+        op.add_column(
+            table,
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        )
+
+    op.create_table(
+        "changes_table",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("xid", sa.BigInteger(), nullable=False),
+        sa.Column("entity", sa.String(length=10), nullable=False),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("op", sa.String(length=10), nullable=False),
+        sa.Column("data", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_changes_table_position", "changes_table", ["entity", "xid", "id"])
+    op.create_index(op.f("ix_changes_table_changed_at"), "changes_table", ["changed_at"])
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := now();
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    for entity, table in TABLES.items():
+        op.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION record_{entity}_changes() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    INSERT INTO changes_table (xid, entity, entity_id, op)
+                    SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'delete' FROM old_rows ORDER BY id;
+                ELSE
+                    INSERT INTO changes_table (xid, entity, entity_id, op, data)
+                    SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'upsert', jsonb_build_object({SNAPSHOTS[entity]})
+                    FROM new_rows ORDER BY id;
+                END IF;
+                PERFORM pg_notify('changes', '{entity}');
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_changes_insert AFTER INSERT ON {table} "
+            f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_changes_update AFTER UPDATE ON {table} "
+            f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_changes_delete AFTER DELETE ON {table} "
+            f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_updated_at BEFORE UPDATE ON {table} FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+        )
+
+
+def downgrade() -> None:
+    for entity, table in TABLES.items():
+        for trigger in ("changes_insert", "changes_update", "changes_delete", "updated_at"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_{trigger} ON {table}")
+        op.execute(f"DROP FUNCTION IF EXISTS record_{entity}_changes()")
+    op.execute("DROP FUNCTION IF EXISTS set_updated_at()")
+
+    op.drop_index(op.f("ix_changes_table_changed_at"), table_name="changes_table")
+    op.drop_index("ix_changes_table_position", table_name="changes_table")
+    op.drop_table("changes_table")
+    for table in TABLES.values():
+        op.drop_column(table, "updated_at")
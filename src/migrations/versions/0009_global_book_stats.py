@@ -0,0 +1,65 @@
+"""global book statistics rollup refreshed by a background job
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "global_stats_table",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("book_count", sa.BigInteger(), nullable=False),
+        sa.Column("total_pages", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "global_year_stats_table",
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("book_count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("year"),
+    )
+    op.create_table(
+        "global_author_stats_table",
+        sa.Column("author", sa.String(length=100), nullable=False),
+        sa.Column("book_count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("author"),
+    )
+    op.create_index(
+        "ix_global_author_stats_table_top",
+        "global_author_stats_table",
+        [sa.text("book_count DESC"), "author"],
+    )
+
+    # Начальная сводка по счетчикам продавцов (то же, что refresh_global_stats())
+    op.execute(
+        "INSERT INTO global_stats_table (id, book_count, total_pages) "
+        "SELECT 1, coalesce(sum(book_count), 0), coalesce(sum(total_pages), 0) FROM seller_stats_table"
+    )
+    op.execute(
+        "INSERT INTO global_year_stats_table (year, book_count) "
+        "SELECT year, sum(book_count) FROM seller_year_stats_table GROUP BY year"
+    )
+    op.execute(
+        "INSERT INTO global_author_stats_table (author, book_count) "
+        "SELECT author, sum(book_count) FROM seller_author_stats_table GROUP BY author"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_global_author_stats_table_top", table_name="global_author_stats_table")
+    op.drop_table("global_author_stats_table")
+    op.drop_table("global_year_stats_table")
+    op.drop_table("global_stats_table")
@@ -0,0 +1,90 @@
+"""change feed: skip updates that change no tracked fields (e.g. password rehash)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-21 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = {"book": "books_table", "seller": "sellers_table"}
+# Поля строки в ленте, как в миграции 0008. Изменение любого из них, кроме id и updated_at, попадает в ленту
+FIELDS = {
+    "book": ("id", "title", "author", "year", "pages", "seller_id", "version", "updated_at"),
+    "seller": ("id", "first_name", "last_name", "e_mail", "version", "updated_at"),
+}
+
+
+def _snapshot(fields: tuple[str, ...], alias: str = "") -> str:
+    return ", ".join(f"'{field}', {alias}{field}" for field in fields)
+
+
+def _row(alias: str, fields: tuple[str, ...]) -> str:
+    return "(" + ", ".join(f"{alias}.{field}" for field in fields if field not in ("id", "updated_at")) + ")"
+
+
+def _record_changes_function(entity: str, skip_untracked: bool) -> str:
+    fields = FIELDS[entity]
+    update_branch = f"""
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO changes_table (xid, entity, entity_id, op, data)
+                SELECT pg_current_xact_id()::text::bigint, '{entity}', new_rows.id, 'upsert',
+                       jsonb_build_object({_snapshot(fields, "new_rows.")})
+                FROM new_rows JOIN old_rows ON old_rows.id = new_rows.id
+                WHERE {_row("new_rows", fields)} IS DISTINCT FROM {_row("old_rows", fields)}
+                ORDER BY new_rows.id;
+                IF NOT FOUND THEN
+                    RETURN NULL;
+                END IF;""" if skip_untracked else ""
+    return f"""
+        CREATE OR REPLACE FUNCTION record_{entity}_changes() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                INSERT INTO changes_table (xid, entity, entity_id, op)
+                SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'delete' FROM old_rows ORDER BY id;{update_branch}
+            ELSE
+                INSERT INTO changes_table (xid, entity, entity_id, op, data)
+                SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'upsert', jsonb_build_object({_snapshot(fields)})
+                FROM new_rows ORDER BY id;
+            END IF;
+            PERFORM pg_notify('changes', '{entity}');
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """
+
+
+def upgrade() -> None:
+    for entity, table in TABLES.items():
+        op.execute(_record_changes_function(entity, skip_untracked=True))
+        op.execute(
+            f"CREATE OR REPLACE TRIGGER {table}_changes_update AFTER UPDATE ON {table} "
+            f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()"
+        )
+        op.execute(
+            f"CREATE OR REPLACE TRIGGER {table}_updated_at BEFORE UPDATE ON {table} FOR EACH ROW "
+            f"WHEN ({_row('OLD', FIELDS[entity])} IS DISTINCT FROM {_row('NEW', FIELDS[entity])}) "
+            f"EXECUTE FUNCTION set_updated_at()"
+        )
+
+
+def downgrade() -> None:
+    for entity, table in TABLES.items():
+        op.execute(_record_changes_function(entity, skip_untracked=False))
+        op.execute(
+            f"CREATE OR REPLACE TRIGGER {table}_changes_update AFTER UPDATE ON {table} "
+            f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()"
+        )
+        op.execute(
+            f"CREATE OR REPLACE TRIGGER {table}_updated_at BEFORE UPDATE ON {table} FOR EACH ROW "
+            f"EXECUTE FUNCTION set_updated_at()"
+        )
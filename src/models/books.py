@@ -1,26 +1,66 @@
-from sqlalchemy import String, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Computed, DateTime, FetchedValue, ForeignKey, Index, String, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import BaseModel
 from .sellers import Seller  # Здесь импортируем Seller, так как это не вызывает циклического импорта
 
+# Поисковый вектор по названию и автору. Конфигурация 'simple' не применяет стемминг,
+# поэтому одинаково работает для названий и имен на любом языке.
+SEARCH_VECTOR_EXPRESSION = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, ''))"
+
+
 class Book(BaseModel):
     __tablename__ = "books_table"
+    __table_args__ = (
+        Index("ix_books_table_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(50), nullable=False)
-    author: Mapped[str] = mapped_column(String(100), nullable=False)
-    year: Mapped[int]
+    author: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    year: Mapped[int] = mapped_column(index=True)
     pages: Mapped[int]
 
-    # Поле seller_id с внешним ключом на таблицу sellers_table
+    # Поле seller_id с внешним ключом на таблицу sellers_table.
+    # Книги удаляются вместе с продавцом на стороне БД (ON DELETE CASCADE), без загрузки в память.
+    # Индекс нужен для выборки книг продавца и для каскадного удаления.
     seller_id: Mapped[int] = mapped_column(
-        ForeignKey("sellers_table.id"),
-        nullable=False
+        ForeignKey("sellers_table.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+
+    # Вычисляемая колонка для полнотекстового поиска (GIN-индекс).
+    # Загружается только по явному запросу, чтобы не тянуть ее в обычные выборки.
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+        deferred=True,
+    )
+
+    # Версия строки: SQLAlchemy увеличивает ее при каждом UPDATE через ORM и проверяет в WHERE,
+    # поэтому параллельное изменение той же книги дает StaleDataError, а не тихую перезапись.
+    # Массовые операции (src/services/bulk.py) увеличивают ее сами. Из версии строится ETag.
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
+
+    # Время последнего изменения. Обновляется триггером БД при любом UPDATE (src/models/changes.py),
+    # в том числе массовом, поэтому ORM значение не передает.
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
     )
 
     # Связь "многие к одному": одна книга принадлежит одному продавцу
+    # Продавец не подгружается неявно: обращение к book.seller без явной загрузки - ошибка, а не скрытый запрос
     seller: Mapped["Seller"] = relationship(
         "Seller",
         back_populates="books",
+        lazy="raise",
     )
+
+    __mapper_args__ = {"version_id_col": version}
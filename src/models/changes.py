@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DDL, BigInteger, DateTime, Index, String, event, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+# Канал LISTEN/NOTIFY, в который триггеры сообщают о новых изменениях (payload - тип сущности)
+CHANGES_CHANNEL = "changes"
+
+
+# Журнал изменений книг и продавцов для инкрементальной синхронизации (GET /api/v1/books/changes).
+# Строки пишут триггеры БД, а не ручки: так в журнал попадают все пути записи, включая массовые
+# операции и каскадное удаление книг вместе с продавцом, которое выполняет сама БД.
+# xid - номер транзакции, записавшей изменение. Порядок выдачи - (xid, id), и отдаются только
+# изменения завершенных транзакций (xid меньше xmin текущего снимка), поэтому транзакция,
+# которая закоммитится позже, не окажется позади уже выданного курсора.
+class Change(BaseModel):
+    __tablename__ = "changes_table"
+    __table_args__ = (
+        Index("ix_changes_table_position", "entity", "xid", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    xid: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    entity: Mapped[str] = mapped_column(String(10), nullable=False)  # "book" или "seller"
+    entity_id: Mapped[int] = mapped_column(nullable=False)
+    op: Mapped[str] = mapped_column(String(10), nullable=False)  # "upsert" или "delete"
+    # Строка после изменения (для delete - None). Пароль продавца сюда не попадает.
+    data: Mapped[Optional[dict]] = mapped_column(JSONB)
+    changed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
+
+
+# Поля строки, изменение которых попадает в ленту и обновляет updated_at. UPDATE, который меняет
+# только остальные колонки (например, перехэширование пароля продавца при логине), в ленту не попадает.
+def _tracked_fields(fields: tuple[str, ...]) -> tuple[str, ...]:
+    return tuple(field for field in fields if field not in ("id", "updated_at"))
+
+
+def _row(alias: str, fields: tuple[str, ...]) -> str:
+    return "(" + ", ".join(f"{alias}.{field}" for field in fields) + ")"
+
+
+# Триггеры на уровне оператора с таблицами переходов: массовая вставка 10 тысяч книг - это один вызов
+# функции и один INSERT ... SELECT в журнал, а не 10 тысяч. Те же команды выполняют миграции 0008 и 0010.
+def _record_changes_function(entity: str, fields: tuple[str, ...]) -> str:
+    snapshot = ", ".join(f"'{field}', {field}" for field in fields)
+    new_snapshot = ", ".join(f"'{field}', new_rows.{field}" for field in fields)
+    tracked = _tracked_fields(fields)
+    return f"""
+CREATE OR REPLACE FUNCTION record_{entity}_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO changes_table (xid, entity, entity_id, op)
+        SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'delete' FROM old_rows ORDER BY id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO changes_table (xid, entity, entity_id, op, data)
+        SELECT pg_current_xact_id()::text::bigint, '{entity}', new_rows.id, 'upsert', jsonb_build_object({new_snapshot})
+        FROM new_rows JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE {_row("new_rows", tracked)} IS DISTINCT FROM {_row("old_rows", tracked)}
+        ORDER BY new_rows.id;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+    ELSE
+        INSERT INTO changes_table (xid, entity, entity_id, op, data)
+        SELECT pg_current_xact_id()::text::bigint, '{entity}', id, 'upsert', jsonb_build_object({snapshot})
+        FROM new_rows ORDER BY id;
+    END IF;
+    PERFORM pg_notify('{CHANGES_CHANNEL}', '{entity}');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _change_triggers(entity: str, table: str, fields: tuple[str, ...]) -> list[str]:
+    tracked = _tracked_fields(fields)
+    return [
+        f"CREATE OR REPLACE TRIGGER {table}_changes_insert AFTER INSERT ON {table} "
+        f"REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()",
+        f"CREATE OR REPLACE TRIGGER {table}_changes_update AFTER UPDATE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()",
+        f"CREATE OR REPLACE TRIGGER {table}_changes_delete AFTER DELETE ON {table} "
+        f"REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION record_{entity}_changes()",
+        f"CREATE OR REPLACE TRIGGER {table}_updated_at BEFORE UPDATE ON {table} FOR EACH ROW "
+        f"WHEN ({_row('OLD', tracked)} IS DISTINCT FROM {_row('NEW', tracked)}) EXECUTE FUNCTION set_updated_at()",
+    ]
+
+
+BOOK_CHANGE_FIELDS = ("id", "title", "author", "year", "pages", "seller_id", "version", "updated_at")
+SELLER_CHANGE_FIELDS = ("id", "first_name", "last_name", "e_mail", "version", "updated_at")
+
+SET_UPDATED_AT_FUNCTION = """
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := now();
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+CHANGE_TRIGGERS_DDL = [
+    SET_UPDATED_AT_FUNCTION,
+    _record_changes_function("book", BOOK_CHANGE_FIELDS),
+    _record_changes_function("seller", SELLER_CHANGE_FIELDS),
+    *_change_triggers("book", "books_table", BOOK_CHANGE_FIELDS),
+    *_change_triggers("seller", "sellers_table", SELLER_CHANGE_FIELDS),
+]
+
+
+# create_all (тесты, бенчмарки, db_startup_mode=recreate) создает триггеры после всех таблиц.
+# drop_all удаляет их вместе с таблицами, а функции пересоздаются через CREATE OR REPLACE.
+for _statement in CHANGE_TRIGGERS_DDL:
+    event.listen(BaseModel.metadata, "after_create", DDL(_statement))
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, LargeBinary, SmallInteger, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+
+# Ключи идемпотентности POST-запросов (заголовок Idempotency-Key) и сохраненные ответы на них.
+# Строка вставляется и заполняется в той же транзакции, что и создаваемая запись (src/services/idempotency.py),
+# поэтому закоммиченный ключ всегда хранит ответ, а откат запроса освобождает ключ.
+class IdempotencyKey(BaseModel):
+    __tablename__ = "idempotency_keys_table"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[bytes] = mapped_column(LargeBinary(32), nullable=False)  # sha256 метода, пути и тела
+    status_code: Mapped[Optional[int]] = mapped_column(SmallInteger)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
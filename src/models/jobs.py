@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, String, Text, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+
+# Условие незавершенной задачи. Запрос воркера использует его дословно, чтобы планировщик
+# мог применить частичный индекс (с параметрами вместо литералов он этого не докажет).
+PENDING_JOBS = text("status IN ('queued', 'running')")
+
+
+# Фоновые задачи (src/services/jobs.py). Очередь хранится в БД, поэтому задачи переживают перезапуск
+# воркеров, а выбирать их могут воркеры любого процесса (SELECT ... FOR UPDATE SKIP LOCKED).
+# run_at - время следующей попытки для задачи в очереди и срок аренды для выполняющейся:
+# если воркер умер, не завершив задачу, после run_at ее заберет другой воркер.
+class Job(BaseModel):
+    __tablename__ = "jobs_table"
+    __table_args__ = (
+        # Частичный индекс: воркеры ищут только незавершенные задачи, завершенные в нем не лежат
+        Index("ix_jobs_table_pending", "run_at", postgresql_where=PENDING_JOBS),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, server_default="{}")
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="queued")
+    attempts: Mapped[int] = mapped_column(nullable=False, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(nullable=False)
+    run_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
@@ -1,5 +1,7 @@
-from sqlalchemy import String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+
+from sqlalchemy import DateTime, FetchedValue, String, func
+from sqlalchemy.orm import Mapped, WriteOnlyMapped, mapped_column, relationship
 from .base import BaseModel
 # Убираем прямой импорт Book, используем строку в relationship
 
@@ -9,12 +11,28 @@ class Seller(BaseModel):
     id: Mapped[int] = mapped_column(primary_key=True)
     first_name: Mapped[str] = mapped_column(String(50), nullable=False)
     last_name: Mapped[str] = mapped_column(String(50), nullable=False)
-    e_mail: Mapped[str] = mapped_column(String(100), nullable=False)
+    e_mail: Mapped[str] = mapped_column(String(100), nullable=False, unique=True, index=True)
     password: Mapped[str] = mapped_column(String(128), nullable=False)
+    # Версия строки, увеличивается при каждом изменении продавца (см. Book.version)
+    version: Mapped[int] = mapped_column(nullable=False, server_default="1")
+    # Время последнего изменения, обновляется триггером БД (см. Book.updated_at)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
+    )
 
-    # Связь "один ко многим": один Seller -> много Book
-    books: Mapped[list["Book"]] = relationship(
+    # Связь "один ко многим": один Seller -> много Book.
+    # Коллекция только для записи: у продавца могут быть десятки тысяч книг, поэтому загрузить их все
+    # обращением к seller.books нельзя. Книги выбираются запросом постранично (seller.books.select()
+    # или with_parent), добавляются через seller.books.add().
+    books: WriteOnlyMapped["Book"] = relationship(
         "Book",  # вместо импорта используем строку
         back_populates="seller",
         cascade="all, delete-orphan",
+        # Книги удаляет сама БД (ON DELETE CASCADE), ORM не загружает их перед удалением продавца
+        passive_deletes=True,
     )
+
+    __mapper_args__ = {"version_id_col": version}
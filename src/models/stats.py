@@ -0,0 +1,66 @@
+from sqlalchemy import BigInteger, ForeignKey, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+# Агрегаты по книгам продавца, которые поддерживаются инкрементально в той же транзакции,
+# что и изменение книг (src/services/stats.py). Строки удаляются вместе с продавцом (ON DELETE CASCADE).
+# Общая статистика (/api/v1/stats) читается из сводных таблиц global_*: их пересчитывает из счетчиков
+# продавцов фоновая задача после изменений. Инкрементально они не обновляются: глобальная строка
+# стала бы точкой блокировки для всех записей книг сразу.
+
+
+# Число книг и сумма страниц продавца
+class SellerStats(BaseModel):
+    __tablename__ = "seller_stats_table"
+
+    seller_id: Mapped[int] = mapped_column(ForeignKey("sellers_table.id", ondelete="CASCADE"), primary_key=True)
+    book_count: Mapped[int] = mapped_column(nullable=False, server_default="0")
+    total_pages: Mapped[int] = mapped_column(BigInteger, nullable=False, server_default="0")
+
+
+# Гистограмма книг продавца по годам. Строки с нулевым счетчиком удаляются.
+class SellerYearStats(BaseModel):
+    __tablename__ = "seller_year_stats_table"
+
+    seller_id: Mapped[int] = mapped_column(ForeignKey("sellers_table.id", ondelete="CASCADE"), primary_key=True)
+    year: Mapped[int] = mapped_column(primary_key=True)
+    book_count: Mapped[int] = mapped_column(nullable=False)
+
+
+# Число книг продавца по авторам (для топа авторов). Строки с нулевым счетчиком удаляются.
+class SellerAuthorStats(BaseModel):
+    __tablename__ = "seller_author_stats_table"
+
+    seller_id: Mapped[int] = mapped_column(ForeignKey("sellers_table.id", ondelete="CASCADE"), primary_key=True)
+    author: Mapped[str] = mapped_column(String(100), primary_key=True)
+    book_count: Mapped[int] = mapped_column(nullable=False)
+
+
+# Сводка по всем книгам: одна строка (id = 1) с числом книг и суммой страниц
+class GlobalStats(BaseModel):
+    __tablename__ = "global_stats_table"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    total_pages: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+# Гистограмма всех книг по годам
+class GlobalYearStats(BaseModel):
+    __tablename__ = "global_year_stats_table"
+
+    year: Mapped[int] = mapped_column(primary_key=True)
+    book_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+# Число книг по авторам
+class GlobalAuthorStats(BaseModel):
+    __tablename__ = "global_author_stats_table"
+
+    author: Mapped[str] = mapped_column(String(100), primary_key=True)
+    book_count: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
+# Топ авторов читается по индексу в порядке ответа, без сортировки всей таблицы
+Index("ix_global_author_stats_table_top", GlobalAuthorStats.book_count.desc(), GlobalAuthorStats.author)
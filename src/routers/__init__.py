@@ -1,10 +1,16 @@
 # routers/__init__.py
 from fastapi import APIRouter
 
+from .health import health_router
+from .metrics import metrics_router
 from .v1.books import books_router
+from .v1.jobs import jobs_router
 from .v1.sellers import sellers_router
+from .v1.stats import stats_router
 
 v1_router = APIRouter(tags=["v1"], prefix="/api/v1")
 
 v1_router.include_router(books_router)
 v1_router.include_router(sellers_router)
+v1_router.include_router(stats_router)
+v1_router.include_router(jobs_router)
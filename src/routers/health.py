@@ -0,0 +1,21 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from src.configurations.database import Database, get_database
+from src.services.cache import CacheBackend, get_cache
+
+# Служебные ручки для мониторинга. Не версионируются и не входят в /api/v1.
+health_router = APIRouter(tags=["health"], prefix="/health")
+
+
+# Счетчики кэша: попадания, промахи, вытеснения и устаревшие записи
+@health_router.get("/cache")
+async def cache_health(cache: Annotated[CacheBackend, Depends(get_cache)]):
+    return await cache.get_stats()
+
+
+# Состояние пула соединений с БД: сколько соединений свободно, занято и открыто сверх пула
+@health_router.get("/db")
+async def db_health(database: Annotated[Database, Depends(get_database)]):
+    return database.pool_status()
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.services.metrics import render_metrics
+
+# Метрики процесса в формате Prometheus. Не версионируются и не входят в /api/v1.
+metrics_router = APIRouter(tags=["health"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,26 +1,102 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, Response, status
-from sqlalchemy import select
+from typing import Annotated, Collection, Optional
+
+from fastapi import APIRouter, Body, Depends, Query, Response, status
+from sqlalchemy import delete, select, update
 from src.models.books import Book
-from src.schemas import IncomingBook, ReturnedAllbooks, ReturnedBook, BookUpdate
-from icecream import ic
+from src.schemas import (
+    IncomingBook,
+    ReturnedAllbooks,
+    ReturnedBook,
+    BookUpdate,
+    BookIdsBulk,
+    BooksBulkUpdate,
+    BulkItemResult,
+    BulkMode,
+    BulkResult,
+    IncomingBooksBulk,
+    ReturnedBookSearch,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.configurations import get_async_session
+from src.configurations import (
+    READ_PINNED,
+    READ_PRIMARY,
+    READ_REPLICA,
+    get_async_primary_read_session,
+    get_async_read_session,
+    get_async_session,
+    read_source,
+)
 from fastapi import HTTPException
 from src.models.sellers import Seller
+from src.configurations.settings import AppSettings
+from src.services.cache import (
+    CacheBackend,
+    book_cache_key,
+    get_cache,
+    invalidate_after_commit,
+    seller_books_fence_key,
+    seller_cache_key,
+)
+from src.services.changes import CHANGES_RESPONSES, ChangesWait, LastEventId, Notifier, changes_response
+from src.services.etag import (
+    IfMatch,
+    IfNoneMatch,
+    book_etag,
+    etag_matches,
+    if_match_versions,
+    not_modified,
+    pack_cache_entry,
+    page_etag,
+    unpack_cache_entry,
+)
+from src.schemas.changes import ReturnedChanges
+from src.services.bulk import (
+    bulk_delete_books,
+    bulk_insert_books,
+    bulk_update_books,
+    check_bulk_size,
+    existing_seller_ids,
+)
+from src.services.export import ExportFormat, books_export_query, books_export_response
+from src.services.idempotency import Idempotency
+from src.services.pagination import PageLimit, SearchLimit, decode_cursor, encode_cursor
+from src.services.search import book_search_query
+from src.services.single_flight import Flights
+from src.services.stats import BookFacts, apply_book_changes
+from src.services.serialization import (
+    BOOK_COLUMNS,
+    BOOK_FIELDS,
+    MSGPACK_RESPONSES,
+    Accept,
+    json_response,
+    page_response,
+    rows_to_dicts,
+)
 
 books_router = APIRouter(tags=["books"], prefix="/books")
 
 # CRUD - Create, Read, Update, Delete
 
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения: может обслуживаться репликой
+ReadDBSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+# Сессия чтения с основной базы для заполнения кэша при промахе
+PrimaryReadDBSession = Annotated[AsyncSession, Depends(get_async_primary_read_session)]
+Cache = Annotated[CacheBackend, Depends(get_cache)]
+
 
 # Ручка для создания записи о книге в БД. Возвращает созданную книгу.
+# С заголовком Idempotency-Key повтор запроса возвращает ответ первого запроса (src/services/idempotency.py).
 @books_router.post("/", response_model=ReturnedBook, status_code=status.HTTP_201_CREATED)
 async def create_book(
         book: IncomingBook,
         session: DBSession,
+        cache: Cache,
+        idempotency: Idempotency,
 ):
+    if idempotency and (replay := await idempotency.claim(session)):
+        return replay
+
     # Проверяем, существует ли продавец с указанным seller_id
     seller = await session.get(Seller, book.seller_id)
     if not seller:
@@ -38,51 +114,367 @@ async def create_book(
 
     session.add(new_book)
     await session.flush()
-    return new_book
+    await apply_book_changes(session, added=[BookFacts(new_book.seller_id, new_book.year, new_book.author, new_book.pages)])
+    # Книга входит в карточку продавца, поэтому карточка в кэше после коммита больше не актуальна
+    invalidate_after_commit(session, cache, seller_cache_key(book.seller_id))
+
+    response = json_response({field: getattr(new_book, field) for field in BOOK_FIELDS}, status_code=status.HTTP_201_CREATED)
+    if idempotency:
+        await idempotency.save(session, response)
+    return response
+
+
+# В атомарном режиме любая ошибка отменяет всю операцию: исключение откатывает транзакцию сессии.
+def _raise_if_atomic_failed(mode: BulkMode, results: list[BulkItemResult]) -> None:
+    errors = [result.model_dump() for result in results if result.status == "error"]
+    if mode == BulkMode.atomic and errors:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+
+
+# Повторы одного id в запросе считаются ошибкой, в базу уходит только первое вхождение
+def _dedupe_ids(book_ids: list[int], ok_status: str) -> tuple[list[BulkItemResult], list[int]]:
+    results, unique, seen = [], [], set()
+    for index, book_id in enumerate(book_ids):
+        if book_id in seen:
+            results.append(BulkItemResult(index=index, id=book_id, status="error", error="Duplicate book id"))
+        else:
+            seen.add(book_id)
+            unique.append(index)
+            results.append(BulkItemResult(index=index, id=book_id, status=ok_status))
+    return results, unique
+
+
+def _mark_missing(results: list[BulkItemResult], affected_ids: Collection[int]) -> None:
+    for result in results:
+        if result.status != "error" and result.id not in affected_ids:
+            result.status, result.error = "error", "Book not found"
+
+
+# Сбрасывает после коммита кэш измененных книг и карточек их продавцов. books - словарь {id книги: seller_id}.
+def _invalidate_books(session: AsyncSession, cache: CacheBackend, books: dict[int, int]) -> None:
+    keys = {book_cache_key(book_id) for book_id in books}
+    keys |= {seller_cache_key(seller_id) for seller_id in books.values()}
+    invalidate_after_commit(session, cache, *keys)
+
+
+# Ручка для массового создания книг.
+# Продавцы проверяются одним запросом, а все книги вставляются одним INSERT ... RETURNING.
+@books_router.post("/bulk", response_model=BulkResult, status_code=status.HTTP_201_CREATED)
+async def create_books_bulk(
+        books: IncomingBooksBulk,
+        session: DBSession,
+        cache: Cache,
+        settings: AppSettings,
+        mode: BulkMode = BulkMode.atomic,
+):
+    check_bulk_size(books, settings.bulk_max_items)
+    known_sellers = await existing_seller_ids(session, (book.seller_id for book in books))
+
+    results = [BulkItemResult(index=index, status="created") for index in range(len(books))]
+    valid = []
+    for result, book in zip(results, books):
+        if book.seller_id in known_sellers:
+            valid.append(result)
+        else:
+            result.status, result.error = "error", "Seller not found"
+
+    _raise_if_atomic_failed(mode, results)
 
+    new_ids = await bulk_insert_books(session, [books[result.index].model_dump() for result in valid])
+    for result, new_id in zip(valid, new_ids):
+        result.id = new_id
 
-# Ручка, возвращающая все книги
-@books_router.get("/", response_model=ReturnedAllbooks)
-async def get_all_books(session: DBSession):
+    invalidate_after_commit(session, cache, *{seller_cache_key(books[result.index].seller_id) for result in valid})
+    return {"results": results}
+
+
+# Ручка для массового обновления книг (seller_id, как и в одиночном обновлении, не меняется)
+@books_router.put("/bulk", response_model=BulkResult)
+async def update_books_bulk(
+        books: BooksBulkUpdate,
+        session: DBSession,
+        cache: Cache,
+        settings: AppSettings,
+        mode: BulkMode = BulkMode.atomic,
+):
+    check_bulk_size(books, settings.bulk_max_items)
+    results, unique = _dedupe_ids([book.id for book in books], ok_status="updated")
+    updated = await bulk_update_books(session, [books[index].model_dump() for index in unique])
+
+    _mark_missing(results, updated)
+    _raise_if_atomic_failed(mode, results)
+    _invalidate_books(session, cache, updated)
+    return {"results": results}
+
+
+# Ручка для массового удаления книг. Тело запроса - список id.
+@books_router.delete("/bulk", response_model=BulkResult)
+async def delete_books_bulk(
+        session: DBSession,
+        cache: Cache,
+        settings: AppSettings,
+        book_ids: BookIdsBulk = Body(),
+        mode: BulkMode = BulkMode.atomic,
+):
+    check_bulk_size(book_ids, settings.bulk_max_items)
+    results, unique = _dedupe_ids(book_ids, ok_status="deleted")
+    deleted = await bulk_delete_books(session, [book_ids[index] for index in unique])
+
+    _mark_missing(results, deleted)
+    _raise_if_atomic_failed(mode, results)
+    _invalidate_books(session, cache, deleted)
+    return {"results": results}
+
+
+# Страница книг: (ETag, содержимое ответа). Одинаковые параллельные запросы страницы склеиваются в один.
+async def _load_books_page(
+        session: AsyncSession,
+        limit: int,
+        cursor: Optional[str],
+        author: Optional[str],
+        year_from: Optional[int],
+        year_to: Optional[int],
+        seller_id: Optional[int],
+) -> tuple[str, dict]:
     # Хотим видеть формат
-    # books: [{"id": 1, "title": "blabla", ...., "year": 2023},{...}]
-    query = select(Book)  # SELECT * FROM book
+    # books: [{"id": 1, "title": "blabla", ...., "year": 2023},{...}], next_cursor: "..."
+    query = select(*BOOK_COLUMNS).order_by(Book.id).limit(limit + 1)
+
+    if (last_id := decode_cursor(cursor)) is not None:
+        query = query.where(Book.id > last_id)
+    if author is not None:
+        query = query.where(Book.author == author)
+    if year_from is not None:
+        query = query.where(Book.year >= year_from)
+    if year_to is not None:
+        query = query.where(Book.year <= year_to)
+    if seller_id is not None:
+        query = query.where(Book.seller_id == seller_id)
+
     result = await session.execute(query)
-    books = result.scalars().all()
-    return {"books": books}
+    books = result.all()
+
+    # Запрашиваем на одну запись больше, чтобы понять, есть ли следующая страница
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1].id)
 
+    etag = page_etag("books", books, next_cursor)
+    return etag, {"books": rows_to_dicts(books, BOOK_FIELDS), "next_cursor": next_cursor}
 
-# Ручка для получения книги по её ИД
+
+# Ручка, возвращающая книги постранично.
+# Страница выбирается по курсору (keyset по id), а не через OFFSET,
+# поэтому скорость ответа не зависит от того, насколько "глубоко" клиент пролистал каталог.
+# Страница отдается с ETag из id и версий ее книг: при совпадении с If-None-Match ответ 304 без тела.
+# Книги выбираются колонками и кодируются orjson без построения ReturnedBook на каждую строку.
+# С Accept: application/msgpack страница отдается в MessagePack.
+@books_router.get("/", response_model=ReturnedAllbooks, responses=MSGPACK_RESPONSES)
+async def get_all_books(
+        session: ReadDBSession,
+        flights: Flights,
+        limit: PageLimit,
+        if_none_match: IfNoneMatch = None,
+        accept: Accept = None,
+        cursor: Optional[str] = None,
+        author: Optional[str] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        seller_id: Optional[int] = None,
+):
+    filters = (limit, cursor, author, year_from, year_to, seller_id)
+    source = read_source(session)
+    # Одинаковые параллельные запросы страницы склеиваются в один (src/services/single_flight.py).
+    # Ключ включает источник чтения: чтение с реплики не отдается как результат чтения с основной базы.
+    etag, content = await flights["get_all_books"].do(
+        (source, *filters), lambda: _load_books_page(session, *filters), shared=source != READ_PINNED
+    )
+    return page_response(content, etag, accept, if_none_match)
+
+
+# Ручка для выгрузки всего каталога потоком (NDJSON или CSV).
+# Строки читаются из серверного курсора пачками и сразу отдаются клиенту,
+# поэтому память не зависит от размера каталога.
+# Объявлена до /{book_id}, иначе путь /export попадет в ручку получения книги.
+@books_router.get("/export")
+async def export_books(
+        session: ReadDBSession,
+        export_format: ExportFormat = Query(default=ExportFormat.ndjson, alias="format"),
+):
+    return books_export_response(session, books_export_query(), export_format, filename="books")
+
+
+# Ручка ленты изменений книг для инкрементальной синхронизации (src/services/changes.py): изменения
+# после курсора since пачками до limit. С wait=N пустой ответ ждет новых изменений до N секунд,
+# с Accept: text/event-stream изменения идут потоком Server-Sent Events. Удаления приходят как op=delete,
+# в том числе для книг, удаленных вместе с продавцом. Читает с основной базы: на ней слушаются уведомления.
+# Объявлена до /{book_id}, иначе путь /changes попадет в ручку получения книги.
+@books_router.get("/changes", response_model=ReturnedChanges, responses=CHANGES_RESPONSES)
+async def get_book_changes(
+        session: DBSession,
+        notifier: Notifier,
+        limit: PageLimit,
+        wait: ChangesWait,
+        since: Optional[str] = None,
+        accept: Accept = None,
+        last_event_id: LastEventId = None,
+):
+    return await changes_response(session, notifier, "book", since, limit, wait, accept, last_event_id)
+
+
+# Ручка полнотекстового поиска по названию и автору с ранжированием.
+# Каждое слово ищется как префикс, поэтому ручка подходит для автодополнения.
+# Запрос обслуживается GIN-индексом по books_table.search_vector.
+@books_router.get("/search", response_model=ReturnedBookSearch)
+async def search_books(
+        session: ReadDBSession,
+        limit: SearchLimit,
+        q: str = Query(min_length=1, max_length=200),
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        pages_from: Optional[int] = None,
+        pages_to: Optional[int] = None,
+        seller_id: Optional[int] = None,
+):
+    query = book_search_query(
+        q,
+        limit=limit,
+        year_from=year_from,
+        year_to=year_to,
+        pages_from=pages_from,
+        pages_to=pages_to,
+        seller_id=seller_id,
+    )
+    if query is None:
+        return {"books": []}
+
+    result = await session.execute(query)
+    return {"books": result.mappings().all()}
+
+
+# Загрузка книги из БД с сохранением в кэш: (ETag, JSON в байтах) или None, если книги нет.
+# Аренда берется до чтения: если книгу за это время изменили, устаревшая строка в кэш не попадет.
+# Книга не кладется в кэш и пока удаляется ее продавец (забор seller_books_fence_key).
+# Параллельные загрузки одной книги склеиваются в одну (src/services/single_flight.py).
+async def _load_book(session: AsyncSession, cache: CacheBackend, book_id: int) -> Optional[tuple[str, bytes]]:
+    key = book_cache_key(book_id)
+    lease = await cache.lease(key)
+    if not (book := await session.get(Book, book_id)):
+        return None
+
+    etag = book_etag(book.id, book.version)
+    payload = ReturnedBook.model_validate(book).model_dump_json().encode()
+    await cache.fill(key, lease, pack_cache_entry(etag, payload), fence=seller_books_fence_key(book.seller_id))
+    return etag, payload
+
+
+# Ручка для получения книги по её ИД.
+# Ответ кэшируется уже сериализованным вместе с ETag, при попадании в кэш БД не запрашивается.
+# Если ETag совпал с If-None-Match, отвечаем 304 без тела.
+# Клиент, который недавно писал (read-your-writes), читает с основной базы мимо кэша и без склейки.
+# Промах при чтении с реплики загружается с основной базы и заполняет кэш: реплика может отставать,
+# и старая строка, положенная в кэш, осталась бы в нем на весь TTL.
 @books_router.get("/{book_id}", response_model=ReturnedBook)
-async def get_book(book_id: int, session: DBSession):
-    if result := await session.get(Book, book_id):
-        return result
+async def get_book(
+        book_id: int,
+        session: ReadDBSession,
+        primary_session: PrimaryReadDBSession,
+        cache: Cache,
+        flights: Flights,
+        if_none_match: IfNoneMatch = None,
+):
+    source = read_source(session)
+    if source == READ_REPLICA and cache.stores:
+        session, source = primary_session, READ_PRIMARY
+    if source != READ_PINNED and (entry := await cache.get(book_cache_key(book_id))) is not None:
+        etag, payload = unpack_cache_entry(entry)
+    elif loaded := await flights["get_book"].do(
+        (source, book_id), lambda: _load_book(session, cache, book_id), shared=source != READ_PINNED
+    ):
+        etag, payload = loaded
+    else:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
 
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+
+# Книга не изменена и не удалена: либо ее нет (404), либо не совпал If-Match (412).
+# Лишний запрос выполняется только в этом случае, успешный путь обходится одним запросом.
+async def _not_found_or_412(session: AsyncSession, book_id: int, versions: Optional[list[int]]) -> Response:
+    if versions is not None and await session.scalar(select(Book.id).where(Book.id == book_id)):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Resource has been modified")
     return Response(status_code=status.HTTP_404_NOT_FOUND)
 
 
-# Ручка для удаления книги
+# Ручка для удаления книги одним запросом DELETE ... RETURNING, без загрузки книги в сессию.
+# С заголовком If-Match удаляет, только если книга не менялась.
 @books_router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(book_id: int, session: DBSession):
-    deleted_book = await session.get(Book, book_id)
-    ic(deleted_book)  # Красивая и информативная замена для print. Полезна при отладке.
-    if deleted_book:
-        await session.delete(deleted_book)
-    else:
-        return Response(status_code=status.HTTP_404_NOT_FOUND)
+async def delete_book(book_id: int, session: DBSession, cache: Cache, if_match: IfMatch = None):
+    query = delete(Book).where(Book.id == book_id).returning(Book.id, Book.seller_id, Book.year, Book.author, Book.pages)
+    if (versions := if_match_versions(if_match, book_id)) is not None:
+        query = query.where(Book.version.in_(versions))
 
+    if (deleted_book := (await session.execute(query)).first()) is None:
+        return await _not_found_or_412(session, book_id, versions)
 
-# Ручка для обновления данных о книге
+    removed = BookFacts(deleted_book.seller_id, deleted_book.year, deleted_book.author, deleted_book.pages)
+    await apply_book_changes(session, removed=[removed])
+    _invalidate_books(session, cache, {deleted_book.id: deleted_book.seller_id})
+
+
+# Ручка для обновления данных о книге одним запросом UPDATE ... RETURNING.
+# С заголовком If-Match обновляет, только если книга не менялась (иначе 412).
 @books_router.put("/{book_id}", response_model=ReturnedBook)
-async def update_book(book_id: int, new_book_data: BookUpdate, session: DBSession):
+async def update_book(
+        book_id: int,
+        new_book_data: BookUpdate,
+        session: DBSession,
+        cache: Cache,
+        response: Response,
+        if_match: IfMatch = None,
+):
+    # Старые значения книги для статистики: строка блокируется и читается в том же запросе (CTE),
+    # а RETURNING отдает и новые, и старые значения
+    old_book = select(Book.id, Book.year, Book.author, Book.pages).where(Book.id == book_id).with_for_update().cte("old_book")
+
     # Обновляем поля книги за исключением seller_id (это поле не обновляем)
-    if updated_book := await session.get(Book, book_id):
-        updated_book.author = new_book_data.author
-        updated_book.title = new_book_data.title
-        updated_book.year = new_book_data.year
-        updated_book.pages = new_book_data.pages
+    query = (
+        update(Book)
+        .where(Book.id == old_book.c.id)
+        .values(
+            title=new_book_data.title,
+            author=new_book_data.author,
+            year=new_book_data.year,
+            pages=new_book_data.pages,
+            version=Book.version + 1,
+        )
+        .returning(
+            Book.id,
+            Book.title,
+            Book.author,
+            Book.year,
+            Book.pages,
+            Book.seller_id,
+            Book.version,
+            old_book.c.year.label("old_year"),
+            old_book.c.author.label("old_author"),
+            old_book.c.pages.label("old_pages"),
+        )
+    )
+    if (versions := if_match_versions(if_match, book_id)) is not None:
+        query = query.where(Book.version.in_(versions))
 
-        await session.flush()
-        return updated_book
+    if (updated_book := (await session.execute(query)).first()) is None:
+        return await _not_found_or_412(session, book_id, versions)
 
-    return Response(status_code=status.HTTP_404_NOT_FOUND)
+    await apply_book_changes(
+        session,
+        removed=[BookFacts(updated_book.seller_id, updated_book.old_year, updated_book.old_author, updated_book.old_pages)],
+        added=[BookFacts(updated_book.seller_id, updated_book.year, updated_book.author, updated_book.pages)],
+    )
+    _invalidate_books(session, cache, {updated_book.id: updated_book.seller_id})
+    response.headers["ETag"] = book_etag(updated_book.id, updated_book.version)
+    return updated_book._mapping
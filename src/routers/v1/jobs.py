@@ -0,0 +1,23 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations import get_async_session
+from src.models.jobs import Job
+from src.schemas.jobs import JobRead
+
+jobs_router = APIRouter(tags=["jobs"], prefix="/jobs")
+
+# Статус задачи читается с основной базы: реплика может еще не знать о только что созданной задаче
+DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+
+
+# GET /api/v1/jobs/{job_id} – состояние фоновой задачи (src/services/jobs.py): статус, попытки,
+# последняя ошибка и результат. Ссылку на нее возвращают ручки, ответившие 202.
+@jobs_router.get("/{job_id}", response_model=JobRead)
+async def get_job(job_id: int, session: DBSession):
+    job = await session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,81 +1,497 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy import select
+from typing import Annotated, List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, func, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from src.configurations import get_async_session
+from sqlalchemy.orm import with_parent
+from starlette.datastructures import State
+from src.configurations import (
+    READ_PINNED,
+    READ_PRIMARY,
+    READ_REPLICA,
+    get_async_primary_read_session,
+    get_async_read_session,
+    get_async_session,
+    read_source,
+    session_settings,
+)
+from src.configurations.settings import AppSettings
+from src.models.books import Book
 from src.models.sellers import Seller
-from src.schemas.sellers import SellerCreate, SellerRead, SellerDetail, SellerUpdate, ReturnedAllSellers
-from icecream import ic
+from src.schemas.sellers import (
+    SellerCreate,
+    SellerLogin,
+    SellerRead,
+    SellerDetail,
+    SellerUpdate,
+    ReturnedAllSellers,
+    ReturnedSellerBooks,
+)
+from src.schemas.changes import ReturnedChanges
+from src.schemas.jobs import JobRead
+from src.schemas.stats import SellerBookStats
+from src.services.cache import (
+    CacheBackend,
+    book_cache_key,
+    get_cache,
+    invalidate_after_commit,
+    seller_books_fence_key,
+    seller_cache_key,
+)
+from src.services.changes import CHANGES_RESPONSES, ChangesWait, LastEventId, Notifier, changes_response
+from src.services.etag import (
+    IfMatch,
+    IfNoneMatch,
+    check_if_match,
+    etag_matches,
+    books_state,
+    not_modified,
+    pack_cache_entry,
+    page_etag,
+    seller_etag,
+    unpack_cache_entry,
+)
+from src.services.export import ExportFormat, books_export_query, books_export_response
+from src.services.idempotency import Idempotency
+from src.services.jobs import Prefer, enqueue_job, job_accepted, job_handler, prefers_async
+from src.services.pagination import PageLimit, decode_cursor, encode_cursor
+from src.services.passwords import PasswordExecutor, hash_password, needs_rehash, verify_password
+from src.services.single_flight import Flights
+from src.services.stats import request_global_stats_refresh, seller_book_stats
+from src.services.serialization import (
+    SELLER_BOOK_COLUMNS,
+    SELLER_BOOK_FIELDS,
+    SELLER_COLUMNS,
+    SELLER_FIELDS,
+    MSGPACK_RESPONSES,
+    Accept,
+    json_response,
+    page_response,
+    rows_to_dicts,
+)
 
 sellers_router = APIRouter(tags=["seller"], prefix="/seller")
 
 DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения: может обслуживаться репликой
+ReadDBSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+# Сессия чтения с основной базы для заполнения кэша при промахе
+PrimaryReadDBSession = Annotated[AsyncSession, Depends(get_async_primary_read_session)]
+Cache = Annotated[CacheBackend, Depends(get_cache)]
+
+# Сколько книг удалять одним запросом при удалении продавца
+DELETE_BATCH_SIZE = 1000
+
+
+# Состояние книг продавца для ETag (см. src/services/etag.py::books_state) одним подзапросом.
+# Подзапрос подставляется и в RETURNING, чтобы получить ETag тем же запросом, что и изменение.
+# Строится один раз при импорте: он не зависит от параметров запроса.
+BOOKS_STATE = (
+    select(
+        func.concat_ws(
+            "-",
+            func.count(Book.id),
+            func.coalesce(func.sum(Book.version), 0),
+            func.coalesce(func.max(Book.id), 0),
+        )
+    )
+    .where(Book.seller_id == Seller.id)
+    .scalar_subquery()
+    .label("books_state")
+)
+
+
+# ETag карточки продавца одним запросом, без загрузки книг. None - продавца нет.
+async def _seller_etag_from_db(session: AsyncSession, seller_id: int) -> Optional[str]:
+    query = select(Seller.id, Seller.version, BOOKS_STATE).where(Seller.id == seller_id)
+    row = (await session.execute(query)).first()
+    return seller_etag(*row) if row else None
 
 
 # 1) POST /api/v1/seller – регистрация нового продавца
+# Уникальность email обеспечивает индекс: INSERT ... ON CONFLICT DO NOTHING не создает дубликат
+# и при параллельной регистрации с тем же email. С заголовком Idempotency-Key повтор запроса
+# возвращает ответ первого запроса (src/services/idempotency.py).
 @sellers_router.post("/", response_model=SellerRead, status_code=status.HTTP_201_CREATED)
-async def create_seller(seller: SellerCreate, session: DBSession):
-    # Проверяем, что продавец с таким email ещё не существует
-    result = await session.execute(select(Seller).where(Seller.e_mail == seller.e_mail))
-    if result.scalar_one_or_none():
+async def create_seller(
+    seller: SellerCreate,
+    session: DBSession,
+    executor: PasswordExecutor,
+    settings: AppSettings,
+    idempotency: Idempotency,
+):
+    if idempotency and (replay := await idempotency.claim(session)):
+        return replay
+
+    result = await session.execute(
+        pg_insert(Seller)
+        .values(
+            first_name=seller.first_name,
+            last_name=seller.last_name,
+            e_mail=seller.e_mail,
+            password=await hash_password(seller.password, executor, settings),  # Хэш считается в отдельном пуле потоков
+        )
+        .on_conflict_do_nothing(index_elements=[Seller.e_mail])
+        .returning(*SELLER_COLUMNS)
+    )
+    new_seller = result.first()
+    if new_seller is None:
         raise HTTPException(status_code=400, detail="Seller with this email already exists.")
 
-    new_seller = Seller(
-        first_name=seller.first_name,
-        last_name=seller.last_name,
-        e_mail=seller.e_mail,
-        password=seller.password  # В реальном проекте следует хэшировать пароль
+    response = json_response(dict(zip(SELLER_FIELDS, new_seller)), status_code=status.HTTP_201_CREATED)
+    if idempotency:
+        await idempotency.save(session, response)
+    return response
+
+
+# POST /api/v1/seller/login – проверка email и пароля продавца
+# Если пароль хранится открытым текстом или захэширован с устаревшими параметрами, он перехэшируется.
+@sellers_router.post("/login", response_model=SellerRead)
+async def login_seller(credentials: SellerLogin, session: DBSession, executor: PasswordExecutor, settings: AppSettings):
+    result = await session.execute(select(Seller).where(Seller.e_mail == credentials.e_mail))
+    seller = result.scalar_one_or_none()
+
+    if not await verify_password(credentials.password, seller.password if seller else None, executor, settings):
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+
+    if needs_rehash(seller.password, settings):
+        # Условный UPDATE вместо изменения объекта: если тот же продавец параллельно вошел
+        # и уже перехэшировал пароль, этот запрос просто ничего не изменит.
+        # Версия не увеличивается: пароль не входит ни в один ответ, и ETag карточки продавца
+        # (в том числе закэшированной) остается верным. Триггеры не меняют updated_at и не пишут
+        # изменение в ленту: они пропускают UPDATE, не затронувший полей ленты (src/models/changes.py).
+        await session.execute(
+            update(Seller)
+            .where(Seller.id == seller.id, Seller.password == seller.password)
+            .values(password=await hash_password(credentials.password, executor, settings))
+        )
+
+    return seller
+
+
+# Страница продавцов: (ETag, содержимое ответа). Одинаковые параллельные запросы страницы склеиваются в один.
+async def _load_sellers_page(session: AsyncSession, limit: int, cursor: Optional[str]) -> tuple[str, dict]:
+    query = select(*SELLER_COLUMNS).order_by(Seller.id).limit(limit + 1)
+    if (last_id := decode_cursor(cursor)) is not None:
+        query = query.where(Seller.id > last_id)
+
+    result = await session.execute(query)
+    sellers = result.all()
+
+    next_cursor = None
+    if len(sellers) > limit:
+        sellers = sellers[:limit]
+        next_cursor = encode_cursor(sellers[-1].id)
+
+    etag = page_etag("sellers", sellers, next_cursor)
+    return etag, {"sellers": rows_to_dicts(sellers, SELLER_FIELDS), "next_cursor": next_cursor}
+
+
+# 2) GET /api/v1/seller – получение списка продавцов постранично (без password)
+# Страница отдается с ETag из id и версий ее продавцов: при совпадении с If-None-Match ответ 304.
+# Ответ собирается из выбранных колонок и кодируется orjson напрямую (src/services/serialization.py),
+# response_model описывает контракт для документации. С Accept: application/msgpack страница отдается в MessagePack.
+@sellers_router.get("/", response_model=ReturnedAllSellers, responses=MSGPACK_RESPONSES)
+async def get_all_sellers(
+    session: ReadDBSession,
+    flights: Flights,
+    limit: PageLimit,
+    if_none_match: IfNoneMatch = None,
+    accept: Accept = None,
+    cursor: Optional[str] = None,
+):
+    source = read_source(session)
+    # Склейка одинаковых параллельных чтений, ключ включает источник чтения (как в src/routers/v1/books.py)
+    etag, content = await flights["get_all_sellers"].do(
+        (source, limit, cursor), lambda: _load_sellers_page(session, limit, cursor), shared=source != READ_PINNED
+    )
+    return page_response(content, etag, accept, if_none_match)
+
+
+# Лента изменений продавцов (см. get_book_changes в src/routers/v1/books.py). Пароль в ленту не попадает.
+# Объявлена до /{seller_id}, иначе путь /changes попадет в ручку получения продавца.
+@sellers_router.get("/changes", response_model=ReturnedChanges, responses=CHANGES_RESPONSES)
+async def get_seller_changes(
+    session: DBSession,
+    notifier: Notifier,
+    limit: PageLimit,
+    wait: ChangesWait,
+    since: Optional[str] = None,
+    accept: Accept = None,
+    last_event_id: LastEventId = None,
+):
+    return await changes_response(session, notifier, "seller", since, limit, wait, accept, last_event_id)
+
+
+# Агрегаты по книгам продавца для карточки: общее число книг и состояние для ETag
+# (src/services/etag.py::books_state) - одним проходом по книгам продавца
+BOOKS_AGGREGATES = (
+    select(
+        func.count(Book.id).label("books_total"),
+        func.coalesce(func.sum(Book.version), 0).label("books_version_sum"),
+        func.coalesce(func.max(Book.id), 0).label("books_max_id"),
     )
-    session.add(new_seller)
-    await session.flush()  # Чтобы сгенерировался id
-    await session.refresh(new_seller)
-    return new_seller
+    .where(Book.seller_id == Seller.id)
+    .lateral("books_aggregates")
+)
+
+
+# Загрузка карточки продавца из БД с сохранением в кэш по аренде (см. _load_book
+# в src/routers/v1/books.py): (ETag, JSON в байтах) или None, если продавца нет.
+# В карточку попадают только первые seller_detail_books (из настроек) книг, сколько бы их ни было у продавца.
+async def _load_seller(session: AsyncSession, cache: CacheBackend, seller_id: int) -> Optional[tuple[str, bytes]]:
+    key = seller_cache_key(seller_id)
+    lease = await cache.lease(key)
+    query = (
+        select(*SELLER_COLUMNS, *BOOKS_AGGREGATES.c)
+        .join(BOOKS_AGGREGATES, true())
+        .where(Seller.id == seller_id)
+    )
+    seller = (await session.execute(query)).first()
+    if not seller:
+        return None
 
+    limit = session_settings(session).seller_detail_books
+    query = select(*SELLER_BOOK_COLUMNS).where(Book.seller_id == seller_id).order_by(Book.id).limit(limit)
+    books = (await session.execute(query)).all() if limit and seller.books_total else []
 
-# 2) GET /api/v1/seller – получение списка всех продавцов (без password)
-@sellers_router.get("/", response_model=ReturnedAllSellers)
-async def get_all_sellers(session: DBSession):
-    result = await session.execute(select(Seller))
-    sellers = result.scalars().all()
-    return {"sellers": sellers}
+    etag = seller_etag(seller.id, seller.version, books_state(seller.books_total, seller.books_version_sum, seller.books_max_id))
+    content = dict(zip(SELLER_FIELDS, seller))
+    content["books"] = rows_to_dicts(books, SELLER_BOOK_FIELDS)
+    content["books_total"] = seller.books_total
+    content["books_next_cursor"] = encode_cursor(books[-1].id) if books and seller.books_total > len(books) else None
+    payload = orjson.dumps(content)
+    await cache.fill(key, lease, pack_cache_entry(etag, payload))
+    return etag, payload
 
-# 3) GET /api/v1/seller/{seller_id} – просмотр данных о конкретном продавце вместе со всеми его книгами
+
+# 3) GET /api/v1/seller/{seller_id} – просмотр данных о конкретном продавце вместе с его первыми книгами
+# Карточка кэшируется уже сериализованной вместе с ETag: при попадании в кэш оба запроса к БД не выполняются.
+# С заголовком If-None-Match сначала сверяется ETag одним агрегирующим запросом, и при совпадении
+# отдается 304 без загрузки книг. Продавец и книги выбираются колонками, без ORM-объектов и Pydantic-моделей.
+# Кэш и склейка для источников чтения - как в get_book (src/routers/v1/books.py).
 @sellers_router.get("/{seller_id}", response_model=SellerDetail)
-async def get_seller(seller_id: int, session: DBSession):
-    query = select(Seller).options(selectinload(Seller.books)).where(Seller.id == seller_id)
-    result = await session.execute(query)
-    seller = result.scalar_one_or_none()
+async def get_seller(
+    seller_id: int,
+    session: ReadDBSession,
+    primary_session: PrimaryReadDBSession,
+    cache: Cache,
+    flights: Flights,
+    if_none_match: IfNoneMatch = None,
+):
+    source = read_source(session)
+    if source != READ_PINNED and (entry := await cache.get(seller_cache_key(seller_id))) is not None:
+        etag, payload = unpack_cache_entry(entry)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+    if if_none_match is not None:
+        etag = await _seller_etag_from_db(session, seller_id)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Seller not found")
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+    # Промах при чтении с реплики загружается с основной базы и заполняет кэш.
+    # Параллельные загрузки одной карточки склеиваются в одну (src/services/single_flight.py)
+    if source == READ_REPLICA and cache.stores:
+        session, source = primary_session, READ_PRIMARY
+    loaded = await flights["get_seller"].do(
+        (source, seller_id), lambda: _load_seller(session, cache, seller_id), shared=source != READ_PINNED
+    )
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Seller not found")
+
+    etag, payload = loaded
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+
+# Страница книг продавца: (ETag, JSON в байтах) или None, если продавца нет
+async def _load_seller_books_page(
+    session: AsyncSession, seller_id: int, limit: int, cursor: Optional[str]
+) -> Optional[tuple[str, bytes]]:
+    query = select(*SELLER_BOOK_COLUMNS).where(Book.seller_id == seller_id).order_by(Book.id).limit(limit + 1)
+    if (last_id := decode_cursor(cursor)) is not None:
+        query = query.where(Book.id > last_id)
+    books = (await session.execute(query)).all()
+
+    # Продавец проверяется отдельным запросом, только если страница пустая
+    if not books and await session.scalar(select(Seller.id).where(Seller.id == seller_id)) is None:
+        return None
+
+    next_cursor = None
+    if len(books) > limit:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1].id)
+
+    etag = page_etag(f"seller_books:{seller_id}", books, next_cursor)
+    return etag, orjson.dumps({"books": rows_to_dicts(books, SELLER_BOOK_FIELDS), "next_cursor": next_cursor})
+
+
+# GET /api/v1/seller/{seller_id}/books – книги продавца постранично (keyset по id, как GET /api/v1/books).
+# Продолжает список из карточки продавца: ее books_next_cursor передается сюда как cursor.
+@sellers_router.get("/{seller_id}/books", response_model=ReturnedSellerBooks)
+async def get_seller_books(
+    seller_id: int,
+    session: ReadDBSession,
+    flights: Flights,
+    limit: PageLimit,
+    if_none_match: IfNoneMatch = None,
+    cursor: Optional[str] = None,
+):
+    source = read_source(session)
+    loaded = await flights["get_seller_books"].do(
+        (source, seller_id, limit, cursor),
+        lambda: _load_seller_books_page(session, seller_id, limit, cursor),
+        shared=source != READ_PINNED,
+    )
+    if loaded is None:
+        raise HTTPException(status_code=404, detail="Seller not found")
+
+    etag, payload = loaded
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
+
+
+# GET /api/v1/seller/{seller_id}/books/export – потоковая выгрузка книг продавца (NDJSON или CSV)
+@sellers_router.get("/{seller_id}/books/export")
+async def export_seller_books(
+    seller_id: int,
+    session: ReadDBSession,
+    export_format: ExportFormat = Query(default=ExportFormat.ndjson, alias="format"),
+):
+    seller = await session.get(Seller, seller_id)
     if not seller:
         raise HTTPException(status_code=404, detail="Seller not found")
-    return seller
+
+    query = books_export_query().where(with_parent(seller, Seller.books))
+    return books_export_response(session, query, export_format, filename=f"seller_{seller_id}_books")
+
+
+# GET /api/v1/seller/{seller_id}/stats – статистика по книгам продавца: число книг, сумма страниц,
+# гистограмма по годам и топ авторов. Читается из счетчиков (src/services/stats.py), а не из books_table.
+@sellers_router.get("/{seller_id}/stats", response_model=SellerBookStats)
+async def get_seller_stats(
+    seller_id: int,
+    session: ReadDBSession,
+    top: int = Query(default=10, ge=1, le=100),
+):
+    stats = await seller_book_stats(session, seller_id, top)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Seller not found")
+    return stats
 
 
 # 4) PUT /api/v1/seller/{seller_id} – обновление данных о продавце (без изменения книг и пароля)
+# Один запрос UPDATE ... RETURNING: он же возвращает состояние книг для ETag.
+# С заголовком If-Match (ETag карточки продавца) обновляет, только если продавец и его книги не менялись:
+# ETag до изменения восстанавливается по версии из RETURNING (она только что увеличилась на 1),
+# а при несовпадении исключение откатывает транзакцию вместе с обновлением.
+# Email, занятый другим продавцом, - ответ 400, как при регистрации.
 @sellers_router.put("/{seller_id}", response_model=SellerRead)
-async def update_seller(seller_id: int, seller_update: SellerUpdate, session: DBSession):
-    seller = await session.get(Seller, seller_id)
+async def update_seller(
+    seller_id: int,
+    seller_update: SellerUpdate,
+    session: DBSession,
+    cache: Cache,
+    response: Response,
+    if_match: IfMatch = None,
+):
+    query = (
+        update(Seller)
+        .where(Seller.id == seller_id)
+        .values(
+            first_name=seller_update.first_name,
+            last_name=seller_update.last_name,
+            e_mail=seller_update.e_mail,
+            version=Seller.version + 1,
+        )
+        # Поле password и книги не обновляем
+        .returning(Seller.id, Seller.first_name, Seller.last_name, Seller.e_mail, Seller.version, BOOKS_STATE)
+    )
+    try:
+        seller = (await session.execute(query)).first()
+    except IntegrityError:
+        # Единственное ограничение, которое может нарушить это обновление, - уникальность email.
+        # Транзакция откатывается вместе с исключением.
+        raise HTTPException(status_code=400, detail="Seller with this email already exists.")
     if not seller:
         raise HTTPException(status_code=404, detail="Seller not found")
+    if if_match is not None:
+        check_if_match(if_match, seller_etag(seller.id, seller.version - 1, seller.books_state))
 
-    seller.first_name = seller_update.first_name
-    seller.last_name = seller_update.last_name
-    seller.e_mail = seller_update.e_mail
-    # Поле password и книги не обновляем
+    invalidate_after_commit(session, cache, seller_cache_key(seller_id))
+    response.headers["ETag"] = seller_etag(seller.id, seller.version, seller.books_state)
+    return seller._mapping
+
+
+# Удаление продавца и его книг. Общее для ручки и фоновой задачи.
+#   - Строка продавца блокируется первой: добавление книги этому продавцу (проверка внешнего ключа)
+#     ждет конца транзакции и не проскочит между удалением книг и удалением продавца.
+#   - Книги удаляются пачками DELETE ... RETURNING id, и ключи кэша каждой пачки сбрасываются сразу,
+#     поэтому память не зависит от размера каталога. Чтобы до коммита (или до отката) чтение не вернуло
+#     в кэш удаляемую книгу, на книги продавца ставится забор: fill() для них не проходит.
+#     Забор продлевается на каждой пачке и снимается после коммита, после отката истекает через TTL кэша.
+async def _delete_seller(session: AsyncSession, cache: CacheBackend, seller_id: int, if_match: Optional[str]) -> None:
+    query = select(Seller.id, Seller.version, BOOKS_STATE).where(Seller.id == seller_id).with_for_update(of=Seller)
+    seller = (await session.execute(query)).first()
+    if not seller:
+        raise HTTPException(status_code=404, detail="Seller not found")
+    if if_match is not None:
+        check_if_match(if_match, seller_etag(seller.id, seller.version, seller.books_state))
+
+    fence = seller_books_fence_key(seller_id)
+    batch = select(Book.id).where(Book.seller_id == seller_id).limit(DELETE_BATCH_SIZE)
+    delete_books = delete(Book).where(Book.id.in_(batch.scalar_subquery())).returning(Book.id)
+    while True:
+        await cache.fence(fence)
+        book_ids = (await session.scalars(delete_books)).all()
+        await cache.delete(*(book_cache_key(book_id) for book_id in book_ids))
+        if len(book_ids) < DELETE_BATCH_SIZE:
+            break
+
+    # Счетчики продавца удаляются вместе с ним (ON DELETE CASCADE), общая статистика пересчитывается задачей
+    await session.execute(delete(Seller).where(Seller.id == seller_id))
+    await request_global_stats_refresh(session)
+    invalidate_after_commit(session, cache, seller_cache_key(seller_id), fence)
 
-    await session.flush()
-    await session.refresh(seller)
-    return seller
+
+# Фоновая задача удаления продавца (src/services/jobs.py). If-Match сверяется еще раз в момент удаления.
+@job_handler("delete_seller")
+async def _delete_seller_job(session: AsyncSession, payload: dict, app_state: State) -> dict:
+    await _delete_seller(session, app_state.cache, payload["seller_id"], payload.get("if_match"))
+    return {"seller_id": payload["seller_id"], "deleted": True}
 
 
 # 5) DELETE /api/v1/seller/{seller_id} – удаление продавца (и каскадное удаление его книг)
-@sellers_router.delete("/{seller_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_seller(seller_id: int, session: DBSession):
-    seller = await session.get(Seller, seller_id)
-    if not seller:
+# С заголовком If-Match удаляет, только если карточка продавца не менялась.
+# С заголовком Prefer: respond-async удаление (для продавца с большим каталогом - долгое) выполняется
+# фоновой задачей: ручка только проверяет продавца и If-Match и отвечает 202 со ссылкой на задачу.
+@sellers_router.delete(
+    "/{seller_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobRead, "description": "Deletion is queued as a background job"}},
+)
+async def delete_seller(
+    seller_id: int,
+    session: DBSession,
+    cache: Cache,
+    if_match: IfMatch = None,
+    prefer: Prefer = None,
+):
+    if not prefers_async(prefer):
+        await _delete_seller(session, cache, seller_id, if_match)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    etag = await _seller_etag_from_db(session, seller_id)
+    if etag is None:
         raise HTTPException(status_code=404, detail="Seller not found")
+    check_if_match(if_match, etag)
 
-    ic(seller)  # Для отладки (можно убрать)
-    await session.delete(seller)
-    # Каскадное удаление книг настроено в модели (cascade="all, delete-orphan")
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    job = await enqueue_job(session, "delete_seller", {"seller_id": seller_id, "if_match": if_match})
+    return job_accepted(job)
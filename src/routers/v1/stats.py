@@ -0,0 +1,43 @@
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import State
+
+from src.configurations import get_async_read_session, get_async_session
+from src.schemas.jobs import JobRead
+from src.schemas.stats import BookStats
+from src.services.jobs import enqueue_job, job_accepted, job_handler
+from src.services.stats import global_book_stats, rebuild_book_stats
+
+stats_router = APIRouter(tags=["stats"])
+
+DBSession = Annotated[AsyncSession, Depends(get_async_session)]
+# Сессия только для чтения: может обслуживаться репликой
+ReadDBSession = Annotated[AsyncSession, Depends(get_async_read_session)]
+
+
+# GET /api/v1/stats – статистика по всем книгам: число книг, сумма страниц, гистограмма по годам и топ авторов.
+# Читается из сводных таблиц, которые фоновая задача пересчитывает после изменений книг
+# (src/services/stats.py), поэтому может отставать на stats_refresh_delay_seconds и время пересчета.
+@stats_router.get("/stats", response_model=BookStats)
+async def get_stats(
+    session: ReadDBSession,
+    top: int = Query(default=10, ge=1, le=100),
+):
+    return await global_book_stats(session, top)
+
+
+# Фоновая задача пересчета счетчиков статистики (src/services/jobs.py)
+@job_handler("rebuild_stats")
+async def _rebuild_stats_job(session: AsyncSession, payload: dict, app_state: State) -> dict:
+    await rebuild_book_stats(session, payload.get("seller_id"))
+    return {"seller_id": payload.get("seller_id")}
+
+
+# POST /api/v1/stats/rebuild – пересчет счетчиков статистики по books_table (всех или одного продавца).
+# Пересчет сканирует книги, поэтому всегда выполняется фоновой задачей: ответ 202 со ссылкой на задачу.
+@stats_router.post("/stats/rebuild", response_model=JobRead, status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_stats(session: DBSession, seller_id: Optional[int] = None):
+    job = await enqueue_job(session, "rebuild_stats", {"seller_id": seller_id})
+    return job_accepted(job)
@@ -1,7 +1,25 @@
-from pydantic import BaseModel, Field, field_validator
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, conlist, field_validator
 from pydantic_core import PydanticCustomError
 
-__all__ = ["IncomingBook", "ReturnedBook", "ReturnedAllbooks", "BookUpdate"]
+
+__all__ = [
+    "IncomingBook",
+    "ReturnedBook",
+    "ReturnedAllbooks",
+    "BookUpdate",
+    "BookBulkUpdate",
+    "BulkMode",
+    "BulkItemResult",
+    "BulkResult",
+    "IncomingBooksBulk",
+    "BooksBulkUpdate",
+    "BookIdsBulk",
+    "BookSearchResult",
+    "ReturnedBookSearch",
+]
 
 # Базовый класс "Книги", содержащий поля, которые есть во всех классах-наследниках.
 class BaseBook(BaseModel):
@@ -9,8 +27,7 @@ class BaseBook(BaseModel):
     author: str
     year: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Класс для валидации входящих данных. Не содержит id, т.к. его присваивает БД.
 class IncomingBook(BaseBook):
@@ -30,12 +47,22 @@ class ReturnedBook(BaseBook):
     pages: int
     seller_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
-# Класс для возврата массива объектов "Книга"
+# Класс для возврата массива объектов "Книга".
+# next_cursor передается в следующий запрос, чтобы получить следующую страницу.
+# Если он равен None - страница последняя.
 class ReturnedAllbooks(BaseModel):
     books: list[ReturnedBook]
+    next_cursor: Optional[str] = None
+
+# Книга в результатах поиска - вместе с релевантностью (чем больше rank, тем выше в выдаче)
+class BookSearchResult(ReturnedBook):
+    rank: float
+
+
+class ReturnedBookSearch(BaseModel):
+    books: list[BookSearchResult]
 
 class ReturnedBookNoSellerId(BaseModel):
     id: int
@@ -44,8 +71,7 @@ class ReturnedBookNoSellerId(BaseModel):
     year: int
     pages: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class BookUpdate(BaseModel):
     title: str
@@ -53,5 +79,35 @@ class BookUpdate(BaseModel):
     year: int
     pages: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Книга для массового обновления - в отличие от BookUpdate содержит id
+class BookBulkUpdate(BookUpdate):
+    id: int
+
+
+# Режим массовой операции:
+# atomic - если хотя бы один элемент не прошел, не применяется ничего;
+# best_effort - применяются все корректные элементы, ошибки возвращаются по каждому элементу.
+class BulkMode(str, Enum):
+    atomic = "atomic"
+    best_effort = "best_effort"
+
+
+# Результат по одному элементу массовой операции. index - позиция элемента во входном списке.
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    error: Optional[str] = None
+
+
+class BulkResult(BaseModel):
+    results: list[BulkItemResult]
+
+
+# Верхняя граница размера зависит от настроек приложения и проверяется в ручках (src/services/bulk.py::check_bulk_size)
+IncomingBooksBulk = conlist(IncomingBook, min_length=1)
+BooksBulkUpdate = conlist(BookBulkUpdate, min_length=1)
+BookIdsBulk = conlist(int, min_length=1)
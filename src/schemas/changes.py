@@ -0,0 +1,26 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+__all__ = ["ChangeOp", "ChangeEvent", "ReturnedChanges"]
+
+
+# upsert - строка создана или изменена (в data ее новое состояние), delete - строка удалена
+class ChangeOp(str, Enum):
+    upsert = "upsert"
+    delete = "delete"
+
+
+class ChangeEvent(BaseModel):
+    op: ChangeOp
+    id: int
+    data: Optional[dict]
+    changed_at: datetime
+
+
+# Пачка изменений и курсор для следующего запроса (есть всегда, даже если изменений нет)
+class ReturnedChanges(BaseModel):
+    changes: list[ChangeEvent]
+    next_cursor: str
@@ -0,0 +1,32 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+__all__ = ["JobStatus", "JobRead"]
+
+
+# Состояние фоновой задачи:
+# queued - ждет выполнения (в том числе повторной попытки после ошибки);
+# running - выполняется; succeeded - выполнена; failed - исчерпаны все попытки.
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    last_error: Optional[str]
+    result: Optional[dict]
+    created_at: datetime
+    finished_at: Optional[datetime]
+
+    model_config = ConfigDict(from_attributes=True)
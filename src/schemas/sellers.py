@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import List, Optional
 from src.schemas.books import ReturnedBookNoSellerId  # Эта схема должна быть определена в вашем проекте
 
 # Базовая схема с общими полями (без пароля)
@@ -8,20 +8,32 @@ class SellerBase(BaseModel):
     last_name: str
     e_mail: EmailStr
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Схема для создания продавца – включает пароль
 class SellerCreate(SellerBase):
     password: str
 
+# Схема для входа продавца по email и паролю
+class SellerLogin(BaseModel):
+    e_mail: EmailStr
+    password: str
+
 # Схема для возврата данных о продавце (без поля password)
 class SellerRead(SellerBase):
     id: int = Field(..., example=1)
 
-# Схема для детального представления продавца – включает список книг
+# Схема для детального представления продавца – включает первые книги продавца (по id),
+# их общее число и курсор для продолжения списка через GET /api/v1/seller/{id}/books
 class SellerDetail(SellerRead):
     books: List[ReturnedBookNoSellerId] = Field(default_factory=list)
+    books_total: int = 0
+    books_next_cursor: Optional[str] = None
+
+# Страница книг продавца
+class ReturnedSellerBooks(BaseModel):
+    books: List[ReturnedBookNoSellerId]
+    next_cursor: Optional[str] = None
 
 # Схема для обновления данных о продавце (без изменения пароля и книг)
 class SellerUpdate(BaseModel):
@@ -29,11 +41,10 @@ class SellerUpdate(BaseModel):
     last_name: str
     e_mail: EmailStr
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class ReturnedAllSellers(BaseModel):
     sellers: List[SellerRead]
+    next_cursor: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+
+__all__ = ["YearCount", "AuthorCount", "BookStats", "SellerBookStats"]
+
+
+class YearCount(BaseModel):
+    year: int
+    book_count: int
+
+
+class AuthorCount(BaseModel):
+    author: str
+    book_count: int
+
+
+# Статистика по книгам: число книг, сумма страниц, гистограмма по годам (по возрастанию года)
+# и самые частые авторы (по убыванию числа книг)
+class BookStats(BaseModel):
+    book_count: int
+    total_pages: int
+    years: list[YearCount]
+    top_authors: list[AuthorCount]
+
+
+class SellerBookStats(BookStats):
+    seller_id: int
@@ -0,0 +1,166 @@
+from typing import Iterable, Sequence
+
+from fastapi.exceptions import RequestValidationError
+from sqlalchemy import Integer, String, any_, bindparam, column, delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.services.stats import BookFacts, apply_book_changes
+
+__all__ = ["check_bulk_size", "existing_seller_ids", "bulk_insert_books", "bulk_update_books", "bulk_delete_books"]
+
+# Все массовые операции передают данные в PostgreSQL массивами и разворачивают их через unnest().
+# Так любой объем данных уходит в базу одним запросом (одним round trip),
+# а число параметров не упирается в лимит протокола (32767 на запрос).
+
+
+# Ограничиваем размер одного запроса (bulk_max_items из настроек приложения), чтобы он не занимал
+# воркер и память надолго. Ошибка 422 в том же формате, что и у conlist(max_length=...).
+def check_bulk_size(items: Sequence, max_items: int) -> None:
+    if len(items) > max_items:
+        raise RequestValidationError([{
+            "type": "too_long",
+            "loc": ("body",),
+            "msg": f"List should have at most {max_items} items after validation, not {len(items)}",
+            "input": None,
+            "ctx": {"field_type": "List", "max_length": max_items, "actual_length": len(items)},
+        }])
+
+
+def _array(name: str, values: list, item_type) -> bindparam:
+    return bindparam(name, value=values, type_=ARRAY(item_type))
+
+
+# Блокирует строки книг в порядке возрастания id. Без этого два параллельных массовых
+# запроса с пересекающимися id блокируют строки в разном порядке и ловят deadlock.
+# columns - значения книг до изменения, которые нужно вернуть вместе с id.
+def _locked_books(book_ids: list[int], *columns):
+    return (
+        select(Book.id, *columns)
+        .where(Book.id == any_(_array("locked_ids", book_ids, Integer)))
+        .order_by(Book.id)
+        .with_for_update()
+        .cte("locked_books")
+    )
+
+
+async def existing_seller_ids(session: AsyncSession, seller_ids: Iterable[int]) -> set[int]:
+    # Одна проверка "id = ANY(массив)" (аналог IN) вместо session.get() на каждую книгу
+    query = select(Seller.id).where(Seller.id == any_(_array("seller_ids", list(set(seller_ids)), Integer)))
+    result = await session.execute(query)
+    return set(result.scalars().all())
+
+
+# Возвращает id новых книг в порядке входных строк.
+# Порядок выдачи значений последовательности и порядок RETURNING в INSERT ... SELECT не гарантированы,
+# поэтому каждая строка unnest() нумеруется (WITH ORDINALITY) и получает свой id через nextval()
+# в CTE: CTE с volatile-функцией вычисляется один раз, и пара (номер строки, id) фиксирована.
+# Книги вставляются с этими id, а результат сортируется по номеру строки.
+async def bulk_insert_books(session: AsyncSession, rows: Sequence[dict]) -> list[int]:
+    if not rows:
+        return []
+
+    source = func.unnest(
+        _array("titles", [row["title"] for row in rows], String),
+        _array("authors", [row["author"] for row in rows], String),
+        _array("years", [row["year"] for row in rows], Integer),
+        _array("pages", [row["pages"] for row in rows], Integer),
+        _array("seller_ids", [row["seller_id"] for row in rows], Integer),
+    ).table_valued(
+        column("title", String),
+        column("author", String),
+        column("year", Integer),
+        column("pages", Integer),
+        column("seller_id", Integer),
+        with_ordinality="ordinality",
+    ).render_derived()
+    numbered = select(
+        func.nextval(func.pg_get_serial_sequence(Book.__tablename__, "id")).label("id"),
+        source.c.title,
+        source.c.author,
+        source.c.year,
+        source.c.pages,
+        source.c.seller_id,
+        source.c.ordinality,
+    ).cte("numbered")
+    inserted = (
+        insert(Book)
+        .from_select(
+            ["id", "title", "author", "year", "pages", "seller_id"],
+            select(numbered.c.id, numbered.c.title, numbered.c.author, numbered.c.year, numbered.c.pages, numbered.c.seller_id),
+        )
+        .returning(Book.id, Book.seller_id, Book.year, Book.author, Book.pages)
+        .cte("inserted")
+    )
+    query = select(inserted).join(numbered, numbered.c.id == inserted.c.id).order_by(numbered.c.ordinality)
+    inserted_books = (await session.execute(query)).all()
+    await apply_book_changes(
+        session, added=[BookFacts(book.seller_id, book.year, book.author, book.pages) for book in inserted_books]
+    )
+    return [book.id for book in inserted_books]
+
+
+# Возвращает словарь {id книги: seller_id} для реально обновленных книг
+async def bulk_update_books(session: AsyncSession, rows: Sequence[dict]) -> dict[int, int]:
+    if not rows:
+        return {}
+
+    source = select(
+        func.unnest(_array("ids", [row["id"] for row in rows], Integer)).label("id"),
+        func.unnest(_array("titles", [row["title"] for row in rows], String)).label("title"),
+        func.unnest(_array("authors", [row["author"] for row in rows], String)).label("author"),
+        func.unnest(_array("years", [row["year"] for row in rows], Integer)).label("year"),
+        func.unnest(_array("pages", [row["pages"] for row in rows], Integer)).label("pages"),
+    ).subquery()
+
+    locked = _locked_books([row["id"] for row in rows], Book.year, Book.author, Book.pages)
+    query = (
+        update(Book)
+        .where(Book.id == source.c.id, Book.id == locked.c.id)
+        .values(
+            title=source.c.title,
+            author=source.c.author,
+            year=source.c.year,
+            pages=source.c.pages,
+            version=Book.version + 1,
+        )
+        .returning(
+            Book.id,
+            Book.seller_id,
+            Book.year,
+            Book.author,
+            Book.pages,
+            locked.c.year.label("old_year"),
+            locked.c.author.label("old_author"),
+            locked.c.pages.label("old_pages"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    updated = (await session.execute(query)).all()
+
+    await apply_book_changes(
+        session,
+        removed=[BookFacts(book.seller_id, book.old_year, book.old_author, book.old_pages) for book in updated],
+        added=[BookFacts(book.seller_id, book.year, book.author, book.pages) for book in updated],
+    )
+    return {book.id: book.seller_id for book in updated}
+
+
+# Возвращает словарь {id книги: seller_id} для реально удаленных книг
+async def bulk_delete_books(session: AsyncSession, book_ids: Sequence[int]) -> dict[int, int]:
+    if not book_ids:
+        return {}
+
+    locked = _locked_books(list(book_ids))
+    query = (
+        delete(Book)
+        .where(Book.id.in_(select(locked.c.id)))
+        .returning(Book.id, Book.seller_id, Book.year, Book.author, Book.pages)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = (await session.execute(query)).all()
+
+    await apply_book_changes(session, removed=[BookFacts(book.seller_id, book.year, book.author, book.pages) for book in deleted])
+    return {book.id: book.seller_id for book in deleted}
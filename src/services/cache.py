@@ -0,0 +1,331 @@
+import itertools
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.settings import Settings
+
+try:
+    from redis import asyncio as aioredis
+    from redis.exceptions import WatchError
+except ImportError:  # redis нужен только для бэкенда "redis"
+    aioredis = None
+
+__all__ = [
+    "CacheBackend",
+    "InMemoryCache",
+    "RedisCache",
+    "NullCache",
+    "create_cache",
+    "get_cache",
+    "book_cache_key",
+    "seller_cache_key",
+    "seller_books_fence_key",
+    "invalidate_after_commit",
+    "run_invalidations",
+]
+
+# В кэше лежат уже сериализованные ответы (JSON в байтах) для ReturnedBook и SellerDetail
+# вместе с их ETag (см. src/services/etag.py). Попадание в кэш отдается клиенту как есть,
+# без обращения к БД и без повторной сериализации.
+#
+# Согласованность с БД:
+#   - запись сбрасывает ключи только после успешного COMMIT (invalidate_after_commit), иначе
+#     параллельное чтение между сбросом и коммитом вернуло бы в кэш старую строку;
+#   - чтение заполняет кэш по "аренде" (lease): берет ее до запроса к БД и кладет значение через fill(),
+#     только если за это время ключ не сбрасывали. Так в кэш не попадает строка, прочитанная
+#     параллельно с еще не закоммиченной или только что закоммиченной записью;
+#   - при промахе значение читается с основной базы, даже если клиент читает с реплики: отстающая реплика
+#     вернула бы строку старше уже сброшенной записи, и она осталась бы в кэше на весь TTL;
+#   - удаление продавца не копит ключи всех его книг до коммита: оно ставит "забор" (fence) на книги
+#     продавца, сбрасывает ключи пачками прямо в транзакции, а после коммита снимает забор.
+#     Пока забор стоит, fill() книги этого продавца не проходит (src/routers/v1/sellers.py::_delete_seller).
+
+
+def book_cache_key(book_id: int) -> str:
+    return f"book:{book_id}"
+
+
+def seller_cache_key(seller_id: int) -> str:
+    return f"seller:{seller_id}"
+
+
+def seller_books_fence_key(seller_id: int) -> str:
+    return f"fence:seller_books:{seller_id}"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class CacheBackend(ABC):
+    backend_name: str = ""
+    # False - кэш ничего не хранит (NullCache), и загружать записи для него с основной базы незачем
+    stores: bool = True
+
+    def __init__(self) -> None:
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None: ...
+
+    # Сброс ключей вместе с их арендами: заполнение по аренде, взятой до сброса, не пройдет
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    # Аренда на заполнение ключа. Берется до чтения из БД.
+    @abstractmethod
+    async def lease(self, key: str) -> str: ...
+
+    # Кладет значение, только если аренда еще действует (ключ не сбрасывали) и не стоит забор fence.
+    # True - значение сохранено.
+    @abstractmethod
+    async def fill(self, key: str, lease: str, value: bytes, fence: Optional[str] = None) -> bool: ...
+
+    # Ставит (или продлевает на TTL) забор: fill(..., fence=key) не проходит до delete(key) или конца TTL
+    @abstractmethod
+    async def fence(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    async def get_stats(self) -> dict:
+        return {"backend": self.backend_name, **asdict(self.stats)}
+
+
+# Кэш в памяти процесса: LRU с ограничением по числу записей и TTL на каждую запись.
+# У каждого воркера свой экземпляр, поэтому TTL ограничивает время жизни устаревших данных
+# в других воркерах, где инвалидация не произошла.
+class InMemoryCache(CacheBackend):
+    backend_name = "memory"
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # Аренды чтений, которые еще не заполнили ключ (например, книга не нашлась), не копятся:
+        # их не больше max_entries, самые старые забываются
+        self._leases: OrderedDict[str, str] = OrderedDict()
+        self._lease_ids = itertools.count()
+        # Заборы хранятся отдельно от данных, чтобы их не вытеснил LRU: ключ -> время окончания
+        self._fences: dict[str, float] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+            self._leases.pop(key, None)
+            self._fences.pop(key, None)
+
+    async def lease(self, key: str) -> str:
+        lease = self._leases[key] = str(next(self._lease_ids))
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_entries:
+            self._leases.popitem(last=False)
+        return lease
+
+    async def fill(self, key: str, lease: str, value: bytes, fence: Optional[str] = None) -> bool:
+        if self._leases.get(key) != lease:
+            return False
+        del self._leases[key]
+        if fence is not None and self._fences.get(fence, 0) > time.monotonic():
+            return False
+        await self.set(key, value)
+        return True
+
+    async def fence(self, key: str) -> None:
+        now = time.monotonic()
+        # Заборы, которые не сняли (транзакция откатилась), забываются после TTL
+        self._fences = {fence: expires_at for fence, expires_at in self._fences.items() if expires_at > now}
+        self._fences[key] = now + self.ttl
+
+    async def clear(self) -> None:
+        self._data.clear()
+        self._leases.clear()
+        self._fences.clear()
+
+    async def get_stats(self) -> dict:
+        return {**await super().get_stats(), "size": len(self._data)}
+
+
+# Кэш в Redis (или любом сервере с протоколом Redis). Общий для всех воркеров.
+# Вытеснение выполняет сам сервер (maxmemory-policy), поэтому evictions берется из INFO stats.
+class RedisCache(CacheBackend):
+    backend_name = "redis"
+
+    def __init__(self, client, ttl: float, prefix: str = "bookstore:") -> None:
+        super().__init__()
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> "RedisCache":
+        if aioredis is None:
+            raise RuntimeError("Package 'redis' is required for cache_backend='redis'")
+        return cls(aioredis.from_url(url), ttl=ttl)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.client.get(self.prefix + key)
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        await self.client.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+    def _lease_key(self, key: str) -> str:
+        return f"{self.prefix}lease:{key}"
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys), *(self._lease_key(key) for key in keys))
+
+    async def lease(self, key: str) -> str:
+        lease = secrets.token_hex(8)
+        await self.client.set(self._lease_key(key), lease, px=int(self.ttl * 1000))
+        return lease
+
+    # Проверка аренды и забора и запись значения - одна транзакция WATCH/MULTI: если аренду сбросили
+    # или перехватили, или поставили забор между проверкой и записью, EXEC не выполнится
+    async def fill(self, key: str, lease: str, value: bytes, fence: Optional[str] = None) -> bool:
+        lease_key = self._lease_key(key)
+        watched = (lease_key,) if fence is None else (lease_key, self.prefix + fence)
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(*watched)
+                if await pipe.get(lease_key) != lease.encode():
+                    return False
+                if fence is not None and await pipe.exists(self.prefix + fence):
+                    return False
+                pipe.multi()
+                pipe.set(self.prefix + key, value, px=int(self.ttl * 1000))
+                pipe.delete(lease_key)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def fence(self, key: str) -> None:
+        await self.client.set(self.prefix + key, b"1", px=int(self.ttl * 1000))
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+    async def get_stats(self) -> dict:
+        stats = await super().get_stats()
+        try:
+            info = await self.client.info("stats")
+        except aioredis.ResponseError:  # не все серверы с протоколом Redis поддерживают INFO
+            return stats
+
+        stats["evictions"] = info.get("evicted_keys", 0)
+        stats["expirations"] = info.get("expired_keys", 0)
+        return stats
+
+
+# Заглушка для cache_backend="none": всегда промах, ничего не хранит
+class NullCache(CacheBackend):
+    backend_name = "none"
+    stores = False
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.stats.misses += 1
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def lease(self, key: str) -> str:
+        return ""
+
+    async def fill(self, key: str, lease: str, value: bytes, fence: Optional[str] = None) -> bool:
+        return False
+
+    async def fence(self, key: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+
+# Кэш по настройкам приложения. Создается в create_app и хранится в app.state.cache (src/main.py).
+def create_cache(settings: Settings) -> CacheBackend:
+    if settings.cache_backend == "memory":
+        return InMemoryCache(ttl=settings.cache_ttl_seconds, max_entries=settings.cache_max_entries)
+    if settings.cache_backend == "redis":
+        return RedisCache.from_url(settings.redis_url, ttl=settings.cache_ttl_seconds)
+    if settings.cache_backend == "none":
+        return NullCache()
+    raise ValueError({"message": f"Unknown cache backend: {settings.cache_backend}"})
+
+
+# Зависимость для ручек: кэш приложения, обрабатывающего запрос
+def get_cache(request: Request) -> CacheBackend:
+    return request.app.state.cache
+
+
+# Ключи, которые нужно сбросить после коммита транзакции сессии, копятся в session.info
+_PENDING_INVALIDATIONS = "cache_invalidations"
+_INVALIDATION_BATCH_SIZE = 1000
+
+
+# Откладывает сброс ключей до коммита: вызывается в ручке вместо cache.delete()
+def invalidate_after_commit(session: AsyncSession, cache: CacheBackend, *keys: str) -> None:
+    pending: dict[CacheBackend, set[str]] = session.info.setdefault(_PENDING_INVALIDATIONS, {})
+    pending.setdefault(cache, set()).update(keys)
+
+
+# Сбрасывает отложенные ключи. Вызывается тем, кто коммитит сессию, - сразу после успешного COMMIT
+# (src/configurations/database.py, src/services/jobs.py). После отката ключи просто забываются.
+async def run_invalidations(session: AsyncSession) -> None:
+    pending: dict[CacheBackend, set[str]] = session.info.pop(_PENDING_INVALIDATIONS, {})
+    for cache, keys in pending.items():
+        # Пачками: массовые ручки откладывают сразу много ключей
+        keys = iter(keys)
+        while batch := list(itertools.islice(keys, _INVALIDATION_BATCH_SIZE)):
+            await cache.delete(*batch)
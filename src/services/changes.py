@@ -0,0 +1,244 @@
+import asyncio
+import base64
+import binascii
+import time
+from datetime import timedelta
+from typing import Annotated, AsyncIterator, Optional
+
+import orjson
+from fastapi import Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from sqlalchemy import BigInteger, Row, Text, delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from src.configurations.database import session_settings
+from src.configurations.settings import AppSettings
+from src.models.changes import CHANGES_CHANNEL, Change
+from src.services.serialization import json_response, rows_to_dicts
+
+__all__ = [
+    "SSE_MEDIA_TYPE",
+    "CHANGES_RESPONSES",
+    "LastEventId",
+    "ChangesWait",
+    "ChangeNotifier",
+    "get_change_notifier",
+    "Notifier",
+    "read_changes",
+    "changes_response",
+    "purge_expired_changes",
+]
+
+# Лента изменений для инкрементальной синхронизации зеркал и поискового индекса.
+# Изменения пишут триггеры БД в changes_table (src/models/changes.py), здесь они читаются после курсора.
+# Как синхронизироваться:
+#   1. запросить курсор since=now (текущий конец ленты), затем выгрузить каталог (/books/export);
+#   2. читать изменения после курсора пачками, передавая next_cursor в следующий запрос.
+#      С wait=N запрос при пустой ленте ждет изменений до N секунд (long-poll), с Accept: text/event-stream
+#      изменения приходят потоком Server-Sent Events.
+# Одна строка может встретиться в ленте несколько раз, а порядок изменений разных транзакций
+# соответствует номерам транзакций, а не моменту коммита. Поэтому upsert применяется, только если
+# его version больше сохраненной, а удаленный id не воскрешается: id не переиспользуются.
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Описание потокового формата ответа для документации ручек
+CHANGES_RESPONSES = {200: {"content": {SSE_MEDIA_TYPE: {}}}}
+
+# Заголовок, с которым браузерный EventSource переподключается к потоку: id последнего полученного события
+LastEventId = Annotated[Optional[str], Header()]
+
+# Самая старая транзакция, которая еще выполняется: все транзакции с меньшим номером завершены,
+# и их изменения уже видны. Изменения от xmin и дальше не отдаются, пока он не сдвинется.
+SAFE_XMIN = func.pg_snapshot_xmin(func.pg_current_snapshot()).cast(Text).cast(BigInteger)
+
+CHANGE_FIELDS = ("op", "id", "data", "changed_at")
+CHANGE_COLUMNS = (Change.op, Change.entity_id, Change.data, Change.changed_at, Change.xid, Change.id)
+
+# Позиция в ленте - (xid, id) последнего отданного изменения. MAX_ID - позиция после всех изменений транзакции.
+MAX_ID = 2**63 - 1
+
+
+# Курсор непрозрачен для клиента, как и в src/services/pagination.py. Кроме позиции в нем лежит время t,
+# когда клиент гарантированно получил все изменения до этой позиции: если с тех пор изменения
+# успели удалиться по сроку хранения, клиент получает 410 и должен синхронизироваться заново.
+def _encode_cursor(xid: int, change_id: int, issued_at: Optional[float] = None) -> str:
+    raw = orjson.dumps({"xid": xid, "id": change_id, "t": int(issued_at or time.time())})
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_cursor(cursor: str, retention_days: float) -> tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = orjson.loads(base64.urlsafe_b64decode(padded.encode()))
+        position, issued_at = (payload["xid"], payload["id"]), payload["t"]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if not all(isinstance(value, int) for value in (*position, issued_at)):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if issued_at < time.time() - retention_days * 86400:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Cursor expired, full resync required")
+    return position
+
+
+# Позиция по параметру since: "now" - текущий конец ленты, пусто - ее начало
+async def _start_position(session: AsyncSession, since: Optional[str]) -> tuple[int, int]:
+    if not since:
+        return 0, 0
+    if since == "now":
+        return (await session.scalar(select(SAFE_XMIN))) - 1, MAX_ID
+    return _decode_cursor(since, session_settings(session).changes_retention_days)
+
+
+# Изменения сущности entity после позиции. В конце каждой строки - ее позиция (xid, id).
+async def read_changes(session: AsyncSession, entity: str, position: tuple[int, int], limit: int) -> list[Row]:
+    query = (
+        select(*CHANGE_COLUMNS)
+        .where(Change.entity == entity, Change.xid < SAFE_XMIN, tuple_(Change.xid, Change.id) > tuple_(*position))
+        .order_by(Change.xid, Change.id)
+        .limit(limit)
+    )
+    return (await session.execute(query)).all()
+
+
+# Будит ожидающих long-poll и SSE, когда триггеры сообщают о новых изменениях (LISTEN changes).
+# У каждого приложения свой слушатель (app.state.change_notifier) на одном соединении с его базой,
+# запускается в lifespan. Если уведомление потерялось (или слушатель не запущен, как в тестах),
+# ожидание все равно заканчивается через changes_poll_seconds (его передает вызывающий) и лента перечитывается.
+class ChangeNotifier:
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+        self._connection = None
+
+    async def start(self, engine: AsyncEngine) -> None:
+        self._connection = await engine.connect()
+        raw_connection = await self._connection.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(CHANGES_CHANNEL, self._notify)
+
+    async def stop(self) -> None:
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    def _notify(self, *args) -> None:
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    # Событие берется до чтения ленты: уведомление, пришедшее между чтением и ожиданием, не теряется
+    def subscribe(self) -> asyncio.Event:
+        return self._event
+
+    @staticmethod
+    async def wait(event: asyncio.Event, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def get_change_notifier(request: Request) -> ChangeNotifier:
+    return request.app.state.change_notifier
+
+
+Notifier = Annotated[ChangeNotifier, Depends(get_change_notifier)]
+
+
+# Параметр wait: сколько секунд ждать изменений. Верхняя граница - changes_wait_max_seconds из настроек
+# приложения, поэтому проверяется при запросе, а не в Query(le=...) при импорте.
+def get_changes_wait(settings: AppSettings, wait: float = Query(default=0, ge=0)) -> float:
+    if wait > settings.changes_wait_max_seconds:
+        raise RequestValidationError([{
+            "type": "less_than_equal",
+            "loc": ("query", "wait"),
+            "msg": f"Input should be less than or equal to {settings.changes_wait_max_seconds}",
+            "input": wait,
+            "ctx": {"le": settings.changes_wait_max_seconds},
+        }])
+    return wait
+
+
+ChangesWait = Annotated[float, Depends(get_changes_wait)]
+
+
+# id события - курсор сразу после него: переподключившись с Last-Event-ID, клиент продолжит со следующего
+def _sse_event(row: Row) -> bytes:
+    change = dict(zip(CHANGE_FIELDS, row))
+    cursor = _encode_cursor(row.xid, row.id)
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (cursor.encode(), row.op.encode(), orjson.dumps(change))
+
+
+# Поток Server-Sent Events. Между чтениями соединение с БД возвращается в пул (rollback),
+# пока лента пуста - шлется комментарий, чтобы прокси не закрыли соединение. Поток завершается
+# через changes_stream_seconds: клиент переподключается с Last-Event-ID и продолжает с того же места.
+async def _stream_changes(
+        session: AsyncSession, notifier: ChangeNotifier, entity: str, position: tuple[int, int], limit: int
+) -> AsyncIterator[bytes]:
+    settings = session_settings(session)
+    deadline = time.monotonic() + settings.changes_stream_seconds
+    while (remaining := deadline - time.monotonic()) > 0:
+        event = notifier.subscribe()
+        rows = await read_changes(session, entity, position, limit)
+        await session.rollback()
+
+        for row in rows:
+            yield _sse_event(row)
+        if rows:
+            position = (rows[-1].xid, rows[-1].id)
+        if len(rows) < limit:
+            yield b": keep-alive\n\n"
+            await notifier.wait(event, min(remaining, settings.changes_poll_seconds))
+
+
+# Ответ ленты изменений: пачка JSON (с ожиданием до wait секунд, если изменений нет) или поток SSE
+async def changes_response(
+        session: AsyncSession,
+        notifier: ChangeNotifier,
+        entity: str,
+        since: Optional[str],
+        limit: int,
+        wait: float,
+        accept: Optional[str],
+        last_event_id: Optional[str],
+) -> Response:
+    position = await _start_position(session, last_event_id or since)
+
+    if accept and SSE_MEDIA_TYPE in accept:
+        return StreamingResponse(
+            _stream_changes(session, notifier, entity, position, limit),
+            media_type=SSE_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    deadline = time.monotonic() + wait
+    while True:
+        event = notifier.subscribe()
+        rows = await read_changes(session, entity, position, limit)
+        if rows or (remaining := deadline - time.monotonic()) <= 0:
+            break
+        await session.rollback()  # Не держим соединение из пула, пока ждем
+        await notifier.wait(event, min(remaining, session_settings(session).changes_poll_seconds))
+
+    if rows:
+        position = (rows[-1].xid, rows[-1].id)
+    return json_response({"changes": rows_to_dicts(rows, CHANGE_FIELDS), "next_cursor": _encode_cursor(*position)})
+
+
+async def purge_expired_changes(session: AsyncSession) -> int:
+    expired = func.now() - timedelta(days=session_settings(session).changes_retention_days)
+    result = await session.execute(delete(Change).where(Change.changed_at < expired))
+    return result.rowcount
+
+
+# Очистка журнала изменений старше changes_retention_days из командной строки (например, по cron):
+#     python -m src.services.changes
+async def _main() -> None:
+    from src.configurations.database import Database
+
+    async with Database.from_settings() as database, database.session_factory.begin() as session:
+        print(f"Deleted {await purge_expired_changes(session)} expired changes")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,127 @@
+import hashlib
+from typing import Annotated, Iterable, Optional
+
+from fastapi import Header, HTTPException, Response, status
+
+__all__ = [
+    "make_etag",
+    "variant_etag",
+    "book_etag",
+    "if_match_versions",
+    "books_state",
+    "seller_etag",
+    "page_etag",
+    "etag_matches",
+    "check_if_match",
+    "IfMatch",
+    "IfNoneMatch",
+    "not_modified",
+    "pack_cache_entry",
+    "unpack_cache_entry",
+]
+
+# ETag-и строятся из версий строк (колонка version), а не из тела ответа,
+# поэтому их можно проверить, не загружая и не сериализуя весь ответ.
+
+# Заголовки условных запросов для ручек
+IfNoneMatch = Annotated[Optional[str], Header()]
+IfMatch = Annotated[Optional[str], Header()]
+
+
+# Суффиксы ETag для представлений одного ресурса: сжатые тела (src/middlewares/compression.py)
+# и страницы в MessagePack (src/services/serialization.py::page_response) - это другие байты,
+# поэтому строгий ETag у них свой: "<etag>-msgpack", "<etag>-gzip", "<etag>-msgpack-br" и т.д.
+# При сравнении в If-None-Match и If-Match суффиксы отбрасываются: условие проверяет сам ресурс.
+VARIANT_SUFFIXES = ("-msgpack", "-gzip", "-br", "-zstd")
+
+
+def variant_etag(etag: str, variant: str) -> str:
+    return f'{etag[:-1]}-{variant}"'
+
+
+def _strip_variants(tag: str) -> str:
+    while tag.endswith('"') and (suffix := next((s for s in VARIANT_SUFFIXES if tag[:-1].endswith(s)), None)):
+        tag = tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+# ETag книги содержит ее версию в открытом виде: так условие If-Match проверяется прямо
+# в UPDATE/DELETE (WHERE version IN (...)), без предварительного чтения строки.
+def book_etag(book_id: int, version: int) -> str:
+    return f'"{book_id}-{version}"'
+
+
+# Версии книги, перечисленные в If-Match. None - проверять нечего (заголовка нет или он равен "*").
+# Слабые ETag (W/"...") и ETag других книг пропускаются: для If-Match сравнение строгое.
+def if_match_versions(header: Optional[str], book_id: int) -> Optional[list[int]]:
+    if header is None:
+        return None
+
+    tags = _parse_etags(header)
+    if "*" in tags:
+        return None
+
+    prefix = f'"{book_id}-'
+    return [
+        int(tag[len(prefix):-1])
+        for tag in tags
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix):-1].isdigit()
+    ]
+
+
+# Состояние книг продавца для его ETag: число книг, сумма их версий и наибольший id (0 - книг нет).
+# Версии только растут, а id выдаются последовательностью, поэтому любое изменение, добавление
+# или удаление книги меняет хотя бы одно из этих чисел. В SQL это же значение строит
+# src/routers/v1/sellers.py::BOOKS_STATE одним подзапросом.
+def books_state(count: int, version_sum: int, max_id: int) -> str:
+    return f"{count}-{version_sum}-{max_id}"
+
+
+# ETag карточки продавца зависит и от продавца, и от его книг
+def seller_etag(seller_id: int, version: int, books_state: str) -> str:
+    return make_etag("seller", seller_id, version, books_state)
+
+
+# ETag страницы списка: id и версии всех строк страницы плюс курсор следующей страницы
+def page_etag(kind: str, rows: Iterable, next_cursor: Optional[str]) -> str:
+    return make_etag(kind, next_cursor, *(f"{row.id}:{row.version}" for row in rows))
+
+
+def _parse_etags(header: str) -> list[str]:
+    return [_strip_variants(tag.strip()) for tag in header.split(",") if tag.strip()]
+
+
+# Сравнение для If-None-Match: слабое (W/ префикс игнорируется), "*" совпадает с любым ETag
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in _parse_etags(header))
+
+
+# Проверка If-Match для изменяющих запросов (оптимистичная блокировка). Сравнение строгое:
+# слабые ETag не совпадают никогда. Без заголовка запрос выполняется без проверки.
+def check_if_match(header: Optional[str], etag: str) -> None:
+    if header is None:
+        return
+    if not any(tag == "*" or tag == etag for tag in _parse_etags(header)):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Resource has been modified")
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+# В кэше ответ хранится вместе со своим ETag: "<etag>\n<json>". Так If-None-Match проверяется
+# при попадании в кэш без обращения к БД.
+def pack_cache_entry(etag: str, payload: bytes) -> bytes:
+    return etag.encode() + b"\n" + payload
+
+
+def unpack_cache_entry(entry: bytes) -> tuple[str, bytes]:
+    etag, _, payload = entry.partition(b"\n")
+    return etag.decode(), payload
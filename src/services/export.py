@@ -0,0 +1,66 @@
+import csv
+import io
+from enum import Enum
+from typing import AsyncIterator
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.books import Book
+
+__all__ = ["ExportFormat", "books_export_query", "books_export_response"]
+
+# Сколько строк за раз забираем из серверного курсора и сериализуем одним куском
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = (Book.id, Book.title, Book.author, Book.year, Book.pages, Book.seller_id)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def books_export_query() -> Select:
+    # Выбираем только колонки, а не ORM-объекты: строки не попадают в identity map,
+    # поэтому память не растет вместе с размером каталога.
+    return select(*EXPORT_COLUMNS).order_by(Book.id)
+
+
+def _ndjson_batch(rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in rows)
+
+
+def _csv_batch(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def _stream_rows(session: AsyncSession, query: Select, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    serialize = _csv_batch if fmt == ExportFormat.csv else _ndjson_batch
+
+    if fmt == ExportFormat.csv:
+        yield _csv_batch([EXPORT_FIELDS])
+
+    # session.stream() открывает серверный курсор, yield_per ограничивает размер выборки за раз
+    result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        yield serialize(partition)
+
+
+def books_export_response(session: AsyncSession, query: Select, fmt: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        _stream_rows(session, query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt.value}"'},
+    )
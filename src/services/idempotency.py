@@ -0,0 +1,129 @@
+import hashlib
+from datetime import timedelta
+from typing import Annotated, Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.database import session_settings
+from src.models.idempotency import IdempotencyKey
+
+__all__ = [
+    "IDEMPOTENCY_KEY_HEADER",
+    "REPLAYED_HEADER",
+    "IdempotentRequest",
+    "idempotent_request",
+    "Idempotency",
+    "purge_expired_keys",
+]
+
+# Поддержка заголовка Idempotency-Key для POST-ручек, создающих записи. Повтор запроса с тем же ключом
+# (например, ретрай шлюза после таймаута) не создает запись заново, а получает сохраненный ответ.
+#
+# Ключ занимается вставкой строки в idempotency_keys_table в транзакции самого запроса, а ответ
+# сохраняется в ту же строку перед коммитом. Поэтому:
+#   - параллельный дубликат ждет на уникальном индексе, пока первый запрос не завершится,
+#     и затем отдает его ответ (запросы склеиваются, а не гонятся друг с другом);
+#   - если первый запрос откатился (ошибка, 4xx), ключ освобождается и дубликат выполняется сам;
+#   - ответ и созданная запись либо сохраняются вместе, либо не сохраняются вовсе.
+# Ключ живет idempotency_ttl_seconds, после этого его можно использовать заново.
+# Просроченные строки удаляет purge_expired_keys().
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotency-Replayed"
+
+
+class IdempotentRequest:
+    def __init__(self, key: str, request_hash: bytes) -> None:
+        self.key = key
+        self.request_hash = request_hash
+
+    # Занимает ключ в транзакции сессии. Возвращает None, если ключ свободен и запрос нужно выполнить,
+    # или сохраненный ответ, если запрос с этим ключом уже выполнен.
+    async def claim(self, session: AsyncSession) -> Optional[Response]:
+        while True:
+            # Просроченный ключ перезанимается тем же запросом
+            query = pg_insert(IdempotencyKey).values(
+                key=self.key,
+                request_hash=self.request_hash,
+                expires_at=func.now() + timedelta(seconds=session_settings(session).idempotency_ttl_seconds),
+            )
+            query = query.on_conflict_do_update(
+                index_elements=[IdempotencyKey.key],
+                set_={
+                    "request_hash": query.excluded.request_hash,
+                    "status_code": None,
+                    "body": None,
+                    "expires_at": query.excluded.expires_at,
+                },
+                where=IdempotencyKey.expires_at <= func.now(),
+            ).returning(IdempotencyKey.key)
+            if (await session.execute(query)).first() is not None:
+                return None
+
+            result = await session.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.body)
+                .where(IdempotencyKey.key == self.key)
+            )
+            stored = result.first()
+            if stored is None:
+                continue  # Строку успели удалить как просроченную - занимаем ключ заново
+
+            if stored.request_hash != self.request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{IDEMPOTENCY_KEY_HEADER} was already used with a different request",
+                )
+            return Response(
+                content=stored.body,
+                status_code=stored.status_code,
+                media_type="application/json",
+                headers={REPLAYED_HEADER: "true"},
+            )
+
+    # Сохраняет ответ под занятым ключом. Вызывается последним действием ручки, в той же сессии.
+    async def save(self, session: AsyncSession, response: Response) -> None:
+        await session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == self.key)
+            .values(status_code=response.status_code, body=response.body)
+        )
+
+
+# Зависимость: None, если клиент не передал Idempotency-Key. В хэш запроса входят метод, путь и тело,
+# чтобы тот же ключ нельзя было незаметно использовать для другого запроса.
+async def idempotent_request(
+        request: Request,
+        idempotency_key: Annotated[Optional[str], Header(alias=IDEMPOTENCY_KEY_HEADER, min_length=1, max_length=255)] = None,
+) -> Optional[IdempotentRequest]:
+    if idempotency_key is None:
+        return None
+
+    request_hash = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    request_hash.update(await request.body())
+    return IdempotentRequest(idempotency_key, request_hash.digest())
+
+
+Idempotency = Annotated[Optional[IdempotentRequest], Depends(idempotent_request)]
+
+
+async def purge_expired_keys(session: AsyncSession) -> int:
+    result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now()))
+    return result.rowcount
+
+
+# Очистка просроченных ключей из командной строки (например, по cron):
+#     python -m src.services.idempotency
+async def _main() -> None:
+    from src.configurations.database import Database
+
+    async with Database.from_settings() as database, database.session_factory.begin() as session:
+        print(f"Deleted {await purge_expired_keys(session)} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    asyncio.run(_main())
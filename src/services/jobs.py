@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from datetime import timedelta
+from typing import Annotated, Awaitable, Callable, Optional
+
+from fastapi import Header, HTTPException, Response, status
+from starlette.datastructures import State
+from sqlalchemy import Row, Update, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.configurations.database import session_settings
+from src.configurations.settings import Settings
+from src.models.jobs import PENDING_JOBS, Job
+from src.schemas.jobs import JobRead, JobStatus
+from src.services.cache import run_invalidations
+from src.services.metrics import Counter, Histogram
+from src.services.serialization import json_response
+
+__all__ = [
+    "job_handler",
+    "enqueue_job",
+    "job_accepted",
+    "Prefer",
+    "prefers_async",
+    "JobRunner",
+    "JOBS_TOTAL",
+    "JOB_DURATION",
+]
+
+logger = logging.getLogger(__name__)
+
+# Фоновые задачи для тяжелых операций (удаление продавца с большим каталогом, пересчет статистики).
+# Ручка кладет задачу в jobs_table в своей транзакции и сразу отвечает 202 со ссылкой на
+# GET /api/v1/jobs/{id}. Задачи выполняет JobRunner, который запускается в каждом воркере приложения:
+#   - задача забирается запросом UPDATE ... WHERE id = (SELECT ... FOR UPDATE SKIP LOCKED), поэтому
+#     воркеры разных процессов не берут одну задачу дважды и не ждут друг друга;
+#   - работа задачи и отметка об успехе коммитятся одной транзакцией;
+#   - после ошибки задача возвращается в очередь с экспоненциальной задержкой, пока не кончатся попытки.
+#     HTTPException (например, продавец уже удален) повторять бессмысленно - задача сразу помечается failed;
+#   - выполняющаяся задача "арендована" до run_at: если воркер умер, после этого ее заберет другой.
+
+JobHandler = Callable[[AsyncSession, dict, State], Awaitable[Optional[dict]]]
+
+_handlers: dict[str, JobHandler] = {}
+
+JOBS_TOTAL = Counter(
+    "jobs_total",
+    "Background job attempts by outcome (succeeded, retried, failed).",
+    labelnames=("kind", "outcome"),
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Duration of a single background job attempt.",
+    labelnames=("kind",),
+)
+
+# Заголовок Prefer: respond-async (RFC 7240) - клиент согласен получить 202 и следить за задачей
+Prefer = Annotated[Optional[str], Header()]
+
+
+def prefers_async(prefer: Optional[str]) -> bool:
+    return prefer is not None and "respond-async" in (token.strip().lower() for token in re.split(r"[,;]", prefer))
+
+
+# Регистрирует обработчик задач вида kind. Обработчик получает сессию (транзакция уже открыта,
+# коммит делает JobRunner), payload задачи и app.state приложения, в котором работает JobRunner
+# (например, его кэш), и возвращает результат - он сохраняется в задаче.
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+
+    return register
+
+
+# delay - через сколько секунд задачу можно выполнять (по умолчанию сразу)
+async def enqueue_job(session: AsyncSession, kind: str, payload: Optional[dict] = None, delay: float = 0) -> Job:
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    query = insert(Job).values(kind=kind, payload=payload or {}, max_attempts=session_settings(session).jobs_max_attempts)
+    if delay:
+        query = query.values(run_at=func.now() + timedelta(seconds=delay))
+    return await session.scalar(query.returning(Job))
+
+
+# Ответ 202 на запрос, работа по которому поставлена в очередь: задача в теле и ссылка на ее статус
+def job_accepted(job: Job) -> Response:
+    return json_response(
+        JobRead.model_validate(job).model_dump(mode="json"),
+        headers={"Location": f"/api/v1/jobs/{job.id}"},
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+def _backoff(settings: Settings, attempts: int) -> timedelta:
+    delay = min(settings.jobs_backoff_seconds * 2 ** (attempts - 1), settings.jobs_backoff_max_seconds)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))  # Разброс, чтобы повторы не шли пачкой
+
+
+def _error_text(error: Exception) -> str:
+    detail = error.detail if isinstance(error, HTTPException) else error
+    return f"{type(error).__name__}: {detail}"[:1000]
+
+
+# Задачу забрал другой воркер (истекла аренда) - результат этой попытки не сохраняем
+class LeaseLost(Exception):
+    pass
+
+
+# Воркеры очереди приложения. Настройки очереди (jobs_*) берутся из app_state.settings при создании,
+# concurrency и poll_interval подменяют их в тестах.
+class JobRunner:
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            app_state: State,
+            concurrency: Optional[int] = None,
+            poll_interval: Optional[float] = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._app_state = app_state
+        self._settings: Settings = app_state.settings
+        self._concurrency = self._settings.jobs_concurrency if concurrency is None else concurrency
+        self._poll_interval = self._settings.jobs_poll_interval if poll_interval is None else poll_interval
+        self._stopping = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._workers = [asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self._concurrency)]
+
+    # Останавливает воркеры: текущие задачи дорабатывают не дольше timeout, потом отменяются
+    # (и будут повторены другим воркером после истечения аренды)
+    async def stop(self, timeout: float) -> None:
+        self._stopping.set()
+        if not self._workers:
+            return
+
+        _, pending = await asyncio.wait(self._workers, timeout=timeout)
+        for worker in pending:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job_id = await self.run_once()
+            except Exception:
+                logger.exception("Job worker failed")
+                job_id = None
+
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    # Забирает и выполняет одну готовую задачу. Возвращает ее id или None, если очередь пуста.
+    async def run_once(self) -> Optional[int]:
+        job = await self._claim()
+        if job is None:
+            return None
+
+        started = time.perf_counter()
+        try:
+            if job.attempts > job.max_attempts:
+                raise RuntimeError("Job lease expired on the last attempt")
+            await self._run(job)
+        except LeaseLost:
+            logger.warning("Job %d (%s) was taken over by another worker", job.id, job.kind)
+        except Exception as e:
+            permanent = isinstance(e, HTTPException) or job.attempts >= job.max_attempts
+            logger.warning(
+                "Job %d (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, e,
+                extra={"job_id": job.id, "job_kind": job.kind},
+            )
+            await self._fail(job, e, permanent)
+            JOBS_TOTAL.inc(kind=job.kind, outcome="failed" if permanent else "retried")
+        else:
+            JOBS_TOTAL.inc(kind=job.kind, outcome="succeeded")
+        finally:
+            JOB_DURATION.observe(time.perf_counter() - started, kind=job.kind)
+        return job.id
+
+    async def _claim(self) -> Optional[Row]:
+        candidate = (
+            select(Job.id)
+            .where(PENDING_JOBS, Job.run_at <= func.now())
+            .order_by(Job.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        query = (
+            update(Job)
+            .where(Job.id == candidate)
+            .values(
+                status=JobStatus.running.value,
+                attempts=Job.attempts + 1,
+                run_at=func.now() + timedelta(seconds=self._settings.jobs_lease_seconds),
+            )
+            .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+            .execution_options(synchronize_session=False)
+        )
+        async with self._session_factory() as session, session.begin():
+            return (await session.execute(query)).first()
+
+    # Условие на attempts: строку меняет только воркер, который держит текущую попытку
+    @staticmethod
+    def _current_attempt(job: Row) -> Update:
+        return update(Job).where(Job.id == job.id, Job.status == JobStatus.running.value, Job.attempts == job.attempts)
+
+    async def _run(self, job: Row) -> None:
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            raise RuntimeError(f"Unknown job kind: {job.kind}")
+
+        async with self._session_factory() as session:
+            async with session.begin():
+                result = await handler(session, job.payload, self._app_state)
+                query = self._current_attempt(job).values(
+                    status=JobStatus.succeeded.value, result=result, last_error=None, finished_at=func.now()
+                )
+                if (await session.execute(query.execution_options(synchronize_session=False))).rowcount == 0:
+                    raise LeaseLost()  # Откатывает и работу задачи
+            # Кэш, который задача отложила через invalidate_after_commit, сбрасывается после коммита
+            await run_invalidations(session)
+
+    async def _fail(self, job: Row, error: Exception, permanent: bool) -> None:
+        if permanent:
+            values = {"status": JobStatus.failed.value, "finished_at": func.now()}
+        else:
+            values = {"status": JobStatus.queued.value, "run_at": func.now() + _backoff(self._settings, job.attempts)}
+
+        query = self._current_attempt(job).values(last_error=_error_text(error), **values)
+        async with self._session_factory() as session, session.begin():
+            await session.execute(query.execution_options(synchronize_session=False))
@@ -0,0 +1,64 @@
+import base64
+import binascii
+from typing import Annotated, Optional
+
+import orjson
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.exceptions import RequestValidationError
+
+from src.configurations.settings import AppSettings
+
+__all__ = ["encode_cursor", "decode_cursor", "PageLimit", "SearchLimit"]
+
+
+# Курсор непрозрачен для клиента: внутри лежит id последней отданной записи.
+# Следующая страница выбирается по условию "id > last_id" (keyset pagination),
+# поэтому время ответа не зависит от глубины страницы, в отличие от OFFSET.
+def encode_cursor(last_id: int) -> str:
+    raw = orjson.dumps({"id": last_id})
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = orjson.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+    except (binascii.Error, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if not isinstance(last_id, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    return last_id
+
+
+# Размер страницы ограничен page_size_max из настроек приложения. Граница проверяется при запросе,
+# а не в Query(le=...): та фиксируется при импорте модуля и была бы общей для всех приложений процесса.
+def _check_limit(limit: int, maximum: int) -> int:
+    if limit > maximum:
+        raise RequestValidationError([{
+            "type": "less_than_equal",
+            "loc": ("query", "limit"),
+            "msg": f"Input should be less than or equal to {maximum}",
+            "input": limit,
+            "ctx": {"le": maximum},
+        }])
+    return limit
+
+
+# Параметр limit страниц: по умолчанию page_size_default
+def get_page_limit(settings: AppSettings, limit: Optional[int] = Query(default=None, ge=1)) -> int:
+    return settings.page_size_default if limit is None else _check_limit(limit, settings.page_size_max)
+
+
+# Параметр limit поиска: по умолчанию 20 результатов
+def get_search_limit(settings: AppSettings, limit: int = Query(default=20, ge=1)) -> int:
+    return _check_limit(limit, settings.page_size_max)
+
+
+PageLimit = Annotated[int, Depends(get_page_limit)]
+SearchLimit = Annotated[int, Depends(get_search_limit)]
@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Annotated, Optional
+
+from fastapi import Depends, Request
+
+from src.configurations.settings import Settings, get_settings
+
+__all__ = [
+    "hash_password",
+    "verify_password",
+    "needs_rehash",
+    "create_password_executor",
+    "PasswordExecutor",
+]
+
+# Пароли хэшируются через scrypt из стандартной библиотеки (memory-hard KDF, как argon2/bcrypt).
+# Хэш занимает десятки миллисекунд CPU, поэтому выполняется в отдельном пуле потоков ограниченного
+# размера: hashlib.scrypt отпускает GIL, и цикл событий продолжает обслуживать остальные ручки.
+# Размер пула ограничивает, сколько ядер может занять наплыв регистраций и логинов. Пул у каждого
+# приложения свой (app.state.password_executor), ручки получают его зависимостью PasswordExecutor.
+#
+# Формат хэша: scrypt$n=<N>,r=<r>,p=<p>$<соль base64>$<хэш base64>. Параметры хранятся в самом хэше,
+# поэтому после их изменения в настройках старые пароли продолжают проверяться и перехэшируются при логине.
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+# Пул потоков для хэширования. Создается в create_app, останавливается в lifespan (src/main.py).
+# Потоки запускаются только при первом хэшировании.
+def create_password_executor(settings: Settings) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
+
+
+def get_password_executor(request: Request) -> Executor:
+    return request.app.state.password_executor
+
+
+PasswordExecutor = Annotated[Executor, Depends(get_password_executor)]
+
+
+# Параметры scrypt из настроек приложения. settings=None - настройки из окружения (скрипты и тесты вне приложения).
+def _current_params(settings: Optional[Settings]) -> dict:
+    settings = settings if settings is not None else get_settings()
+    return {"n": settings.password_scrypt_n, "r": settings.password_scrypt_r, "p": settings.password_scrypt_p}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # Лимит памяти с запасом: самому scrypt нужно 128 * n * r * p байт
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=HASH_BYTES
+    )
+
+
+def _parse(stored: str) -> Optional[tuple[dict, bytes, bytes]]:
+    try:
+        scheme, params, salt, digest = stored.split("$")
+        if scheme != SCHEME:
+            return None
+        parsed = {key: int(value) for key, value in (item.split("=") for item in params.split(","))}
+        return parsed, _b64decode(salt), _b64decode(digest)
+    except ValueError:
+        return None
+
+
+def _hash_sync(password: str, params: dict) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, **params)
+    encoded_params = ",".join(f"{key}={value}" for key, value in params.items())
+    return f"{SCHEME}${encoded_params}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _verify_sync(password: str, stored: str) -> bool:
+    parsed = _parse(stored)
+    if parsed is None:
+        # Продавцы, зарегистрированные до появления хэширования, хранят пароль открытым текстом.
+        # Такой пароль проверяется как есть и перехэшируется при первом успешном логине.
+        return hmac.compare_digest(password.encode(), stored.encode())
+
+    params, salt, digest = parsed
+    return hmac.compare_digest(_scrypt(password, salt, **params), digest)
+
+
+# executor=None - пул цикла событий по умолчанию (скрипты и тесты вне приложения)
+async def hash_password(
+        password: str,
+        executor: Optional[Executor] = None,
+        settings: Optional[Settings] = None,
+) -> str:
+    params = _current_params(settings)
+    return await asyncio.get_running_loop().run_in_executor(executor, _hash_sync, password, params)
+
+
+# stored=None - продавец не найден. Хэш все равно считается, чтобы по времени ответа
+# нельзя было узнать, зарегистрирован ли email.
+async def verify_password(
+        password: str,
+        stored: Optional[str],
+        executor: Optional[Executor] = None,
+        settings: Optional[Settings] = None,
+) -> bool:
+    if stored is None:
+        await hash_password(password, executor, settings)
+        return False
+    return await asyncio.get_running_loop().run_in_executor(executor, _verify_sync, password, stored)
+
+
+# Нужно ли перехэшировать пароль: он хранится открытым текстом или с устаревшими параметрами
+def needs_rehash(stored: str, settings: Optional[Settings] = None) -> bool:
+    parsed = _parse(stored)
+    return parsed is None or parsed[0] != _current_params(settings)
@@ -0,0 +1,106 @@
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.configurations.logs import log_sampled
+from src.services.metrics import DB_QUERY_DURATION, DB_SLOW_QUERIES
+
+__all__ = [
+    "QueryStats",
+    "current_query_stats",
+    "instrument_engine",
+]
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов SQL сохранять для самого медленного запроса и писать в лог
+STATEMENT_PREVIEW_LENGTH = 500
+
+
+# Статистика SQL-запросов одного HTTP-запроса. Заполняется хуками движка, читается middleware.
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_time: float = 0.0
+    slowest_time: float = 0.0
+    slowest_statement: Optional[str] = None
+
+    def add(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.total_time += duration
+        if duration >= self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement[:STATEMENT_PREVIEW_LENGTH]
+
+
+# Объект статистики текущего HTTP-запроса (None вне запроса, например при старте приложения).
+# В контексте лежит изменяемый объект, поэтому запросы из дочерних задач (стриминг ответа)
+# тоже попадают в статистику своего запроса.
+current_query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "current_query_stats", default=None
+)
+
+
+# Параметры запроса никогда не пишутся в лог: там могут быть email, пароли и другие личные данные.
+# Вместо них пишется только их количество.
+def _redacted_parameters(parameters, executemany: bool) -> str:
+    if executemany:
+        return f"<{len(parameters)} parameter sets redacted>"
+    return f"<{len(parameters) if parameters else 0} parameters redacted>"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+
+    DB_QUERY_DURATION.observe(duration)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.add(statement, duration)
+
+    # Событие на каждый SQL-запрос: пишется только при уровне DEBUG и только для запросов из выборки
+    if logger.isEnabledFor(logging.DEBUG) and log_sampled():
+        logger.debug(
+            "Query (%.1f ms): %s",
+            duration * 1000,
+            statement[:STATEMENT_PREVIEW_LENGTH],
+            extra={"duration_ms": round(duration * 1000, 3)},
+        )
+
+    if 0 < context.execution_options.get("slow_query_ms", 0) <= duration * 1000:
+        DB_SLOW_QUERIES.inc()
+        logger.warning(
+            "Slow query (%.1f ms): %s; parameters: %s",
+            duration * 1000,
+            statement[:STATEMENT_PREVIEW_LENGTH],
+            _redacted_parameters(parameters, executemany),
+            extra={"duration_ms": round(duration * 1000, 3)},
+        )
+
+
+# Упавший запрос не доходит до after_cursor_execute, поэтому снимаем его время старта здесь
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+# Подключает подсчет и замер SQL-запросов к движку. Повторный вызов для того же движка ничего не делает.
+# Запросы дольше slow_query_ms пишутся в лог (0 - не писать). Порог хранится в execution options движка,
+# отдельный запрос может задать свой.
+def instrument_engine(engine: AsyncEngine, slow_query_ms: float = 0) -> AsyncEngine:
+    engine.update_execution_options(slow_query_ms=slow_query_ms)
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+    return engine
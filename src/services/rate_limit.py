@@ -0,0 +1,146 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src.configurations.settings import Settings
+from src.services.metrics import Counter
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:  # redis нужен только для бэкенда "redis"
+    aioredis = None
+
+__all__ = [
+    "RateLimitRule",
+    "RateLimiter",
+    "InMemoryRateLimiter",
+    "RedisRateLimiter",
+    "create_rate_limiter",
+    "rate_limit_rules",
+    "RATE_LIMITED",
+    "RATE_LIMITER_ERRORS",
+]
+
+# Лимиты запросов по алгоритму token bucket: у каждого клиента на каждый класс ручек свое ведро
+# емкостью burst, которое пополняется на rate токенов в секунду. Запрос забирает один токен;
+# если токенов нет, клиент получает 429 и время, через которое появится следующий токен.
+# Так разрешаются короткие всплески до burst запросов, а средняя скорость ограничена rate.
+
+RATE_LIMITED = Counter(
+    "http_rate_limited_total",
+    "Requests rejected with 429 by route class and reason (rate, concurrency, stream_concurrency).",
+    labelnames=("route_class", "reason"),
+)
+
+RATE_LIMITER_ERRORS = Counter(
+    "http_rate_limiter_errors_total",
+    "Requests let through without a rate check because the limiter backend failed.",
+    labelnames=("route_class",),
+)
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    rate: float  # Токенов в секунду
+    burst: int  # Емкость ведра
+
+
+class RateLimiter(ABC):
+    backend_name: str = ""
+
+    # Забирает токен из ведра key. Возвращает 0, если запрос разрешен, иначе сколько секунд ждать.
+    @abstractmethod
+    async def acquire(self, key: str, rule: RateLimitRule) -> float: ...
+
+
+# Ведра в памяти процесса: у каждого воркера свои, поэтому при N воркерах клиент, чьи запросы
+# балансировщик раскидывает по воркерам, получает до N * rate. Число ведер ограничено:
+# дольше всех не обращавшиеся клиенты вытесняются, а их ведра к этому времени обычно уже полны.
+class InMemoryRateLimiter(RateLimiter):
+    backend_name = "memory"
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rule: RateLimitRule) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (rule.burst, now))
+        tokens = min(rule.burst, tokens + (now - updated_at) * rule.rate)
+
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rule.rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+# Пополнение и списание выполняются одним Lua-скриптом, то есть атомарно для всех воркеров.
+# Время берется с сервера (TIME), чтобы расхождение часов воркеров не влияло на лимит.
+# Ведро живет не дольше, чем нужно для полного пополнения: дальше оно ничем не отличается от нового.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+# Ведра в Redis (или любом сервере с протоколом Redis и EVAL): общий лимит для всех воркеров и процессов
+class RedisRateLimiter(RateLimiter):
+    backend_name = "redis"
+
+    def __init__(self, client, prefix: str = "bookstore:ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimiter":
+        if aioredis is None:
+            raise RuntimeError("Package 'redis' is required for rate_limit_backend='redis'")
+        return cls(aioredis.from_url(url))
+
+    async def acquire(self, key: str, rule: RateLimitRule) -> float:
+        wait = await self._script(keys=[self.prefix + key], args=[rule.rate, rule.burst])
+        return float(wait)
+
+
+# Лимиты по классам ручек из настроек. Класс с нулевой скоростью не ограничивается.
+def rate_limit_rules(settings: Settings) -> dict[str, RateLimitRule]:
+    rules = {
+        "read": RateLimitRule(settings.rate_limit_read_per_second, settings.rate_limit_read_burst),
+        "list": RateLimitRule(settings.rate_limit_list_per_second, settings.rate_limit_list_burst),
+        "write": RateLimitRule(settings.rate_limit_write_per_second, settings.rate_limit_write_burst),
+    }
+    return {route_class: rule for route_class, rule in rules.items() if rule.rate > 0}
+
+
+# Лимитер по настройкам приложения. Свой у каждого RateLimitMiddleware (то есть у каждого приложения),
+# создается при первом запросе через middleware.
+def create_rate_limiter(settings: Settings) -> RateLimiter:
+    if settings.rate_limit_backend == "memory":
+        return InMemoryRateLimiter()
+    if settings.rate_limit_backend == "redis":
+        return RedisRateLimiter.from_url(settings.redis_url)
+    raise ValueError({"message": f"Unknown rate limit backend: {settings.rate_limit_backend}"})
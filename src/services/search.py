@@ -0,0 +1,62 @@
+import re
+from typing import Optional
+
+from sqlalchemy import Select, func, select
+
+from src.models.books import Book
+
+__all__ = ["SEARCH_CONFIG", "prefix_tsquery", "book_search_query"]
+
+SEARCH_CONFIG = "simple"
+
+# Ограничиваем число слов в запросе, чтобы один запрос не превращался в огромный tsquery
+MAX_SEARCH_TERMS = 8
+
+_WORD = re.compile(r"\w+")
+
+
+# Превращает пользовательскую строку в tsquery с префиксным поиском по каждому слову:
+# "clean cod" -> "clean:* & cod:*". Это дает автодополнение при наборе.
+# Из строки берутся только буквы и цифры, поэтому спецсимволы tsquery (& | ! : ( )) в нее не попадают.
+def prefix_tsquery(text: str) -> Optional[str]:
+    terms = _WORD.findall(text.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+# Запрос поиска книг с ранжированием по релевантности. Возвращает None, если в строке нет слов.
+# Условие "search_vector @@ tsquery" обслуживается GIN-индексом.
+def book_search_query(
+    text: str,
+    limit: int,
+    year_from: Optional[int] = None,
+    year_to: Optional[int] = None,
+    pages_from: Optional[int] = None,
+    pages_to: Optional[int] = None,
+    seller_id: Optional[int] = None,
+) -> Optional[Select]:
+    if (terms := prefix_tsquery(text)) is None:
+        return None
+
+    tsquery = func.to_tsquery(SEARCH_CONFIG, terms)
+    rank = func.ts_rank(Book.search_vector, tsquery).label("rank")
+    query = (
+        select(Book.id, Book.title, Book.author, Book.year, Book.pages, Book.seller_id, rank)
+        .where(Book.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Book.id)
+        .limit(limit)
+    )
+
+    if year_from is not None:
+        query = query.where(Book.year >= year_from)
+    if year_to is not None:
+        query = query.where(Book.year <= year_to)
+    if pages_from is not None:
+        query = query.where(Book.pages >= pages_from)
+    if pages_to is not None:
+        query = query.where(Book.pages <= pages_to)
+    if seller_id is not None:
+        query = query.where(Book.seller_id == seller_id)
+
+    return query
@@ -0,0 +1,108 @@
+from typing import Annotated, Iterable, Optional, Sequence
+
+import orjson
+from fastapi import Header, Response
+
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.schemas.books import ReturnedBook, ReturnedBookNoSellerId
+from src.schemas.sellers import SellerRead
+from src.services.etag import etag_matches, not_modified, variant_etag
+
+try:
+    import msgpack
+except ImportError:  # msgpack нужен только для ответов в формате application/msgpack
+    msgpack = None
+
+__all__ = [
+    "BOOK_FIELDS",
+    "BOOK_COLUMNS",
+    "SELLER_BOOK_FIELDS",
+    "SELLER_BOOK_COLUMNS",
+    "SELLER_FIELDS",
+    "SELLER_COLUMNS",
+    "rows_to_dicts",
+    "json_response",
+    "MSGPACK_MEDIA_TYPE",
+    "MSGPACK_RESPONSES",
+    "Accept",
+    "prefers_msgpack",
+    "page_response",
+]
+
+# Быстрый путь сериализации больших ответов: вместо ORM-объектов выбираются только нужные колонки,
+# строки превращаются в словари и кодируются orjson сразу в байты, без построения Pydantic-модели
+# на каждую строку. Контрактом ответа остаются схемы из src/schemas: набор полей берется из них,
+# а соответствие ответов схемам проверяют тесты (src/tests/test_serialization.py).
+
+BOOK_FIELDS = tuple(ReturnedBook.model_fields)
+SELLER_BOOK_FIELDS = tuple(ReturnedBookNoSellerId.model_fields)
+SELLER_FIELDS = tuple(SellerRead.model_fields)
+
+# Последней колонкой идет version - она нужна для ETag, но в ответ не попадает:
+# zip в rows_to_dicts останавливается на последнем поле схемы.
+BOOK_COLUMNS = (*(getattr(Book, field) for field in BOOK_FIELDS), Book.version)
+SELLER_BOOK_COLUMNS = (*(getattr(Book, field) for field in SELLER_BOOK_FIELDS), Book.version)
+SELLER_COLUMNS = (*(getattr(Seller, field) for field in SELLER_FIELDS), Seller.version)
+
+
+def rows_to_dicts(rows: Iterable[Sequence], fields: tuple[str, ...]) -> list[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(content, headers: Optional[dict] = None, status_code: int = 200) -> Response:
+    return Response(content=orjson.dumps(content), status_code=status_code, media_type="application/json", headers=headers)
+
+
+# Страницы списков можно получить и в MessagePack: клиент указывает его в Accept с не меньшим
+# приоритетом (q), чем JSON. Без установленного пакета msgpack всегда отдается JSON.
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = frozenset((MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"))
+JSON_MEDIA_RANGES = ("application/json", "application/*", "*/*")
+
+# Описание второго формата ответа для документации ручек
+MSGPACK_RESPONSES = {200: {"content": {MSGPACK_MEDIA_TYPE: {}}}}
+
+Accept = Annotated[Optional[str], Header()]
+
+
+def _accept_qualities(accept: str) -> dict[str, float]:
+    qualities = {}
+    for item in accept.split(","):
+        media_type, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.lower()] = max(quality, qualities.get(media_type.lower(), 0.0))
+    return qualities
+
+
+# MessagePack выбирается, только если клиент назвал его явно: "*/*" означает JSON
+def prefers_msgpack(accept: Optional[str]) -> bool:
+    if msgpack is None or not accept:
+        return False
+
+    qualities = _accept_qualities(accept)
+    msgpack_quality = max((qualities.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES))
+    json_quality = next((qualities[media_range] for media_range in JSON_MEDIA_RANGES if media_range in qualities), 0.0)
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+# Страница списка в формате, выбранном по Accept, или 304, если ETag совпал с If-None-Match.
+# У страницы в MessagePack свой строгий ETag с суффиксом -msgpack (src/services/etag.py::variant_etag),
+# при сравнении с If-None-Match суффикс не учитывается.
+def page_response(content: dict, etag: str, accept: Optional[str], if_none_match: Optional[str] = None) -> Response:
+    as_msgpack = prefers_msgpack(accept)
+    if as_msgpack:
+        etag = variant_etag(etag, "msgpack")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if as_msgpack:
+        return Response(content=msgpack.packb(content), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    return Response(content=orjson.dumps(content), media_type="application/json", headers=headers)
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Annotated, Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+from fastapi import Depends, Request
+
+from src.services.metrics import Counter
+
+__all__ = ["SingleFlight", "SingleFlights", "Flights", "get_single_flights", "SINGLE_FLIGHT_CALLS"]
+
+# Склеивание одинаковых параллельных чтений (single-flight). Если запрос с тем же ключом
+# (ручка и ее параметры) уже выполняется, новый запрос не идет в БД, а ждет и получает тот же
+# результат. Результат должен быть неизменяемым (например, ETag и сериализованный ответ в байтах):
+# он отдается всем ожидающим как есть.
+#
+# Склеиваются только запросы, пришедшие, пока первый еще выполняется, поэтому ответ может
+# отставать от БД не больше чем на время одного запроса. Склейки работают внутри одного приложения
+# (app.state.single_flights) в одном воркере.
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Reads that ran the query themselves (leader) or waited for an identical in-flight one (coalesced).",
+    labelnames=("route", "role"),
+)
+
+
+# enabled=False (single_flight_enabled) - каждый запрос выполняет load сам
+class SingleFlight(Generic[T]):
+    def __init__(self, route: str, enabled: bool = True) -> None:
+        self.route = route
+        self.enabled = enabled
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    # shared=False - выполнить load без склейки (например, клиенту, который должен увидеть свою запись:
+    # уже идущее чтение могло начаться до нее)
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[T]], shared: bool = True) -> T:
+        if not self.enabled or not shared:
+            return await load()
+
+        while (flight := self._flights.get(key)) is not None:
+            # wait() не отменяет общий результат, если отменили этот запрос
+            await asyncio.wait((flight,))
+            if not flight.cancelled():
+                SINGLE_FLIGHT_CALLS.inc(route=self.route, role="coalesced")
+                return flight.result()
+            # Первый запрос отменили (клиент отключился) - повторяем сами
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        SINGLE_FLIGHT_CALLS.inc(route=self.route, role="leader")
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # Помечаем исключение полученным, даже если никто не ждал
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+
+# Склейки приложения по ручкам: flights["get_book"].do(...). Создаются при первом обращении к ручке.
+class SingleFlights:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._routes: dict[str, SingleFlight[Any]] = {}
+
+    def __getitem__(self, route: str) -> SingleFlight[Any]:
+        if (flights := self._routes.get(route)) is None:
+            flights = self._routes[route] = SingleFlight(route, self.enabled)
+        return flights
+
+
+# Зависимость для ручек: склейки приложения, обрабатывающего запрос (создаются в create_app, см. src/main.py)
+def get_single_flights(request: Request) -> SingleFlights:
+    return request.app.state.single_flights
+
+
+Flights = Annotated[SingleFlights, Depends(get_single_flights)]
@@ -0,0 +1,256 @@
+from collections import Counter
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, literal, select, text
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import State
+
+from src.configurations.database import session_settings
+from src.models.books import Book
+from src.models.jobs import Job
+from src.models.sellers import Seller
+from src.models.stats import (
+    GlobalAuthorStats,
+    GlobalStats,
+    GlobalYearStats,
+    SellerAuthorStats,
+    SellerStats,
+    SellerYearStats,
+)
+from src.services.jobs import enqueue_job, job_handler
+
+__all__ = [
+    "BookFacts",
+    "apply_book_changes",
+    "seller_book_stats",
+    "global_book_stats",
+    "request_global_stats_refresh",
+    "refresh_global_stats",
+    "rebuild_book_stats",
+]
+
+# Статистика по книгам поддерживается инкрементально: каждая ручка, которая создает, изменяет
+# или удаляет книги, передает сюда старые и новые значения затронутых книг, и счетчики
+# обновляются в той же транзакции. Чтение статистики не сканирует books_table.
+# Продавец удаляется вместе со своими счетчиками (ON DELETE CASCADE), отдельно это не обрабатывается.
+# Если счетчики все же разошлись с книгами, их пересчитывает rebuild_book_stats().
+#
+# Общая статистика читается из сводных таблиц global_* (src/models/stats.py) за O(лет + top) строк.
+# Сводку пересчитывает из счетчиков продавцов задача refresh_global_stats: транзакция, изменившая
+# счетчики, ставит ее в очередь (если такой задачи в очереди еще нет) с задержкой
+# stats_refresh_delay_seconds из настроек, и все изменения за это время попадают в один пересчет.
+# Поэтому /api/v1/stats отстает от книг на эту задержку плюс время пересчета.
+#
+# Чтобы пересчет не пропустил изменение, он начинается с "барьера": транзакции, изменяющие счетчики,
+# держат advisory lock в разделяемом режиме, а пересчет перед чтением счетчиков берет и сразу отпускает его
+# в исключительном режиме, то есть дожидается коммита всех уже начатых изменений. Изменение, которое
+# взяло блокировку после барьера, видит задачу уже выполняющейся и ставит в очередь следующую.
+
+# Ключ advisory lock барьера пересчета общей статистики
+GLOBAL_STATS_LOCK_KEY = 7413206
+
+GLOBAL_STATS_REFRESH = "refresh_global_stats"
+
+
+# Поля книги, от которых зависит статистика
+class BookFacts(NamedTuple):
+    seller_id: int
+    year: int
+    author: str
+    pages: int
+
+
+def _array(model, name: str, values: list) -> bindparam:
+    return bindparam(name, value=values, type_=ARRAY(model.__table__.c[name].type))
+
+
+# INSERT ... ON CONFLICT DO UPDATE с прибавлением дельт к счетчикам. Строки передаются массивами
+# через unnest() (как в src/services/bulk.py) и отсортированы по ключу: параллельные транзакции
+# блокируют строки счетчиков в одном порядке и не ловят deadlock.
+async def _add_deltas(session: AsyncSession, model, keys: tuple[str, ...], values: tuple[str, ...], deltas: dict) -> None:
+    rows = sorted((*key, *delta) for key, delta in deltas.items())
+    names = (*keys, *values)
+    source = select(*(func.unnest(_array(model, name, [row[i] for row in rows])) for i, name in enumerate(names)))
+
+    query = pg_insert(model).from_select(names, source)
+    query = query.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + query.excluded[name] for name in values},
+    )
+    await session.execute(query)
+
+
+async def apply_book_changes(
+        session: AsyncSession,
+        removed: Iterable[BookFacts] = (),
+        added: Iterable[BookFacts] = (),
+) -> None:
+    totals, years, authors = {}, Counter(), Counter()
+    for sign, books in ((-1, removed), (1, added)):
+        for book in books:
+            count, pages = totals.get(book.seller_id, (0, 0))
+            totals[book.seller_id] = (count + sign, pages + sign * book.pages)
+            years[(book.seller_id, book.year)] += sign
+            authors[(book.seller_id, book.author)] += sign
+
+    # Изменения, которые взаимно сократились (например, поменялось только название), не пишутся
+    totals = {(seller_id,): delta for seller_id, delta in totals.items() if delta != (0, 0)}
+    years = {key: (delta,) for key, delta in years.items() if delta}
+    authors = {key: (delta,) for key, delta in authors.items() if delta}
+
+    if totals:
+        await _add_deltas(session, SellerStats, ("seller_id",), ("book_count", "total_pages"), totals)
+    for model, key, deltas in ((SellerYearStats, "year", years), (SellerAuthorStats, "author", authors)):
+        if not deltas:
+            continue
+        await _add_deltas(session, model, ("seller_id", key), ("book_count",), deltas)
+        if any(delta < 0 for delta, in deltas.values()):
+            seller_ids = sorted({key[0] for key in deltas})
+            await session.execute(delete(model).where(model.seller_id.in_(seller_ids), model.book_count <= 0))
+
+    if totals or years or authors:
+        await request_global_stats_refresh(session)
+
+
+# Ставит в очередь пересчет общей статистики после коммита текущей транзакции. Вызывается
+# всеми, кто меняет счетчики продавцов (в том числе удалением продавца).
+async def request_global_stats_refresh(session: AsyncSession) -> None:
+    await session.execute(select(func.pg_advisory_xact_lock_shared(GLOBAL_STATS_LOCK_KEY)))
+    # Условие на status литералом, как в PENDING_JOBS: так планировщик применит частичный индекс очереди
+    queued = select(Job.id).where(Job.kind == GLOBAL_STATS_REFRESH, text("status = 'queued'")).limit(1)
+    if await session.scalar(queued) is None:
+        await enqueue_job(session, GLOBAL_STATS_REFRESH, delay=session_settings(session).stats_refresh_delay_seconds)
+
+
+def _stats(book_count, total_pages, years, authors) -> dict:
+    return {
+        "book_count": book_count,
+        "total_pages": total_pages,
+        "years": years.mappings().all(),
+        "top_authors": authors.mappings().all(),
+    }
+
+
+# Статистика продавца: три запроса по первичным ключам счетчиков. None - продавца нет.
+async def seller_book_stats(session: AsyncSession, seller_id: int, top: int) -> Optional[dict]:
+    totals_query = (
+        select(
+            func.coalesce(SellerStats.book_count, 0).label("book_count"),
+            func.coalesce(SellerStats.total_pages, 0).label("total_pages"),
+        )
+        .select_from(Seller)
+        .outerjoin(SellerStats, SellerStats.seller_id == Seller.id)
+        .where(Seller.id == seller_id)
+    )
+    if (totals := (await session.execute(totals_query)).first()) is None:
+        return None
+
+    years = await session.execute(
+        select(SellerYearStats.year, SellerYearStats.book_count)
+        .where(SellerYearStats.seller_id == seller_id)
+        .order_by(SellerYearStats.year)
+    )
+    authors = await session.execute(
+        select(SellerAuthorStats.author, SellerAuthorStats.book_count)
+        .where(SellerAuthorStats.seller_id == seller_id)
+        .order_by(SellerAuthorStats.book_count.desc(), SellerAuthorStats.author)
+        .limit(top)
+    )
+    return {"seller_id": seller_id, **_stats(totals.book_count, totals.total_pages, years, authors)}
+
+
+# Общая статистика из сводных таблиц: строка итогов, гистограмма по годам и первые top строк индекса авторов
+async def global_book_stats(session: AsyncSession, top: int) -> dict:
+    totals = (
+        await session.execute(
+            select(
+                func.coalesce(func.max(GlobalStats.book_count), 0).label("book_count"),
+                func.coalesce(func.max(GlobalStats.total_pages), 0).label("total_pages"),
+            )
+        )
+    ).one()
+
+    years = await session.execute(select(GlobalYearStats.year, GlobalYearStats.book_count).order_by(GlobalYearStats.year))
+    authors = await session.execute(
+        select(GlobalAuthorStats.author, GlobalAuthorStats.book_count)
+        .order_by(GlobalAuthorStats.book_count.desc(), GlobalAuthorStats.author)
+        .limit(top)
+    )
+    return _stats(totals.book_count, totals.total_pages, years, authors)
+
+
+# Пересчет сводных таблиц из счетчиков продавцов. Параллельные пересчеты выполняются по очереди
+# (блокировка сводной таблицы), чтение статистики при этом не ждет и видит прежнюю сводку до коммита.
+async def refresh_global_stats(session: AsyncSession) -> None:
+    await session.execute(text(f"LOCK TABLE {GlobalStats.__tablename__} IN EXCLUSIVE MODE"))
+    # Барьер: дожидаемся коммита транзакций, которые уже меняют счетчики
+    await session.execute(select(func.pg_advisory_lock(GLOBAL_STATS_LOCK_KEY)))
+    await session.execute(select(func.pg_advisory_unlock(GLOBAL_STATS_LOCK_KEY)))
+
+    for model in (GlobalStats, GlobalYearStats, GlobalAuthorStats):
+        await session.execute(delete(model))
+
+    totals = select(
+        literal(1),
+        func.coalesce(func.sum(SellerStats.book_count), 0),
+        func.coalesce(func.sum(SellerStats.total_pages), 0),
+    )
+    await session.execute(insert(GlobalStats).from_select(["id", "book_count", "total_pages"], totals))
+    for model, source, column in ((GlobalYearStats, SellerYearStats, "year"), (GlobalAuthorStats, SellerAuthorStats, "author")):
+        key = getattr(source, column)
+        counts = select(key, func.sum(source.book_count)).group_by(key)
+        await session.execute(insert(model).from_select([column, "book_count"], counts))
+
+
+@job_handler(GLOBAL_STATS_REFRESH)
+async def _refresh_global_stats_job(session: AsyncSession, payload: dict, app_state: State) -> None:
+    await refresh_global_stats(session)
+
+
+# Пересчет счетчиков по books_table - для одного продавца или для всех. Таблица книг
+# блокируется в режиме SHARE: чтение продолжается, а записи книг ждут окончания пересчета,
+# поэтому ни одно изменение не теряется между удалением старых счетчиков и подсчетом новых.
+async def rebuild_book_stats(session: AsyncSession, seller_id: Optional[int] = None) -> None:
+    await session.execute(text(f"LOCK TABLE {Book.__tablename__} IN SHARE MODE"))
+
+    def only_seller(query, column):
+        return query if seller_id is None else query.where(column == seller_id)
+
+    for model in (SellerStats, SellerYearStats, SellerAuthorStats):
+        await session.execute(only_seller(delete(model), model.seller_id))
+
+    totals = only_seller(
+        select(Seller.id, func.count(Book.id), func.coalesce(func.sum(Book.pages), 0))
+        .outerjoin(Book, Book.seller_id == Seller.id)
+        .group_by(Seller.id),
+        Seller.id,
+    )
+    await session.execute(insert(SellerStats).from_select(["seller_id", "book_count", "total_pages"], totals))
+
+    for model, column in ((SellerYearStats, Book.year), (SellerAuthorStats, Book.author)):
+        counts = only_seller(
+            select(Book.seller_id, column, func.count()).group_by(Book.seller_id, column),
+            Book.seller_id,
+        )
+        await session.execute(insert(model).from_select(["seller_id", column.key, "book_count"], counts))
+
+    await refresh_global_stats(session)
+
+
+# Ремонт счетчиков из командной строки:
+#     python -m src.services.stats [--seller-id ID]
+async def _main(seller_id: Optional[int]) -> None:
+    from src.configurations.database import Database
+
+    async with Database.from_settings() as database, database.session_factory.begin() as session:
+        await rebuild_book_stats(session, seller_id)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Rebuild book statistics counters from books_table")
+    parser.add_argument("--seller-id", type=int, help="Rebuild only this seller (default: all sellers)")
+    asyncio.run(_main(parser.parse_args().seller_id))
@@ -8,26 +8,17 @@ import asyncio
 import httpx
 import pytest
 import pytest_asyncio
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
-from src.configurations.settings import settings
-from src.models import books  # noqa
-from src.models.base import BaseModel
-from src.models.books import Book  # noqa F401
-
-# Переопределяем движок для запуска тестов и подключаем его к тестовой базе.
-# Это решает проблему с сохранностью данных в основной базе приложения.
-# Фикстуры тестов их не зачистят.
-# и обеспечивает чистую среду для запуска тестов. В ней не будет лишних записей.
-async_test_engine = create_async_engine(
-    settings.database_test_url,
-    echo=True,
-)
-
-# Создаем фабрику сессий для тестового движка.
-async_test_session = async_sessionmaker(
-    async_test_engine, expire_on_commit=False, autoflush=False
+from src.configurations.database import (
+    Database,
+    get_async_primary_read_session,
+    get_async_read_session,
+    get_async_session,
 )
+from src.configurations.settings import Settings, get_settings
+from src.models import books, changes, idempotency, jobs, stats  # noqa
+from src.models.books import Book  # noqa F401
+from src.services.cache import InMemoryCache, run_invalidations
 
 
 # Получаем цикл событий для асинхорнного потока выполнения задач.
@@ -40,43 +31,71 @@ def event_loop():
     loop.close()
 
 
-# Создаем таблицы в тестовой БД. Предварительно удаляя старые.
+# Настройки тестового приложения и базы - копия настроек окружения, глобальные настройки тесты не меняют.
+# Тест может подменить значение через monkeypatch.setattr(test_settings, ...): ручки и сервисы читают
+# настройки при запросе. Все тесты ходят в приложение с одного адреса, поэтому лимиты запросов выключены,
+# сам лимитер проверяется в test_rate_limit.py на отдельном приложении.
+@pytest.fixture(scope="session")
+def test_settings() -> Settings:
+    return get_settings().model_copy(update={"rate_limit_enabled": False})
+
+
+# Тестовая база - отдельная БД на том же сервере (database_test_url), поэтому тесты не трогают
+# данные основной базы приложения. Таблицы в ней создаются заново (старые удаляются) один раз на сессию,
+# в ней не будет лишних записей. Движок тот же, что у приложения, и тоже считает SQL-запросы.
 @pytest_asyncio.fixture(scope="session", autouse=True)
-async def create_tables() -> None:
-    """Create tables in DB."""
-    async with async_test_engine.begin() as connection:
-        await connection.run_sync(BaseModel.metadata.drop_all)
-        await connection.run_sync(BaseModel.metadata.create_all)
+async def test_database(test_settings):
+    async with Database(test_settings.database_test_url, settings=test_settings, echo=True) as database:
+        await database.create_tables()
+        yield database
 
 
-# Создаем сессию для БД используемую для тестов
+# Создаем сессию для БД используемую для тестов. Все ее изменения откатываются в конце теста.
 @pytest_asyncio.fixture(scope="function")
-async def db_session():
-    async with async_test_engine.connect() as connection:
-        async with async_test_session(bind=connection) as session:
+async def db_session(test_database):
+    async with test_database.engine.connect() as connection:
+        async with test_database.session_factory(bind=connection, expire_on_commit=False, autoflush=False) as session:
             yield session
             await session.rollback()
 
 
-# Коллбэк для переопределения сессии в приложении
+# Коллбэк для переопределения сессии в приложении. Тестовая сессия никогда не коммитится (откатывается
+# в конце теста), поэтому отложенный сброс кэша выполняется в конце запроса, как после COMMIT в get_async_session
 @pytest.fixture(scope="function")
 def override_get_async_session(db_session):
     async def _override_get_async_session():
         yield db_session
+        await run_invalidations(db_session)
 
     return _override_get_async_session
 
 
-# Мы не можем создать 2 приложения (app) - это приведет к ошибкам.
-# Поэтому, на время запуска тестов мы подменяем там зависимость с сессией
+# Отдельный кэш на каждый тест, чтобы ответы из одного теста не попадали в другой
 @pytest.fixture(scope="function")
-def test_app(override_get_async_session):
-    from src.configurations.database import get_async_session
-    from src.main import app
+def test_cache():
+    return InMemoryCache(ttl=60, max_entries=1000)
+
+
+# Приложение над тестовой базой - одно на сессию: FastAPI разбирает зависимости ручек при первом
+# запросе к новому приложению, и делать это в каждом тесте дорого.
+@pytest.fixture(scope="session")
+def session_app(test_database, test_settings):
+    from src.main import create_app
 
-    app.dependency_overrides[get_async_session] = override_get_async_session
+    return create_app(database=test_database, settings=test_settings)
+
+
+# На время теста сессии ручек подменяются на db_session, чтобы изменения теста откатывались,
+# а кэш приложения (app.state.cache) - на отдельный для теста
+@pytest.fixture(scope="function")
+def test_app(session_app, override_get_async_session, test_cache):
+    session_app.dependency_overrides[get_async_session] = override_get_async_session
+    session_app.dependency_overrides[get_async_read_session] = override_get_async_session
+    session_app.dependency_overrides[get_async_primary_read_session] = override_get_async_session
+    session_app.state.cache = test_cache
 
-    return app
+    yield session_app
+    session_app.dependency_overrides.clear()
 
 
 # создаем асинхронного клиента для ручек
@@ -86,4 +105,4 @@ async def async_client(test_app):
     async with httpx.AsyncClient(
         transport=transport, base_url="http://127.0.0.1:8000"
     ) as test_client:
-        yield test_client
\ No newline at end of file
+        yield test_client
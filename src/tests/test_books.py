@@ -1,9 +1,12 @@
+import csv
+import io
+import json
+
 import pytest
 from sqlalchemy import select
 from src.models.books import Book
 from src.models.sellers import Seller
 from fastapi import status
-from icecream import ic
 
 @pytest.mark.asyncio
 async def test_create_book(db_session, async_client):
@@ -118,10 +121,115 @@ async def test_get_books(db_session, async_client):
                 "pages": 104,
                 "seller_id": seller.id
             },
-        ]
+        ],
+        "next_cursor": None,
     }
 
 
+@pytest.mark.asyncio
+async def test_get_books_pagination(db_session, async_client):
+    seller = Seller(first_name="Tolstoy", last_name="L.N.", e_mail="tolstoy@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    books = [
+        Book(author="Tolstoy", title=f"Volume {i}", year=2020 + i, pages=100, seller_id=seller.id)
+        for i in range(5)
+    ]
+    db_session.add_all(books)
+    await db_session.flush()
+
+    # Первая страница
+    response = await async_client.get("/api/v1/books/", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [b["id"] for b in data["books"]] == [books[0].id, books[1].id]
+    assert data["next_cursor"]
+
+    # Вторая страница по курсору
+    response = await async_client.get("/api/v1/books/", params={"limit": 2, "cursor": data["next_cursor"]})
+    data = response.json()
+    assert [b["id"] for b in data["books"]] == [books[2].id, books[3].id]
+
+    # Последняя страница - курсора нет
+    response = await async_client.get("/api/v1/books/", params={"limit": 2, "cursor": data["next_cursor"]})
+    data = response.json()
+    assert [b["id"] for b in data["books"]] == [books[4].id]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_books_filters(db_session, async_client):
+    seller = Seller(first_name="Chekhov", last_name="A.P.", e_mail="chekhov@example.com", password="secret")
+    other_seller = Seller(first_name="Gogol", last_name="N.V.", e_mail="gogol@example.com", password="secret")
+    db_session.add_all([seller, other_seller])
+    await db_session.flush()
+
+    book = Book(author="Chekhov", title="Seagull", year=2021, pages=80, seller_id=seller.id)
+    book_2 = Book(author="Chekhov", title="Three Sisters", year=2024, pages=90, seller_id=seller.id)
+    book_3 = Book(author="Gogol", title="Dead Souls", year=2022, pages=400, seller_id=other_seller.id)
+    db_session.add_all([book, book_2, book_3])
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/", params={"author": "Chekhov", "year_to": 2022})
+    assert [b["id"] for b in response.json()["books"]] == [book.id]
+
+    response = await async_client.get("/api/v1/books/", params={"year_from": 2022})
+    assert [b["id"] for b in response.json()["books"]] == [book_2.id, book_3.id]
+
+    response = await async_client.get("/api/v1/books/", params={"seller_id": other_seller.id})
+    assert [b["id"] for b in response.json()["books"]] == [book_3.id]
+
+
+@pytest.mark.asyncio
+async def test_get_books_with_invalid_cursor(async_client):
+    response = await async_client.get("/api/v1/books/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_export_books_ndjson(db_session, async_client):
+    seller = Seller(first_name="Bulgakov", last_name="M.A.", e_mail="bulgakov@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Bulgakov", title="Master and Margarita", year=2020, pages=480, seller_id=seller.id)
+    book_2 = Book(author="Bulgakov", title="Heart of a Dog", year=2021, pages=160, seller_id=seller.id)
+    db_session.add_all([book, book_2])
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/export", params={"format": "ndjson"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"id": book.id, "title": "Master and Margarita", "author": "Bulgakov", "year": 2020, "pages": 480, "seller_id": seller.id},
+        {"id": book_2.id, "title": "Heart of a Dog", "author": "Bulgakov", "year": 2021, "pages": 160, "seller_id": seller.id},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_books_csv(db_session, async_client):
+    seller = Seller(first_name="Bulgakov", last_name="M.A.", e_mail="bulgakov@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Bulgakov", title="Master, and Margarita", year=2020, pages=480, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/books/export", params={"format": "csv"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [
+        ["id", "title", "author", "year", "pages", "seller_id"],
+        [str(book.id), "Master, and Margarita", "Bulgakov", "2020", "480", str(seller.id)],
+    ]
+
+
 @pytest.mark.asyncio
 async def test_get_single_book(db_session, async_client):
     # Создаём продавца
@@ -214,7 +322,6 @@ async def test_delete_book(db_session, async_client):
     book = Book(author="Lermontov", title="Mtziri", pages=510, year=2024, seller_id=seller.id)
     db_session.add(book)
     await db_session.flush()
-    ic(book.id)
 
     response = await async_client.delete(f"/api/v1/books/{book.id}")
     assert response.status_code == status.HTTP_204_NO_CONTENT
@@ -244,3 +351,123 @@ async def test_delete_book_with_invalid_book_id(db_session, async_client):
 
     response = await async_client.delete(f"/api/v1/books/{book.id + 1}")
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_create_books_bulk(db_session, async_client):
+    seller = Seller(first_name="Dostoevsky", last_name="F.M.", e_mail="dostoevsky@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    data = [
+        {"title": "Idiot", "author": "Dostoevsky", "count_pages": 640, "year": 2020, "seller_id": seller.id},
+        {"title": "Demons", "author": "Dostoevsky", "count_pages": 700, "year": 2021, "seller_id": seller.id + 100},
+        {"title": "Gambler", "author": "Dostoevsky", "count_pages": 190, "year": 2022, "seller_id": seller.id},
+    ]
+    response = await async_client.post("/api/v1/books/bulk", params={"mode": "best_effort"}, json=data)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["created", "error", "created"]
+    assert results[1]["error"] == "Seller not found"
+
+    # Каждый id в ответе - id книги из той же входной строки
+    books = (await db_session.execute(select(Book))).scalars().all()
+    assert {b.id: (b.title, b.pages) for b in books} == {
+        results[0]["id"]: ("Idiot", 640),
+        results[2]["id"]: ("Gambler", 190),
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_books_bulk_atomic_with_unknown_seller(db_session, async_client):
+    seller = Seller(first_name="Dostoevsky", last_name="F.M.", e_mail="dostoevsky@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    data = [
+        {"title": "Idiot", "author": "Dostoevsky", "year": 2020, "seller_id": seller.id},
+        {"title": "Demons", "author": "Dostoevsky", "year": 2021, "seller_id": seller.id + 100},
+    ]
+    response = await async_client.post("/api/v1/books/bulk", json=data)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"] == [
+        {"index": 1, "id": None, "status": "error", "error": "Seller not found"},
+    ]
+
+    all_books = await db_session.execute(select(Book))
+    assert all_books.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_books_bulk(db_session, async_client):
+    seller = Seller(first_name="Turgenev", last_name="I.S.", e_mail="turgenev@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Turgenev", title="Mumu", year=2020, pages=40, seller_id=seller.id)
+    book_2 = Book(author="Turgenev", title="Fathers", year=2021, pages=300, seller_id=seller.id)
+    db_session.add_all([book, book_2])
+    await db_session.flush()
+
+    response = await async_client.put(
+        "/api/v1/books/bulk",
+        params={"mode": "best_effort"},
+        json=[
+            {"id": book.id, "title": "Mumu 2", "author": "Turgenev", "year": 2024, "pages": 45},
+            {"id": book_2.id + 100, "title": "Ghost", "author": "Nobody", "year": 2024, "pages": 1},
+        ],
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [r["status"] for r in response.json()["results"]] == ["updated", "error"]
+
+    await db_session.refresh(book)
+    assert (book.title, book.year, book.pages) == ("Mumu 2", 2024, 45)
+
+    response = await async_client.request(
+        "DELETE", "/api/v1/books/bulk", params={"mode": "best_effort"}, json=[book.id, book.id, book_2.id]
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [r["status"] for r in response.json()["results"]] == ["deleted", "error", "deleted"]
+
+    all_books = await db_session.execute(select(Book))
+    assert all_books.scalars().all() == []
+
+
+@pytest.mark.asyncio
+async def test_search_books(db_session, async_client):
+    seller = Seller(first_name="Robert", last_name="Martin", e_mail="uncle.bob@example.com", password="secret")
+    other_seller = Seller(first_name="Martin", last_name="Fowler", e_mail="fowler@example.com", password="secret")
+    db_session.add_all([seller, other_seller])
+    await db_session.flush()
+
+    clean_code = Book(author="Robert Martin", title="Clean Code", year=2020, pages=460, seller_id=seller.id)
+    clean_arch = Book(author="Robert Martin", title="Clean Architecture", year=2021, pages=430, seller_id=seller.id)
+    refactoring = Book(author="Martin Fowler", title="Refactoring", year=2022, pages=450, seller_id=other_seller.id)
+    db_session.add_all([clean_code, clean_arch, refactoring])
+    await db_session.flush()
+
+    # Префиксный поиск по нескольким словам (автодополнение)
+    response = await async_client.get("/api/v1/books/search", params={"q": "clea cod"})
+    assert response.status_code == status.HTTP_200_OK
+    books = response.json()["books"]
+    assert [b["id"] for b in books] == [clean_code.id]
+    assert books[0]["title"] == "Clean Code"
+    assert books[0]["rank"] > 0
+
+    # Поиск идет и по автору, и по названию
+    response = await async_client.get("/api/v1/books/search", params={"q": "martin"})
+    assert sorted(b["id"] for b in response.json()["books"]) == sorted([clean_code.id, clean_arch.id, refactoring.id])
+
+    # Фильтры по году, страницам и продавцу
+    response = await async_client.get(
+        "/api/v1/books/search", params={"q": "martin", "year_from": 2021, "pages_to": 440}
+    )
+    assert [b["id"] for b in response.json()["books"]] == [clean_arch.id]
+
+    response = await async_client.get("/api/v1/books/search", params={"q": "martin", "seller_id": other_seller.id})
+    assert [b["id"] for b in response.json()["books"]] == [refactoring.id]
+
+    # Спецсимволы tsquery не ломают запрос
+    response = await async_client.get("/api/v1/books/search", params={"q": "!&|:*"})
+    assert response.json() == {"books": []}
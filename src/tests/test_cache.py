@@ -0,0 +1,171 @@
+import pytest
+from fastapi import status
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.services.cache import (
+    InMemoryCache,
+    RedisCache,
+    book_cache_key,
+    invalidate_after_commit,
+    run_invalidations,
+    seller_books_fence_key,
+    seller_cache_key,
+)
+from src.routers.v1 import sellers
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_lru_eviction():
+    cache = InMemoryCache(ttl=60, max_entries=2)
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    assert await cache.get("a") == b"1"  # "a" становится самым свежим
+
+    await cache.set("c", b"3")  # вытесняется "b"
+    assert await cache.get("b") is None
+    assert await cache.get("a") == b"1"
+    assert await cache.get("c") == b"3"
+
+    stats = await cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 1, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_ttl():
+    cache = InMemoryCache(ttl=0, max_entries=10)
+    await cache.set("a", b"1")
+    assert await cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_cache():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = RedisCache(fakeredis.FakeAsyncRedis(), ttl=60)
+
+    await cache.set("a", b"1")
+    await cache.set("b", b"2")
+    assert await cache.get("a") == b"1"
+
+    await cache.delete("a")
+    assert await cache.get("a") is None
+
+    await cache.clear()
+    assert await cache.get("b") is None
+
+    stats = await cache.get_stats()
+    assert (stats["backend"], stats["hits"], stats["misses"]) == ("redis", 1, 2)
+
+
+def _redis_cache():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(fakeredis.FakeAsyncRedis(), ttl=60)
+
+
+# Чтение, начавшееся до записи, не кладет в кэш устаревшее значение: сброс ключа отменяет аренду
+@pytest.mark.asyncio
+@pytest.mark.parametrize("make_cache", [lambda: InMemoryCache(ttl=60, max_entries=10), _redis_cache])
+async def test_cache_lease(make_cache):
+    cache = make_cache()
+
+    lease = await cache.lease("a")
+    await cache.delete("a")
+    assert not await cache.fill("a", lease, b"old")
+    assert await cache.get("a") is None
+
+    # Аренду перехватило более позднее чтение - заполняет только оно, и только один раз
+    first, second = await cache.lease("a"), await cache.lease("a")
+    assert not await cache.fill("a", first, b"1")
+    assert await cache.fill("a", second, b"2")
+    assert not await cache.fill("a", second, b"3")
+    assert await cache.get("a") == b"2"
+
+    # Пока стоит забор, заполнение с ним не проходит; после снятия забора - проходит
+    await cache.fence("fence")
+    assert not await cache.fill("b", await cache.lease("b"), b"1", fence="fence")
+    assert await cache.fill("c", await cache.lease("c"), b"1")
+    await cache.delete("fence")
+    assert await cache.fill("b", await cache.lease("b"), b"1", fence="fence")
+
+
+# Ключи, отложенные в сессии, сбрасываются только при run_invalidations (после COMMIT)
+@pytest.mark.asyncio
+async def test_invalidate_after_commit(db_session, test_cache):
+    await test_cache.set("a", b"1")
+    invalidate_after_commit(db_session, test_cache, "a")
+    assert await test_cache.get("a") == b"1"
+
+    await run_invalidations(db_session)
+    assert await test_cache.get("a") is None
+    await run_invalidations(db_session)  # Повторный вызов ничего не делает
+
+
+# Книга и карточка продавца читаются из кэша, а запись сбрасывает их
+@pytest.mark.asyncio
+async def test_book_and_seller_cache_invalidation(db_session, async_client, test_cache):
+    seller = Seller(first_name="Ivan", last_name="Bunin", e_mail="bunin@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Bunin", title="Dark Alleys", year=2020, pages=300, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["title"] == "Dark Alleys"
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    assert [b["title"] for b in response.json()["books"]] == ["Dark Alleys"]
+    assert await test_cache.get(book_cache_key(book.id)) is not None
+    assert await test_cache.get(seller_cache_key(seller.id)) is not None
+
+    response = await async_client.put(
+        f"/api/v1/books/{book.id}",
+        json={"title": "Light Breathing", "author": "Bunin", "year": 2021, "pages": 20},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert await test_cache.get(book_cache_key(book.id)) is None
+    assert await test_cache.get(seller_cache_key(seller.id)) is None
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["title"] == "Light Breathing"
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    assert [b["title"] for b in response.json()["books"]] == ["Light Breathing"]
+
+    response = await async_client.delete(f"/api/v1/seller/{seller.id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert await test_cache.get(book_cache_key(book.id)) is None
+    assert await test_cache.get(seller_cache_key(seller.id)) is None
+
+
+# Удаление продавца удаляет книги пачками и сбрасывает их кэш, а до коммита книги продавца не попадают в кэш
+@pytest.mark.asyncio
+async def test_delete_seller_books_cache(db_session, async_client, test_cache, monkeypatch):
+    monkeypatch.setattr(sellers, "DELETE_BATCH_SIZE", 2)
+    seller = Seller(first_name="Ivan", last_name="Bunin", e_mail="bunin.fence@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+    books = [Book(author="Bunin", title=f"Book {i}", year=2020, pages=100, seller_id=seller.id) for i in range(3)]
+    db_session.add_all(books)
+    await db_session.flush()
+
+    for book in books:
+        await async_client.get(f"/api/v1/books/{book.id}")
+    assert all([await test_cache.get(book_cache_key(book.id)) for book in books])
+
+    await sellers._delete_seller(db_session, test_cache, seller.id, None)
+    assert not any([await test_cache.get(book_cache_key(book.id)) for book in books])
+    fence = seller_books_fence_key(seller.id)
+    assert not await test_cache.fill("late", await test_cache.lease("late"), b"1", fence=fence)
+
+    await run_invalidations(db_session)
+    assert await test_cache.fill("late", await test_cache.lease("late"), b"1", fence=fence)
+    assert await db_session.get(Seller, seller.id) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_health(async_client, test_cache):
+    await test_cache.get("missing")
+
+    response = await async_client.get("/health/cache")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"backend": "memory", "hits": 0, "misses": 1, "evictions": 0, "expirations": 0, "size": 0}
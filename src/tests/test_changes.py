@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import orjson
+import pytest
+import pytest_asyncio
+from fastapi import status
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.models.books import Book
+from src.models.changes import Change
+from src.models.sellers import Seller
+from src.services.changes import _encode_cursor
+
+# Лента отдает только изменения завершенных транзакций, поэтому данные в этих тестах коммитятся
+# отдельными сессиями (а не через db_session с откатом) и удаляются в конце теста вместе с журналом.
+
+
+@pytest_asyncio.fixture(scope="function")
+async def committed(test_database):
+    session_factory = async_sessionmaker(test_database.engine, expire_on_commit=False)
+    async with session_factory() as session:
+        last_change_id = await session.scalar(select(func.coalesce(func.max(Change.id), 0)))
+
+    yield session_factory
+
+    async with session_factory() as session, session.begin():
+        await session.execute(delete(Seller).where(Seller.e_mail.like("%@changes.ru")))
+        await session.execute(delete(Change).where(Change.id > last_change_id))
+
+
+async def _create_seller(session_factory, email: str, books: int) -> tuple[Seller, list[Book]]:
+    async with session_factory() as session, session.begin():
+        seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail=email, password="secret")
+        session.add(seller)
+        await session.flush()
+        created = [Book(title=f"Book {i}", author="Pushkin", year=2020, pages=100, seller_id=seller.id) for i in range(books)]
+        session.add_all(created)
+    return seller, created
+
+
+async def _head(async_client, path: str) -> str:
+    response = await async_client.get(path, params={"since": "now"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["changes"] == []
+    return response.json()["next_cursor"]
+
+
+# Тест на ленту книг: создание, изменение и каскадное удаление вместе с продавцом, чтение пачками
+@pytest.mark.asyncio
+async def test_book_changes(committed, async_client):
+    cursor = await _head(async_client, "/api/v1/books/changes")
+    seller, books = await _create_seller(committed, "books@changes.ru", 2)
+
+    async with committed() as session, session.begin():
+        await session.execute(update(Book).where(Book.id == books[0].id).values(pages=200, version=Book.version + 1))
+    async with committed() as session, session.begin():
+        await session.execute(delete(Seller).where(Seller.id == seller.id))
+
+    expected = [
+        ("upsert", books[0].id), ("upsert", books[1].id), ("upsert", books[0].id),
+        ("delete", books[0].id), ("delete", books[1].id),
+    ]
+    response = await async_client.get("/api/v1/books/changes", params={"since": cursor, "limit": 3})
+    assert response.status_code == status.HTTP_200_OK
+    first = response.json()
+    response = await async_client.get("/api/v1/books/changes", params={"since": first["next_cursor"], "limit": 3})
+    second = response.json()
+
+    changes = first["changes"] + second["changes"]
+    assert [(change["op"], change["id"]) for change in changes] == expected
+    assert changes[2]["data"]["pages"] == 200 and changes[2]["data"]["version"] == 2
+    assert changes[2]["data"]["updated_at"] > changes[0]["data"]["updated_at"]
+    assert changes[3]["data"] is None
+
+    # Дальше изменений нет, курсор остается на месте
+    response = await async_client.get("/api/v1/books/changes", params={"since": second["next_cursor"]})
+    assert response.json()["changes"] == []
+
+    # Лента продавцов: без пароля
+    response = await async_client.get("/api/v1/seller/changes", params={"since": cursor})
+    seller_changes = [change for change in response.json()["changes"] if change["id"] == seller.id]
+    assert [change["op"] for change in seller_changes] == ["upsert", "delete"]
+    assert set(seller_changes[0]["data"]) == {"id", "first_name", "last_name", "e_mail", "version", "updated_at"}
+
+    response = await async_client.get("/api/v1/books/changes", params={"since": "garbage"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = await async_client.get("/api/v1/books/changes", params={"since": _encode_cursor(0, 0, issued_at=1)})
+    assert response.status_code == status.HTTP_410_GONE
+
+
+# Тест на long-poll: пустой запрос ждет, и уведомление от триггера будит его сразу после коммита
+@pytest.mark.asyncio
+async def test_book_changes_long_poll(committed, test_app, async_client, test_settings, monkeypatch):
+    monkeypatch.setattr(test_settings, "changes_poll_seconds", 10)
+    cursor = await _head(async_client, "/api/v1/books/changes")
+
+    change_notifier = test_app.state.change_notifier
+    await change_notifier.start(committed.kw["bind"])
+    try:
+        started = time.monotonic()
+        request = asyncio.create_task(async_client.get("/api/v1/books/changes", params={"since": cursor, "wait": 5}))
+        await asyncio.sleep(0.2)
+        _, books = await _create_seller(committed, "poll@changes.ru", 1)
+        response = await request
+    finally:
+        await change_notifier.stop()
+
+    assert time.monotonic() - started < 3
+    assert [(change["op"], change["id"]) for change in response.json()["changes"]] == [("upsert", books[0].id)]
+
+
+# Тест на поток SSE: события с курсором в id, продолжение с Last-Event-ID
+@pytest.mark.asyncio
+async def test_book_changes_stream(committed, async_client, test_settings, monkeypatch):
+    monkeypatch.setattr(test_settings, "changes_stream_seconds", 0.3)
+    monkeypatch.setattr(test_settings, "changes_poll_seconds", 0.1)
+    cursor = await _head(async_client, "/api/v1/books/changes")
+    _, books = await _create_seller(committed, "stream@changes.ru", 2)
+
+    headers = {"Accept": "text/event-stream"}
+    response = await async_client.get("/api/v1/books/changes", params={"since": cursor}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in response.headers
+
+    events = [dict(line.split(": ", 1) for line in block.splitlines()) for block in response.text.split("\n\n") if block.startswith("id")]
+    assert [orjson.loads(event["data"])["id"] for event in events] == [book.id for book in books]
+    assert {event["event"] for event in events} == {"upsert"}
+
+    response = await async_client.get("/api/v1/books/changes", headers={**headers, "Last-Event-ID": events[0]["id"]})
+    resumed = [block for block in response.text.split("\n\n") if block.startswith("id")]
+    assert len(resumed) == 1 and f'"id":{books[1].id}' in resumed[0]
+
+
+# Тест на перехэширование пароля при логине: UPDATE только пароля не меняет updated_at и не попадает в ленту
+@pytest.mark.asyncio
+async def test_password_rehash_not_in_feed(committed, async_client, db_session):
+    seller, _ = await _create_seller(committed, "rehash@changes.ru", 0)
+    last_change_id = await db_session.scalar(select(func.max(Change.id)))
+
+    response = await async_client.post("/api/v1/seller/login", json={"e_mail": "rehash@changes.ru", "password": "secret"})
+    assert response.status_code == status.HTTP_200_OK
+
+    stored = (await db_session.execute(select(Seller.password, Seller.updated_at).where(Seller.id == seller.id))).one()
+    assert stored.password.startswith("scrypt$")
+    assert stored.updated_at == seller.updated_at
+    assert await db_session.scalar(select(func.count()).where(Change.id > last_change_id)) == 0
+
+    # Изменение полей ленты по-прежнему попадает в нее
+    await db_session.execute(update(Seller).where(Seller.id == seller.id).values(last_name="Petrov", version=Seller.version + 1))
+    changes = (await db_session.execute(select(Change.op, Change.entity_id).where(Change.id > last_change_id))).all()
+    assert changes == [("upsert", seller.id)]
@@ -0,0 +1,106 @@
+import gzip
+
+import httpx
+import pytest
+from fastapi import status
+
+from src.configurations.settings import get_settings
+from src.middlewares.compression import CompressionMiddleware, negotiate_encoding
+from src.models.books import Book
+from src.models.sellers import Seller
+
+
+def test_negotiate_encoding():
+    encodings = ("zstd", "br", "gzip")
+    assert negotiate_encoding("gzip, deflate", encodings) == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br", encodings) == "br"
+    assert negotiate_encoding("*", encodings) == "zstd"  # При равенстве - порядок сервера
+    assert negotiate_encoding("*, zstd;q=0", encodings) == "br"
+    assert negotiate_encoding("gzip;q=0, identity", encodings) is None
+    assert negotiate_encoding("deflate", encodings) is None
+
+
+# Тест на ручку: большая страница сжимается по Accept-Encoding, короткий ответ и запрос без сжатия - нет
+@pytest.mark.asyncio
+async def test_compressed_books_page(db_session, async_client):
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="gzip@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+    db_session.add_all(
+        Book(author="Pushkin", title=f"Book {i}", year=2000 + i, pages=100, seller_id=seller.id) for i in range(30)
+    )
+    await db_session.flush()
+
+    params = {"seller_id": seller.id}
+    response = await async_client.get("/api/v1/books/", params=params, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(response.content)  # httpx распаковал тело
+    assert len(response.json()["books"]) == 30
+    gzip_etag = response.headers["etag"]
+    assert gzip_etag.endswith('-gzip"')
+
+    response = await async_client.get("/api/v1/books/", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert len(response.json()["books"]) == 30
+    assert response.headers["etag"] == gzip_etag.replace("-gzip", "")
+    book_id = response.json()["books"][0]["id"]
+
+    # У сжатого тела свой ETag, но в If-None-Match он подходит к любому представлению страницы
+    response = await async_client.get("/api/v1/books/", params=params, headers={"If-None-Match": gzip_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.get(f"/api/v1/books/{book_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "content-encoding" not in response.headers
+
+
+# Тест на потоковый ответ: части сжимаются одним потоком gzip, Content-Length убирается
+@pytest.mark.asyncio
+async def test_compressed_stream():
+    chunks = [b'{"id": %d, "title": "Book"}\n' % i * 20 for i in range(50)]
+
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson"), (b"content-length", b"1")],
+        })
+        for chunk in chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    transport = httpx.ASGITransport(app=CompressionMiddleware(app, get_settings(), minimum_size=1024, encodings=("gzip",)))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async with client.stream("GET", "/", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == b"".join(chunks)
+    assert len(raw) < len(b"".join(chunks))
+
+
+# Тест на MessagePack: страница продавцов отдается в нем, если клиент предпочитает его JSON
+@pytest.mark.asyncio
+async def test_msgpack_sellers_page(db_session, async_client):
+    msgpack = pytest.importorskip("msgpack")
+    db_session.add(Seller(first_name="Ivan", last_name="Ivanov", e_mail="msgpack@mail.ru", password="secret"))
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/seller/", headers={"Accept": "application/msgpack, application/json;q=0.9"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/msgpack"
+    msgpack_etag = response.headers["etag"]
+    json_response = await async_client.get("/api/v1/seller/")
+    assert msgpack.unpackb(response.content) == json_response.json()
+    assert msgpack_etag == json_response.headers["etag"][:-1] + '-msgpack"'
+
+    headers = {"Accept": "application/msgpack", "If-None-Match": msgpack_etag}
+    response = await async_client.get("/api/v1/seller/", headers=headers)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["etag"] == msgpack_etag
+
+    response = await async_client.get("/api/v1/seller/", headers={"Accept": "*/*"})
+    assert response.headers["content-type"] == "application/json"
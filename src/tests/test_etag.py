@@ -0,0 +1,131 @@
+import pytest
+from fastapi import status
+from sqlalchemy import func, select
+
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.services.etag import book_etag, variant_etag
+
+BOOK_UPDATE = {"title": "Updated", "author": "Pushkin", "year": 2002, "pages": 105}
+
+
+async def _seller_with_book(db_session) -> tuple[Seller, Book]:
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="etag@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    book = Book(author="Pushkin", title="Eugeny Onegin", year=2001, pages=104, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+    return seller, book
+
+
+# Тест на условный GET книги и оптимистичную блокировку при обновлении
+@pytest.mark.asyncio
+async def test_book_etag(db_session, async_client):
+    _, book = await _seller_with_book(db_session)
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["etag"]
+
+    response = await async_client.get(f"/api/v1/books/{book.id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    response = await async_client.put(f"/api/v1/books/{book.id}", json=BOOK_UPDATE, headers={"If-Match": '"stale"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    # ETag сжатого представления (с суффиксом кодировки) подходит и для If-Match
+    gzip_etag = variant_etag(etag, "gzip")
+    response = await async_client.put(f"/api/v1/books/{book.id}", json=BOOK_UPDATE, headers={"If-Match": gzip_etag})
+    assert response.status_code == status.HTTP_200_OK
+    new_etag = response.headers["etag"]
+    assert new_etag != etag
+
+    # Старый ETag больше не подходит ни для чтения, ни для удаления
+    response = await async_client.get(f"/api/v1/books/{book.id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] == new_etag
+
+    response = await async_client.delete(f"/api/v1/books/{book.id}", headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+
+# Тест на условное удаление одним запросом и каскадное удаление книг на стороне БД
+@pytest.mark.asyncio
+async def test_conditional_delete(db_session, async_client):
+    seller, book = await _seller_with_book(db_session)
+
+    response = await async_client.delete(f"/api/v1/books/{book.id}", headers={"If-Match": book_etag(book.id, 1)})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await async_client.delete(f"/api/v1/books/{book.id}", headers={"If-Match": book_etag(book.id, 1)})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    other_book = Book(author="Lermontov", title="Mtsyri", year=2002, pages=50, seller_id=seller.id)
+    db_session.add(other_book)
+    await db_session.flush()
+    etag = (await async_client.get(f"/api/v1/seller/{seller.id}")).headers["etag"]
+
+    response = await async_client.delete(f"/api/v1/seller/{seller.id}", headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    # Книгу удалила сама БД (ON DELETE CASCADE), ORM ее не загружал
+    remaining = await db_session.scalar(select(func.count()).select_from(Book).where(Book.seller_id == seller.id))
+    assert remaining == 0
+
+
+# Тест на ETag карточки продавца: 304 без загрузки книг, изменение книги меняет ETag
+@pytest.mark.asyncio
+async def test_seller_etag(db_session, async_client, test_cache):
+    seller, book = await _seller_with_book(db_session)
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    etag = response.headers["etag"]
+
+    # Без кэша ETag сверяется одним агрегирующим запросом, книги не загружаются
+    await test_cache.clear()
+    response = await async_client.get(f"/api/v1/seller/{seller.id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert 'desc="1 queries"' in response.headers["server-timing"]
+
+    # ETag, вычисленный по загруженным книгам, совпадает с агрегатом из базы
+    response = await async_client.get(f"/api/v1/seller/{seller.id}", headers={"If-None-Match": '"other"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] == etag
+
+    response = await async_client.put(f"/api/v1/books/{book.id}", json=BOOK_UPDATE)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+    seller_update = {"first_name": "Petr", "last_name": "Petrov", "e_mail": "etag@mail.ru"}
+    response = await async_client.put(f"/api/v1/seller/{seller.id}", json=seller_update, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    response = await async_client.put(f"/api/v1/seller/0", json=seller_update, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Тест на ETag страницы списка и изменение версии при массовом обновлении
+@pytest.mark.asyncio
+async def test_list_etag(db_session, async_client):
+    seller, book = await _seller_with_book(db_session)
+    params = {"seller_id": seller.id}
+
+    response = await async_client.get("/api/v1/books/", params=params)
+    etag = response.headers["etag"]
+
+    response = await async_client.get("/api/v1/books/", params=params, headers={"If-None-Match": f'W/{etag}, "x"'})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.put("/api/v1/books/bulk", json=[{"id": book.id, **BOOK_UPDATE}])
+    assert response.status_code == status.HTTP_200_OK
+    # В тестах у всех запросов общая сессия, а массовое обновление идет в обход ORM
+    db_session.expire_all()
+
+    response = await async_client.get("/api/v1/books/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
@@ -0,0 +1,72 @@
+import httpx
+import pytest
+from fastapi import status
+from src.configurations.database import Database
+
+
+@pytest.mark.asyncio
+async def test_db_health(async_client, test_settings):
+    response = await async_client.get("/health/db")
+    assert response.status_code == status.HTTP_200_OK
+
+    result = response.json()
+    assert result["pool_size"] == test_settings.max_connection_count
+    assert result["max_overflow"] == test_settings.db_max_overflow
+    assert {"checked_in", "checked_out", "overflow"} <= result.keys()
+
+
+# Тест на прогрев пула при старте воркера и закрытие соединений при остановке
+@pytest.mark.asyncio
+async def test_pool_warmup_and_dispose(test_settings):
+    settings = test_settings.model_copy(update={"db_pool_warmup": 3})
+    database = Database(settings.database_test_url, settings=settings, pool_size=4, max_overflow=0)
+    await database.warm_up()
+
+    assert database.pool_status() == {"pool_size": 4, "checked_in": 3, "checked_out": 0, "overflow": -1, "max_overflow": 0}
+
+    await database.dispose()
+    assert database.pool_status()["checked_in"] == 0
+
+
+# У каждого приложения своя база в app.state.database: в одном процессе их может быть несколько
+@pytest.mark.asyncio
+async def test_app_scoped_database(test_settings):
+    from src.main import create_app
+
+    async with Database(test_settings.database_test_url, settings=test_settings, pool_size=2, max_overflow=1) as database:
+        transport = httpx.ASGITransport(app=create_app(database=database))
+        async with httpx.AsyncClient(transport=transport, base_url="http://127.0.0.1:8000") as client:
+            response = await client.get("/health/db")
+
+    assert response.json()["pool_size"] == 2
+    assert response.json()["max_overflow"] == 1
+
+
+# Кэш, склейки чтений и пул хэширования паролей тоже у каждого приложения свои
+@pytest.mark.asyncio
+async def test_app_scoped_state(test_database):
+    from src.main import create_app
+    from src.services.cache import NullCache
+
+    cache = NullCache()
+    first, second = create_app(database=test_database, cache=cache), create_app(database=test_database)
+    assert first.state.cache is cache and second.state.cache is not cache
+    assert first.state.single_flights["get_book"] is not second.state.single_flights["get_book"]
+    assert first.state.password_executor is not second.state.password_executor
+
+
+# У каждого приложения свои настройки (app.state.settings): граница размера страницы не общая для процесса
+@pytest.mark.asyncio
+async def test_app_scoped_settings(test_database, test_settings):
+    from src.main import create_app
+
+    strict_settings = test_settings.model_copy(update={"page_size_max": 2})
+    apps = {
+        status.HTTP_422_UNPROCESSABLE_ENTITY: create_app(database=test_database, settings=strict_settings),
+        status.HTTP_200_OK: create_app(database=test_database),
+    }
+    for expected, app in apps.items():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://127.0.0.1:8000") as client:
+            response = await client.get("/api/v1/books/", params={"limit": 5})
+        assert response.status_code == expected
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import Response, status
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.idempotency import IdempotencyKey
+from src.models.sellers import Seller
+from src.services.idempotency import REPLAYED_HEADER, IdempotentRequest, purge_expired_keys
+
+
+# Тест на повтор POST с тем же Idempotency-Key: вторая книга не создается, ответ повторяется
+@pytest.mark.asyncio
+async def test_create_book_replay(db_session, async_client):
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="idempotency@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    data = {"title": "Book", "author": "Pushkin", "year": 2021, "count_pages": 100, "seller_id": seller.id}
+    headers = {"Idempotency-Key": "book-1"}
+
+    first = await async_client.post("/api/v1/books/", json=data, headers=headers)
+    assert first.status_code == status.HTTP_201_CREATED
+    assert REPLAYED_HEADER.lower() not in first.headers
+
+    second = await async_client.post("/api/v1/books/", json=data, headers=headers)
+    assert second.status_code == status.HTTP_201_CREATED
+    assert second.headers[REPLAYED_HEADER.lower()] == "true"
+    assert second.json() == first.json()
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/stats")
+    assert response.json()["book_count"] == 1
+
+    # Тот же ключ с другим телом - ошибка, а не чужой ответ
+    response = await async_client.post("/api/v1/books/", json={**data, "year": 2022}, headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    # Без ключа каждый запрос создает новую книгу
+    response = await async_client.post("/api/v1/books/", json=data)
+    assert response.json()["id"] != first.json()["id"]
+
+
+# Тест на регистрацию продавца: повтор по ключу и уникальность email через ON CONFLICT
+@pytest.mark.asyncio
+async def test_create_seller_replay(async_client):
+    data = {"first_name": "Petr", "last_name": "Petrov", "e_mail": "petrov@mail.ru", "password": "secret"}
+
+    first = await async_client.post("/api/v1/seller/", json=data, headers={"Idempotency-Key": "seller-1"})
+    assert first.status_code == status.HTTP_201_CREATED
+    assert "password" not in first.json()
+
+    second = await async_client.post("/api/v1/seller/", json=data, headers={"Idempotency-Key": "seller-1"})
+    assert second.json() == first.json()
+
+    response = await async_client.post("/api/v1/seller/", json=data, headers={"Idempotency-Key": "seller-2"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# Тест на склеивание параллельных дубликатов: второй запрос ждет коммита первого и получает его ответ.
+# Нужны две независимые транзакции, поэтому строки коммитятся и удаляются в конце теста.
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_coalesce(db_session):
+    engine = db_session.bind.engine
+    request = IdempotentRequest("concurrent-1", b"\x01" * 32)
+    expire = (
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == request.key)
+        .values(expires_at=IdempotencyKey.expires_at - timedelta(days=2))
+    )
+
+    try:
+        async with AsyncSession(engine) as first, AsyncSession(engine) as second:
+            assert await request.claim(first) is None
+
+            duplicate = asyncio.create_task(request.claim(second))
+            await asyncio.sleep(0.2)
+            assert not duplicate.done()  # Ждет на уникальном индексе
+
+            await request.save(first, Response(content=b'{"id": 1}', status_code=status.HTTP_201_CREATED))
+            await first.commit()
+
+            replay = await asyncio.wait_for(duplicate, timeout=5)
+            assert replay.status_code == status.HTTP_201_CREATED
+            assert replay.body == b'{"id": 1}'
+            await second.rollback()
+
+            # Просроченный ключ занимается заново, а затем удаляется очисткой
+            await first.execute(expire)
+            assert await request.claim(first) is None
+            await first.execute(expire)
+            assert await purge_expired_keys(first) == 1
+            await first.commit()
+    finally:
+        async with engine.begin() as connection:
+            await connection.execute(delete(IdempotencyKey).where(IdempotencyKey.key == request.key))
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.datastructures import State
+
+from src.models.jobs import Job
+from src.models.sellers import Seller
+from src.services.cache import InMemoryCache, seller_cache_key
+from src.services.jobs import JobRunner, enqueue_job, job_handler
+from src.services.stats import GLOBAL_STATS_REFRESH
+
+flaky_calls = []
+
+
+@job_handler("test_flaky")
+async def _flaky_job(session, payload: dict, app_state) -> dict:
+    flaky_calls.append(payload)
+    if len(flaky_calls) == 1:
+        raise RuntimeError("temporary failure")
+    return {"calls": len(flaky_calls)}
+
+
+@job_handler("test_not_found")
+async def _not_found_job(session, payload: dict, app_state) -> dict:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Seller not found")
+
+
+# Тест на ручки: удаление продавца с Prefer: respond-async ставит задачу, статус виден в /jobs/{id}
+@pytest.mark.asyncio
+async def test_delete_seller_async(db_session, async_client):
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="jobs@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    prefer = {"Prefer": "respond-async"}
+    response = await async_client.delete(f"/api/v1/seller/{seller.id}", headers={**prefer, "If-Match": '"0-0"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = await async_client.delete("/api/v1/seller/0", headers=prefer)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await async_client.delete(f"/api/v1/seller/{seller.id}", headers=prefer)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job = response.json()
+    assert job["kind"] == "delete_seller" and job["status"] == "queued" and job["attempts"] == 0
+    assert response.headers["location"] == f"/api/v1/jobs/{job['id']}"
+
+    response = await async_client.get(response.headers["location"])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "queued"
+
+    # Продавец будет удален задачей, а не ручкой
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await async_client.post("/api/v1/stats/rebuild", params={"seller_id": seller.id})
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["kind"] == "rebuild_stats"
+
+    response = await async_client.get("/api/v1/jobs/0")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Тест на выполнение задач: повтор после ошибки, отказ без повторов для HTTPException и удаление продавца
+# (со сбросом кэша приложения, в котором работает JobRunner).
+# Воркеры работают в своих транзакциях, поэтому данные коммитятся и удаляются в конце теста.
+@pytest.mark.asyncio
+async def test_job_runner(db_session, test_settings):
+    session_factory = async_sessionmaker(db_session.bind.engine, expire_on_commit=False)
+    cache = InMemoryCache(ttl=60, max_entries=100)
+    settings = test_settings.model_copy(update={"jobs_backoff_seconds": 0})
+    runner = JobRunner(session_factory, State({"cache": cache, "settings": settings}), concurrency=2, poll_interval=0.05)
+
+    async with session_factory() as session, session.begin():
+        seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="runner@mail.ru", password="secret")
+        session.add(seller)
+        await session.flush()
+        flaky = await enqueue_job(session, "test_flaky", {"n": 1})
+        not_found = await enqueue_job(session, "test_not_found")
+        delete_seller = await enqueue_job(session, "delete_seller", {"seller_id": seller.id})
+    job_ids = [flaky.id, not_found.id, delete_seller.id]
+    await cache.set(seller_cache_key(seller.id), b"cached")
+
+    async def load_jobs() -> dict[int, Job]:
+        async with session_factory() as session:
+            return {job.id: job for job in await session.scalars(select(Job).where(Job.id.in_(job_ids)))}
+
+    try:
+        runner.start()
+        for _ in range(100):
+            jobs = await load_jobs()
+            if all(job.status in ("succeeded", "failed") for job in jobs.values()):
+                break
+            await asyncio.sleep(0.05)
+        await runner.stop(timeout=5)
+
+        assert jobs[flaky.id].status == "succeeded"
+        assert jobs[flaky.id].attempts == 2
+        assert jobs[flaky.id].result == {"calls": 2}
+        assert jobs[not_found.id].status == "failed"
+        assert jobs[not_found.id].attempts == 1
+        assert jobs[not_found.id].last_error == "HTTPException: Seller not found"
+        assert jobs[delete_seller.id].status == "succeeded"
+
+        async with session_factory() as session:
+            assert await session.get(Seller, seller.id) is None
+        assert await cache.get(seller_cache_key(seller.id)) is None
+        assert await runner.run_once() is None
+    finally:
+        await runner.stop(timeout=0)
+        async with session_factory() as session, session.begin():
+            # Удаление продавца ставит в очередь и пересчет общей статистики
+            await session.execute(delete(Job).where(Job.id.in_(job_ids) | (Job.kind == GLOBAL_STATS_REFRESH)))
+            await session.execute(delete(Seller).where(Seller.id == seller.id))
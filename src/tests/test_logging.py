@@ -0,0 +1,64 @@
+import logging
+
+import orjson
+import pytest
+from fastapi import status
+
+from src.configurations.logs import JsonFormatter, RequestContextFilter, current_request_id, debug_sampled
+from src.configurations.settings import get_settings
+
+
+def _record(level: int, message: str, *args) -> logging.LogRecord:
+    return logging.LogRecord("test", level, __file__, 1, message, args, None)
+
+
+# Тест на JSON-формат записи: id запроса из контекста и поля из extra=
+def test_json_formatter():
+    record = _record(logging.INFO, "Hello %s", "world")
+    record.route = "/api/v1/books/"
+
+    token = current_request_id.set("abc-123")
+    try:
+        assert RequestContextFilter().filter(record)
+    finally:
+        current_request_id.reset(token)
+
+    entry = orjson.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Hello world"
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "abc-123"
+    assert entry["route"] == "/api/v1/books/"
+
+
+# Тест на выборку DEBUG-событий: решение принимается на запрос, остальные уровни не отбрасываются
+def test_debug_sampling(monkeypatch):
+    log_filter = RequestContextFilter()
+
+    token = debug_sampled.set(False)
+    try:
+        assert not log_filter.filter(_record(logging.DEBUG, "query"))
+        assert log_filter.filter(_record(logging.INFO, "request"))
+    finally:
+        debug_sampled.reset(token)
+
+    # Вне запроса решение принимается для каждой записи по log_debug_sample_rate
+    # Логирование настроено на весь процесс и читает настройки окружения
+    monkeypatch.setattr(get_settings(), "log_debug_sample_rate", 1.0)
+    assert log_filter.filter(_record(logging.DEBUG, "query"))
+    monkeypatch.setattr(get_settings(), "log_debug_sample_rate", 0.0)
+    assert not log_filter.filter(_record(logging.DEBUG, "query"))
+
+
+# Тест на X-Request-ID: корректный id клиента возвращается, некорректный заменяется новым
+@pytest.mark.asyncio
+async def test_request_id_header(async_client):
+    response = await async_client.get("/metrics", headers={"X-Request-ID": "lb-42.a"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["x-request-id"] == "lb-42.a"
+
+    response = await async_client.get("/metrics", headers={"X-Request-ID": "bad id\tvalue"})
+    request_id = response.headers["x-request-id"]
+    assert len(request_id) == 32 and request_id != "bad id\tvalue"
+
+    response = await async_client.get("/metrics")
+    assert response.headers["x-request-id"] != request_id
@@ -0,0 +1,82 @@
+import logging
+import re
+
+import pytest
+from fastapi import status
+from sqlalchemy import text
+
+from src.models import sellers
+from src.services.metrics import DB_QUERIES_PER_REQUEST, DB_SLOW_QUERIES
+from src.services.query_stats import QueryStats, current_query_stats
+
+
+def _db_timing(response) -> tuple[float, int]:
+    match = re.search(r'db;dur=([\d.]+);desc="(\d+) queries"', response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    return float(match.group(1)), int(match.group(2))
+
+
+# Тест на заголовок Server-Timing с числом SQL-запросов ручки
+@pytest.mark.asyncio
+async def test_server_timing_counts_queries(db_session, async_client):
+    seller = sellers.Seller(first_name="Ivan", last_name="Ivanov", e_mail="ivan@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    _, queries = _db_timing(response)
+    assert queries == 1  # продавец вместе с числом книг; книг нет - второй запрос не нужен
+
+    # Повторный запрос отдается из кэша без обращения к БД
+    response = await async_client.get(f"/api/v1/seller/{seller.id}")
+    assert _db_timing(response)[1] == 0
+
+
+# Тест на ручку /metrics: гистограммы размечены шаблоном пути, а не конкретным id
+@pytest.mark.asyncio
+async def test_metrics_endpoint(async_client):
+    route = "/api/v1/books/{book_id}"
+    before = DB_QUERIES_PER_REQUEST.count(method="GET", route=route)
+
+    await async_client.get("/api/v1/books/123456")
+    await async_client.get("/api/v1/books/654321")
+
+    assert DB_QUERIES_PER_REQUEST.count(method="GET", route=route) == before + 2
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+
+    body = response.text
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    assert f'db_queries_per_request_count{{method="GET",route="{route}"}}' in body
+    assert "/api/v1/books/123456" not in body
+
+
+# Тест на лог медленных запросов: параметры не попадают в лог
+@pytest.mark.asyncio
+async def test_slow_query_is_logged_without_parameters(db_session, caplog):
+    before = DB_SLOW_QUERIES.value()
+    stats = QueryStats()
+    token = current_query_stats.set(stats)
+
+    try:
+        with caplog.at_level(logging.WARNING, logger="src.services.query_stats"):
+            await db_session.execute(
+                text("SELECT pg_sleep(0.01), :secret"),
+                {"secret": "top-secret-value"},
+                execution_options={"slow_query_ms": 0.001},
+            )
+    finally:
+        current_query_stats.reset(token)
+
+    assert stats.count == 1
+    assert stats.total_time >= 0.01
+    assert "pg_sleep" in stats.slowest_statement
+    assert DB_SLOW_QUERIES.value() == before + 1
+
+    assert "Slow query" in caplog.text
+    assert "top-secret-value" not in caplog.text
+    assert "1 parameters redacted" in caplog.text
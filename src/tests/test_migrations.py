@@ -0,0 +1,121 @@
+import pytest
+import pytest_asyncio
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.configurations import migrations
+from src.configurations.migrations import MIGRATIONS_LOCK_KEY, check_schema, upgrade_schema
+from src.configurations.settings import get_settings
+from src.models.base import BaseModel
+
+MIGRATIONS_DB_NAME = f"{get_settings().db_test_name}_migrations"
+
+
+# Миграции проверяем на отдельной пустой базе, чтобы не мешать тестовой базе с create_all()
+@pytest_asyncio.fixture(scope="function")
+async def migrations_engine(test_settings):
+    admin_engine = create_async_engine(test_settings.database_test_url, isolation_level="AUTOCOMMIT")
+    async with admin_engine.connect() as connection:
+        await connection.execute(text(f'DROP DATABASE IF EXISTS "{MIGRATIONS_DB_NAME}"'))
+        await connection.execute(text(f'CREATE DATABASE "{MIGRATIONS_DB_NAME}"'))
+
+    url = test_settings.database_test_url.rsplit("/", 1)[0] + f"/{MIGRATIONS_DB_NAME}"
+    engine = create_async_engine(url)
+    yield engine
+    await engine.dispose()
+
+    async with admin_engine.connect() as connection:
+        await connection.execute(text(f'DROP DATABASE IF EXISTS "{MIGRATIONS_DB_NAME}"'))
+    await admin_engine.dispose()
+
+
+def _schema_diff(sync_connection):
+    return compare_metadata(MigrationContext.configure(sync_connection), BaseModel.metadata)
+
+
+@pytest.mark.asyncio
+async def test_migrations_match_models(migrations_engine):
+    # До миграций схема не совпадает - приложение не должно стартовать
+    with pytest.raises(RuntimeError):
+        await check_schema(migrations_engine)
+
+    await upgrade_schema(migrations_engine)
+    await check_schema(migrations_engine)
+
+    # Миграции создают ровно то, что описано в моделях (включая индексы)
+    async with migrations_engine.connect() as connection:
+        assert await connection.run_sync(_schema_diff) == []
+
+    # Повторный запуск ничего не делает
+    await upgrade_schema(migrations_engine)
+    await check_schema(migrations_engine)
+
+
+# Схема, которую create_all() создавал до появления миграций: те же таблицы, но без индексов
+LEGACY_SCHEMA = (
+    """CREATE TABLE sellers_table (
+        id SERIAL PRIMARY KEY, first_name VARCHAR(50) NOT NULL, last_name VARCHAR(50) NOT NULL,
+        e_mail VARCHAR(100) NOT NULL, password VARCHAR(128) NOT NULL
+    )""",
+    """CREATE TABLE books_table (
+        id SERIAL PRIMARY KEY, title VARCHAR(50) NOT NULL, author VARCHAR(100) NOT NULL,
+        year INTEGER NOT NULL, pages INTEGER NOT NULL, seller_id INTEGER NOT NULL REFERENCES sellers_table (id)
+    )""",
+    "INSERT INTO sellers_table (first_name, last_name, e_mail, password) VALUES "
+    "('Ivan', 'Ivanov', 'ivan@example.com', 'secret'), ('Ivan', 'Petrov', 'ivan@example.com', 'secret')",
+    "INSERT INTO books_table (title, author, year, pages, seller_id) VALUES ('Book', 'Pushkin', 2020, 100, 1)",
+)
+
+
+# Миграции принимают базу, созданную create_all() до миграций, с ее данными.
+# Повторяющиеся email останавливают миграцию до создания уникального индекса.
+@pytest.mark.asyncio
+async def test_upgrade_legacy_schema(migrations_engine):
+    async with migrations_engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            await connection.execute(text(statement))
+
+    with pytest.raises(RuntimeError, match="ivan@example.com"):
+        await upgrade_schema(migrations_engine)
+
+    async with migrations_engine.begin() as connection:
+        await connection.execute(text("UPDATE sellers_table SET e_mail = 'petrov@example.com' WHERE id = 2"))
+
+    await upgrade_schema(migrations_engine)
+    await check_schema(migrations_engine)
+    async with migrations_engine.connect() as connection:
+        assert await connection.run_sync(_schema_diff) == []
+        assert await connection.scalar(text("SELECT count(*) FROM books_table")) == 1
+
+
+# База после create_tables() (DB_STARTUP_MODE=recreate) отмечена последней миграцией
+@pytest.mark.asyncio
+async def test_create_tables_stamps_head(test_database):
+    await check_schema(test_database.engine)
+
+
+# Упавшая миграция: наружу выходит ее собственная ошибка, а advisory lock снимается
+@pytest.mark.asyncio
+async def test_failed_migration_releases_lock(migrations_engine, monkeypatch):
+    def failing_upgrade(config, revision):
+        config.attributes["connection"].execute(text("SELECT 1 / 0"))
+
+    monkeypatch.setattr(migrations.command, "upgrade", failing_upgrade)
+    with pytest.raises(DBAPIError, match="division by zero"):
+        await upgrade_schema(migrations_engine)
+
+    async with migrations_engine.connect() as connection:
+        assert await connection.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+
+
+# Триггеры после миграций те же, что создает create_all() (src/models/changes.py)
+@pytest.mark.asyncio
+async def test_migrations_match_model_triggers(migrations_engine, test_database):
+    query = text("SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger WHERE NOT tgisinternal ORDER BY tgname")
+    await upgrade_schema(migrations_engine)
+    async with migrations_engine.connect() as migrated, test_database.engine.connect() as created:
+        assert (await migrated.execute(query)).all() == (await created.execute(query)).all()
@@ -0,0 +1,92 @@
+import pytest
+from fastapi import status
+from sqlalchemy import select
+
+from src.models.sellers import Seller
+from src.services.passwords import hash_password, needs_rehash, verify_password
+
+
+# Минимальная стоимость хэша в настройках тестового приложения, чтобы тесты не тратили время на CPU
+@pytest.fixture(autouse=True)
+def settings(test_settings, monkeypatch):
+    monkeypatch.setattr(test_settings, "password_scrypt_n", 2**10)
+    monkeypatch.setattr(test_settings, "password_scrypt_r", 8)
+    monkeypatch.setattr(test_settings, "password_scrypt_p", 1)
+    return test_settings
+
+
+# Тест на хэширование и проверку пароля
+@pytest.mark.asyncio
+async def test_hash_and_verify_password(settings, monkeypatch):
+    hashed = await hash_password("secret", settings=settings)
+    assert hashed.startswith("scrypt$n=1024,r=8,p=1$")
+    assert hashed != await hash_password("secret", settings=settings)  # у каждого хэша своя соль
+
+    assert await verify_password("secret", hashed)
+    assert not await verify_password("wrong", hashed)
+    assert not await verify_password("secret", None, settings=settings)
+
+    assert not needs_rehash(hashed, settings)
+    assert needs_rehash("secret", settings)  # пароль открытым текстом
+    monkeypatch.setattr(settings, "password_scrypt_n", 2**11)
+    assert needs_rehash(hashed, settings)
+    assert await verify_password("secret", hashed)  # старые параметры берутся из самого хэша
+
+
+# Тест на то, что при регистрации пароль сохраняется только в виде хэша
+@pytest.mark.asyncio
+async def test_create_seller_hashes_password(async_client, db_session):
+    data = {"first_name": "John", "last_name": "Doe", "e_mail": "hash@example.com", "password": "secret"}
+    response = await async_client.post("/api/v1/seller/", json=data)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    seller = await db_session.get(Seller, response.json()["id"])
+    assert seller.password != "secret"
+    assert await verify_password("secret", seller.password)
+
+
+# Тест для POST /api/v1/seller/login
+@pytest.mark.asyncio
+async def test_login_seller(async_client, db_session, settings):
+    password = await hash_password("secret", settings=settings)
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="login@example.com", password=password)
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.post("/api/v1/seller/login", json={"e_mail": "login@example.com", "password": "secret"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": seller.id, "first_name": "Ivan", "last_name": "Ivanov", "e_mail": "login@example.com"}
+
+    response = await async_client.post("/api/v1/seller/login", json={"e_mail": "login@example.com", "password": "wrong"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await async_client.post("/api/v1/seller/login", json={"e_mail": "nobody@example.com", "password": "secret"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# Тест на перехэширование при логине: пароль открытым текстом и пароль с устаревшими параметрами
+@pytest.mark.asyncio
+async def test_login_rehashes_password(async_client, db_session, settings, monkeypatch):
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="legacy@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    credentials = {"e_mail": "legacy@example.com", "password": "secret"}
+    response = await async_client.post("/api/v1/seller/login", json=credentials)
+    assert response.status_code == status.HTTP_200_OK
+
+    stored = (await db_session.execute(select(Seller.password).where(Seller.id == seller.id))).scalar_one()
+    assert stored.startswith("scrypt$n=1024,")
+
+    # Перехэширование не меняет ETag карточки продавца: условное обновление с ним проходит
+    etag = (await async_client.get(f"/api/v1/seller/{seller.id}")).headers["ETag"]
+    monkeypatch.setattr(settings, "password_scrypt_n", 2**11)
+    response = await async_client.post("/api/v1/seller/login", json=credentials)
+    assert response.status_code == status.HTTP_200_OK
+
+    stored = (await db_session.execute(select(Seller.password).where(Seller.id == seller.id))).scalar_one()
+    assert stored.startswith("scrypt$n=2048,")
+
+    update_data = {"first_name": "Ivan", "last_name": "Sidorov", "e_mail": "legacy@example.com"}
+    response = await async_client.put(f"/api/v1/seller/{seller.id}", json=update_data, headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,185 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import status
+from starlette.types import ASGIApp
+
+from src.configurations.settings import Settings, get_settings
+from src.middlewares.rate_limit import RateLimitMiddleware, route_class
+from src.services import rate_limit
+from src.services.rate_limit import (
+    RATE_LIMITED,
+    RATE_LIMITER_ERRORS,
+    InMemoryRateLimiter,
+    RateLimiter,
+    RateLimitRule,
+    RedisRateLimiter,
+)
+
+RULES = {"read": RateLimitRule(rate=1, burst=3), "list": RateLimitRule(rate=1, burst=1)}
+
+
+# Настройки отдельного приложения под лимитером
+def limit_settings(**values) -> Settings:
+    return get_settings().model_copy(update={f"rate_limit_{name}": value for name, value in values.items()})
+
+
+# Приложение под лимитером: отвечает 200, а запросы к /slow ждут события release
+def make_app(release: asyncio.Event) -> ASGIApp:
+    async def app(scope, receive, send):
+        if scope["path"] == "/slow":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app
+
+
+def make_client(middleware: RateLimitMiddleware, ip: str = "10.0.0.1") -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=middleware, client=(ip, 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_route_class():
+    assert route_class("GET", "/api/v1/books/1") == "read"
+    assert route_class("GET", "/api/v1/seller/1") == "read"
+    assert route_class("GET", "/api/v1/books/") == "list"
+    assert route_class("GET", "/api/v1/books/search") == "list"
+    assert route_class("GET", "/api/v1/seller/1/books/export") == "list"
+    assert route_class("GET", "/api/v1/books/changes") == "list"
+    assert route_class("GET", "/api/v1/seller/changes") == "list"
+    assert route_class("GET", "/api/v1/stats") == "list"
+    assert route_class("GET", "/api/v1/seller/1/stats") == "read"
+    assert route_class("POST", "/api/v1/seller/login") == "write"
+    assert route_class("DELETE", "/api/v1/books/1") == "write"
+
+
+# Тест на лимит скорости: всплеск до burst проходит, дальше 429 с Retry-After.
+# Ведра раздельные по классам ручек, IP и известным API-ключам.
+@pytest.mark.asyncio
+async def test_rate_limit():
+    middleware = RateLimitMiddleware(
+        make_app(asyncio.Event()),
+        limit_settings(concurrency=0, api_keys="secret-key"),
+        limiter=InMemoryRateLimiter(),
+        rules=RULES,
+    )
+    rejected = RATE_LIMITED.value(route_class="read", reason="rate")
+
+    async with make_client(middleware) as client:
+        for _ in range(3):
+            assert (await client.get("/api/v1/books/1")).status_code == status.HTTP_200_OK
+        response = await client.get("/api/v1/books/1")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["retry-after"] == "1"
+        assert response.json() == {"detail": "Too many requests"}
+        assert RATE_LIMITED.value(route_class="read", reason="rate") == rejected + 1
+
+        # Другие классы ручек и служебные ручки ограничиваются отдельно, запись без правила - не ограничивается
+        assert (await client.get("/api/v1/books/")).status_code == status.HTTP_200_OK
+        assert (await client.get("/api/v1/books/")).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert (await client.post("/api/v1/books/")).status_code == status.HTTP_200_OK
+        assert (await client.get("/health/db")).status_code == status.HTTP_200_OK
+
+        # Известный ключ получает свое ведро, неизвестный считается по IP
+        assert (await client.get("/api/v1/books/1", headers={"X-API-Key": "secret-key"})).status_code == 200
+        assert (await client.get("/api/v1/books/1", headers={"X-API-Key": "other-key"})).status_code == 429
+
+    async with make_client(middleware, ip="10.0.0.2") as client:
+        assert (await client.get("/api/v1/books/1")).status_code == status.HTTP_200_OK
+
+
+# Тест на ограничение одновременных запросов клиента: лишний запрос сразу получает 429,
+# после завершения начатых запросов место освобождается
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    release = asyncio.Event()
+    middleware = RateLimitMiddleware(make_app(release), limit_settings(concurrency=2), limiter=InMemoryRateLimiter(), rules={})
+
+    async with make_client(middleware) as client:
+        slow = [asyncio.create_task(client.get("/slow")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+
+        response = await client.get("/api/v1/books/1")
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert response.headers["retry-after"] == "1"
+
+        release.set()
+        assert [response.status_code for response in await asyncio.gather(*slow)] == [200, 200]
+        assert (await client.get("/api/v1/books/1")).status_code == status.HTTP_200_OK
+        assert middleware._in_flight == {}
+
+
+# Ленты изменений (long-poll, SSE) занимают свои места: открытые потоки не блокируют обычные запросы
+@pytest.mark.asyncio
+async def test_stream_concurrency_limit():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"].endswith("/changes"):
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    settings = limit_settings(concurrency=1, stream_concurrency=2)
+    middleware = RateLimitMiddleware(app, settings, limiter=InMemoryRateLimiter(), rules={})
+    async with make_client(middleware) as client:
+        streams = [asyncio.create_task(client.get(path)) for path in ("/api/v1/books/changes", "/api/v1/seller/changes")]
+        await asyncio.sleep(0.05)
+
+        assert (await client.get("/api/v1/books/changes")).status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert (await client.get("/api/v1/books/1")).status_code == status.HTTP_200_OK
+
+        release.set()
+        assert [response.status_code for response in await asyncio.gather(*streams)] == [200, 200]
+        assert middleware._streams_in_flight == {}
+
+
+# Ошибка лимитера (например, недоступен Redis) не превращается в 500: запрос пропускается
+@pytest.mark.asyncio
+async def test_limiter_failure_fails_open():
+    class BrokenLimiter(RateLimiter):
+        async def acquire(self, key: str, rule: RateLimitRule) -> float:
+            raise ConnectionError("redis is down")
+
+    middleware = RateLimitMiddleware(make_app(asyncio.Event()), limit_settings(), limiter=BrokenLimiter(), rules=RULES)
+    errors = RATE_LIMITER_ERRORS.value(route_class="read")
+
+    async with make_client(middleware) as client:
+        assert (await client.get("/api/v1/books/1")).status_code == status.HTTP_200_OK
+    assert RATE_LIMITER_ERRORS.value(route_class="read") == errors + 1
+    assert middleware._in_flight == {}
+
+
+# Тест на пополнение ведра со временем и на вытеснение давно не обращавшихся клиентов
+@pytest.mark.asyncio
+async def test_in_memory_refill(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: now))
+    limiter = InMemoryRateLimiter(max_keys=2)
+    rule = RateLimitRule(rate=2, burst=2)
+
+    assert [await limiter.acquire("a", rule) for _ in range(3)] == [0, 0, 0.5]
+    now += 0.25
+    assert await limiter.acquire("a", rule) == 0.25
+    now += 0.5
+    assert await limiter.acquire("a", rule) == 0
+
+    await limiter.acquire("b", rule)
+    await limiter.acquire("c", rule)
+    assert list(limiter._buckets) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_redis_rate_limiter():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis выполняет Lua-скрипты через lupa
+    limiter = RedisRateLimiter(fakeredis.FakeAsyncRedis())
+    rule = RateLimitRule(rate=1, burst=2)
+
+    assert await limiter.acquire("a", rule) == 0
+    assert await limiter.acquire("a", rule) == 0
+    assert 0 < await limiter.acquire("a", rule) <= 1
+    assert await limiter.acquire("b", rule) == 0
@@ -0,0 +1,171 @@
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request, status
+from sqlalchemy import delete
+from src.configurations import database
+from src.configurations.database import (
+    PRIMARY_PIN_COOKIE,
+    READ_PINNED,
+    READ_PRIMARY,
+    READ_REPLICA,
+    Database,
+    get_async_read_session,
+    read_source,
+)
+from src.configurations.settings import get_settings
+from src.middlewares.replicas import PrimaryPinMiddleware
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.services.cache import InMemoryCache, book_cache_key, seller_cache_key
+from src.services.etag import pack_cache_entry
+
+
+# Приложение только с middleware: проверяем, что cookie ставится лишь после успешной записи
+@pytest.mark.asyncio
+async def test_primary_pin_cookie_after_write():
+    app = FastAPI()
+    app.add_middleware(PrimaryPinMiddleware, pin_seconds=5)
+
+    @app.get("/items")
+    async def read_items():
+        return []
+
+    @app.post("/items", status_code=status.HTTP_201_CREATED)
+    async def create_item():
+        return {}
+
+    @app.delete("/items")
+    async def delete_missing_item():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://127.0.0.1:8000") as client:
+        response = await client.get("/items")
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+
+        response = await client.delete("/items")
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+
+        response = await client.post("/items")
+        pin_until = float(response.cookies[PRIMARY_PIN_COOKIE])
+        assert time.time() < pin_until <= time.time() + 5.001  # В cookie время округлено до миллисекунд
+
+
+def _request_with_cookie(value, app=None):
+    headers = [(b"cookie", f"{PRIMARY_PIN_COOKIE}={value}".encode())] if value is not None else []
+    return Request({"type": "http", "headers": headers, "app": app})
+
+
+def test_is_pinned_to_primary():
+    request_with_cookie = _request_with_cookie
+
+    assert database._is_pinned_to_primary(request_with_cookie(time.time() + 10))
+    assert not database._is_pinned_to_primary(request_with_cookie(time.time() - 10))
+    assert not database._is_pinned_to_primary(request_with_cookie("garbage"))
+    assert not database._is_pinned_to_primary(request_with_cookie(None))
+
+
+# Движки реплик создаются без подключения к БД, поэтому проверяем выбор реплики на "фальшивых" хостах
+def test_pick_replica(monkeypatch):
+    url = "postgresql+asyncpg://user:pass@{}:5432/db"
+    settings = get_settings().model_copy()
+    registry = Database(url.format("primary"), [url.format("replica-1"), url.format("replica-2")], settings)
+    assert list(registry.engines) == ["primary", "replica1", "replica2"]
+
+    monkeypatch.setattr(settings, "db_replica_strategy", "round_robin")
+    hosts = [registry.read_session_factory().kw["bind"].url.host for _ in range(4)]
+    assert sorted(hosts) == ["replica-1", "replica-1", "replica-2", "replica-2"]
+    assert hosts[0] != hosts[1]
+
+    monkeypatch.setattr(settings, "db_replica_strategy", "least_connections")
+    assert registry.read_session_factory().kw["bind"].url.host == "replica-1"
+
+    # Клиент, который недавно писал, и приложение без реплик читают с основной базы
+    assert registry.read_session_factory(pinned=True) is registry.session_factory
+    primary_only = Database(url.format("primary"))
+    assert primary_only.read_session_factory() is primary_only.session_factory
+
+
+# Сессия чтения помечает источник: реплика, основная база или основная база для клиента с cookie
+@pytest.mark.asyncio
+async def test_read_source():
+    url = "postgresql+asyncpg://user:pass@{}:5432/db"
+    app = FastAPI()
+
+    async def source_for(cookie):
+        sessions = get_async_read_session(_request_with_cookie(cookie, app))
+        source = read_source(await anext(sessions))
+        await sessions.aclose()
+        return source
+
+    async with Database(url.format("primary"), [url.format("replica-1")]) as app.state.database:
+        assert await source_for(None) == READ_REPLICA
+        assert await source_for(time.time() + 10) == READ_PINNED
+    async with Database(url.format("primary")) as app.state.database:
+        assert await source_for(None) == READ_PRIMARY
+
+
+# Клиент с read-your-writes читает мимо кэша, а промах при чтении с реплики заполняет кэш с основной базы
+@pytest.mark.asyncio
+async def test_cache_by_read_source(db_session, async_client, test_cache):
+    seller = Seller(first_name="Ivan", last_name="Goncharov", e_mail="goncharov@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+    book = Book(author="Goncharov", title="Oblomov", year=1859, pages=500, seller_id=seller.id)
+    db_session.add(book)
+    await db_session.flush()
+    key = book_cache_key(book.id)
+
+    try:
+        db_session.info["read_source"] = READ_REPLICA
+        response = await async_client.get(f"/api/v1/books/{book.id}")
+        assert response.json()["title"] == "Oblomov"
+        assert await test_cache.get(key) is not None
+
+        await test_cache.set(key, pack_cache_entry('"stale"', b'{"title": "stale"}'))
+        db_session.info["read_source"] = READ_PINNED
+        response = await async_client.get(f"/api/v1/books/{book.id}")
+        assert response.json()["title"] == "Oblomov"
+    finally:
+        del db_session.info["read_source"]
+
+    response = await async_client.get(f"/api/v1/books/{book.id}")
+    assert response.json()["title"] == "Oblomov"
+    assert await test_cache.get(key) is not None
+
+
+# Приложение с настроенной репликой (та же тестовая база под вторым именем): первый GET читает с основной
+# базы и заполняет кэш, второй отдается из кэша. Данные коммитятся, поэтому удаляются в конце теста.
+@pytest.mark.asyncio
+async def test_replica_cache_hit(test_database, test_settings):
+    from src.main import create_app
+
+    url = test_settings.database_test_url
+    cache = InMemoryCache(ttl=60, max_entries=100)
+    async with Database(url, [url], settings=test_settings) as replicated:
+        async with replicated.session_factory() as session, session.begin():
+            seller = Seller(first_name="Ivan", last_name="Turgenev", e_mail="turgenev@replicas.ru", password="secret")
+            session.add(seller)
+            await session.flush()
+            book = Book(author="Turgenev", title="Mumu", year=1854, pages=100, seller_id=seller.id)
+            session.add(book)
+            await session.flush()
+            seller_id, book_id = seller.id, book.id
+
+        try:
+            transport = httpx.ASGITransport(app=create_app(database=replicated, cache=cache))
+            async with httpx.AsyncClient(transport=transport, base_url="http://127.0.0.1:8000") as client:
+                for path, key in ((f"/api/v1/books/{book_id}", book_cache_key(book_id)),
+                                  (f"/api/v1/seller/{seller_id}", seller_cache_key(seller_id))):
+                    first = await client.get(path)
+                    assert await cache.get(key) is not None
+                    hits = cache.stats.hits
+                    second = await client.get(path)
+                    assert second.status_code == status.HTTP_200_OK
+                    assert second.content == first.content
+                    assert cache.stats.hits == hits + 1
+        finally:
+            async with replicated.session_factory() as session, session.begin():
+                await session.execute(delete(Seller).where(Seller.id == seller_id))
@@ -1,5 +1,8 @@
+import json
+
 import pytest
 from fastapi import status
+from src.models.books import Book
 from src.models.sellers import Seller
 
 
@@ -47,6 +50,27 @@ async def test_get_all_sellers(async_client, db_session):
     assert "bob@example.com" in emails
 
 
+# Тест для GET /api/v1/seller/ – постраничная выдача по курсору
+@pytest.mark.asyncio
+async def test_get_all_sellers_pagination(async_client, db_session):
+    sellers = [
+        Seller(first_name=f"Name{i}", last_name="Page", e_mail=f"page{i}@example.com", password="secret")
+        for i in range(3)
+    ]
+    db_session.add_all(sellers)
+    await db_session.flush()
+
+    response = await async_client.get("/api/v1/seller/", params={"limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [s["id"] for s in data["sellers"]] == [sellers[0].id, sellers[1].id]
+
+    response = await async_client.get("/api/v1/seller/", params={"limit": 2, "cursor": data["next_cursor"]})
+    data = response.json()
+    assert [s["id"] for s in data["sellers"]] == [sellers[2].id]
+    assert data["next_cursor"] is None
+
+
 # Тест для GET /api/v1/seller/{seller_id} – получение конкретного продавца с книгами
 @pytest.mark.asyncio
 async def test_get_single_seller(async_client, db_session):
@@ -68,6 +92,58 @@ async def test_get_single_seller(async_client, db_session):
     assert isinstance(result["books"], list)
 
 
+# Тест на карточку продавца с большим каталогом: встроены только первые книги, остальные - постранично
+@pytest.mark.asyncio
+async def test_seller_books_pagination(async_client, db_session, test_settings, monkeypatch):
+    monkeypatch.setattr(test_settings, "seller_detail_books", 2)
+    seller = Seller(first_name="Dan", last_name="Brown", e_mail="dan@example.com", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+    db_session.add_all([Book(title=f"Book {i}", author="Author", year=2020, pages=100, seller_id=seller.id) for i in range(5)])
+    await db_session.flush()
+
+    result = (await async_client.get(f"/api/v1/seller/{seller.id}")).json()
+    assert [book["title"] for book in result["books"]] == ["Book 0", "Book 1"]
+    assert result["books_total"] == 5
+
+    titles, cursor = [], result["books_next_cursor"]
+    while cursor:
+        response = await async_client.get(f"/api/v1/seller/{seller.id}/books", params={"limit": 2, "cursor": cursor})
+        assert response.status_code == status.HTTP_200_OK
+        titles += [book["title"] for book in response.json()["books"]]
+        cursor = response.json()["next_cursor"]
+    assert titles == ["Book 2", "Book 3", "Book 4"]
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/books")
+    assert len(response.json()["books"]) == 5
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/books", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await async_client.get("/api/v1/seller/0/books")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# Тест для GET /api/v1/seller/{seller_id}/books/export – выгрузка книг только одного продавца
+@pytest.mark.asyncio
+async def test_export_seller_books(async_client, db_session):
+    seller = Seller(first_name="Frank", last_name="Green", e_mail="frank@example.com", password="secret")
+    other_seller = Seller(first_name="Grace", last_name="Blue", e_mail="grace@example.com", password="secret")
+    db_session.add_all([seller, other_seller])
+    await db_session.flush()
+
+    book = Book(author="Frank", title="Own Book", year=2022, pages=120, seller_id=seller.id)
+    other_book = Book(author="Grace", title="Foreign Book", year=2023, pages=220, seller_id=other_seller.id)
+    db_session.add_all([book, other_book])
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/books/export")
+    assert response.status_code == status.HTTP_200_OK
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [book.id]
+
+    response = await async_client.get(f"/api/v1/seller/{other_seller.id + 1}/books/export")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 # Тест для PUT /api/v1/seller/{seller_id} – обновление продавца (без изменения книг и пароля)
 @pytest.mark.asyncio
 async def test_update_seller(async_client, db_session):
@@ -91,6 +167,12 @@ async def test_update_seller(async_client, db_session):
     assert result["last_name"] == "Brown"
     assert result["e_mail"] == "dave.brown@example.com"
 
+    # Email другого продавца занять нельзя. Ошибка откатывает транзакцию, поэтому проверка - последняя.
+    db_session.add(Seller(first_name="Ann", last_name="Brown", e_mail="ann@example.com", password="secret"))
+    await db_session.flush()
+    response = await async_client.put(f"/api/v1/seller/{seller_id}", json={**update_data, "e_mail": "ann@example.com"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 
 # Тест для DELETE /api/v1/seller/{seller_id} – удаление продавца
 @pytest.mark.asyncio
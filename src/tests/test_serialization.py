@@ -0,0 +1,72 @@
+import pytest
+from fastapi import status
+
+from src.models.books import Book
+from src.models.sellers import Seller
+from src.schemas.books import ReturnedAllbooks, ReturnedBook, ReturnedBookNoSellerId
+from src.schemas.sellers import ReturnedAllSellers, SellerDetail, SellerRead
+
+# Ответы списков и карточки продавца собираются без Pydantic, поэтому соответствие схемам
+# проверяется здесь: ответ проходит валидацию схемы и не содержит лишних полей (например, version).
+
+
+async def _seller_with_books(db_session, count: int) -> Seller:
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="contract@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    db_session.add_all(
+        Book(author="Pushkin", title=f"Book {i}", year=2020 + i, pages=100 + i, seller_id=seller.id) for i in range(count)
+    )
+    await db_session.flush()
+    return seller
+
+
+def _assert_fields(items: list[dict], schema) -> None:
+    assert items
+    for item in items:
+        assert set(item) == set(schema.model_fields)
+
+
+# Тест на соответствие GET /api/v1/books/ схеме ReturnedAllbooks
+@pytest.mark.asyncio
+async def test_books_page_matches_schema(db_session, async_client):
+    seller = await _seller_with_books(db_session, 3)
+
+    response = await async_client.get("/api/v1/books/", params={"seller_id": seller.id, "limit": 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/json"
+
+    page = ReturnedAllbooks.model_validate_json(response.content)
+    assert page.next_cursor is not None
+    assert page.model_dump() == response.json()
+    _assert_fields(response.json()["books"], ReturnedBook)
+
+
+# Тест на соответствие GET /api/v1/seller/ схеме ReturnedAllSellers
+@pytest.mark.asyncio
+async def test_sellers_page_matches_schema(db_session, async_client):
+    await _seller_with_books(db_session, 0)
+
+    response = await async_client.get("/api/v1/seller/")
+    assert response.status_code == status.HTTP_200_OK
+
+    page = ReturnedAllSellers.model_validate_json(response.content)
+    assert page.model_dump() == response.json()
+    _assert_fields(response.json()["sellers"], SellerRead)
+
+
+# Тест на соответствие GET /api/v1/seller/{id} схеме SellerDetail - и из БД, и из кэша
+@pytest.mark.asyncio
+async def test_seller_detail_matches_schema(db_session, async_client):
+    seller = await _seller_with_books(db_session, 3)
+
+    for _ in range(2):
+        response = await async_client.get(f"/api/v1/seller/{seller.id}")
+        assert response.status_code == status.HTTP_200_OK
+
+        detail = SellerDetail.model_validate_json(response.content)
+        assert detail.model_dump() == response.json()
+        assert [book.title for book in detail.books] == ["Book 0", "Book 1", "Book 2"]
+        assert set(response.json()) == set(SellerDetail.model_fields)
+        _assert_fields(response.json()["books"], ReturnedBookNoSellerId)
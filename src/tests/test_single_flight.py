@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from src.services.single_flight import SINGLE_FLIGHT_CALLS, SingleFlight
+
+
+def _calls(route: str) -> tuple[float, float]:
+    return SINGLE_FLIGHT_CALLS.value(route=route, role="leader"), SINGLE_FLIGHT_CALLS.value(route=route, role="coalesced")
+
+
+# Тест на склейку: параллельные вызовы с одним ключом выполняют загрузку один раз
+@pytest.mark.asyncio
+async def test_single_flight_coalesces():
+    flights = SingleFlight("test_coalesce")
+    loads = []
+
+    async def load(key):
+        loads.append(key)
+        await asyncio.sleep(0.05)
+        return f"result-{key}"
+
+    results = await asyncio.gather(*(flights.do(key, lambda key=key: load(key)) for key in (1, 1, 1, 2)))
+    assert results == ["result-1", "result-1", "result-1", "result-2"]
+    assert loads == [1, 2]
+    assert _calls("test_coalesce") == (2, 2)
+
+    # Завершенная загрузка не переиспользуется
+    assert await flights.do(1, lambda: load(1)) == "result-1"
+    assert loads == [1, 2, 1]
+
+
+# Тест на ошибки и отмену: ошибка отдается всем ожидающим, а при отмене первого запроса
+# ожидающий выполняет загрузку сам
+@pytest.mark.asyncio
+async def test_single_flight_errors_and_cancel():
+    flights = SingleFlight("test_errors")
+
+    async def not_found():
+        await asyncio.sleep(0.05)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    results = await asyncio.gather(flights.do(1, not_found), flights.do(1, not_found), return_exceptions=True)
+    assert [result.status_code for result in results] == [404, 404]
+
+    leader = asyncio.create_task(flights.do(2, lambda: asyncio.sleep(10, result="leader")))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do(2, lambda: asyncio.sleep(0, result="follower")))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await follower == "follower"
+    assert leader.cancelled()
+
+
+# Тест на ручку: одинаковые параллельные запросы списка получают одинаковый ответ
+@pytest.mark.asyncio
+async def test_concurrent_list_requests(async_client):
+    before = sum(_calls("get_all_books"))
+    responses = await asyncio.gather(*(async_client.get("/api/v1/books/", params={"limit": 5}) for _ in range(5)))
+
+    assert {response.status_code for response in responses} == {status.HTTP_200_OK}
+    assert len({response.content for response in responses}) == 1
+    assert len({response.headers["etag"] for response in responses}) == 1
+    assert sum(_calls("get_all_books")) - before == 5
@@ -0,0 +1,115 @@
+import pytest
+from fastapi import status
+
+from sqlalchemy import func, select, text
+
+from src.models.jobs import Job
+from src.models.sellers import Seller
+from src.services.stats import GLOBAL_STATS_REFRESH, rebuild_book_stats, refresh_global_stats
+
+
+async def _create_book(async_client, seller_id: int, author: str, year: int, pages: int) -> int:
+    data = {"title": "Book", "author": author, "year": year, "count_pages": pages, "seller_id": seller_id}
+    response = await async_client.post("/api/v1/books/", json=data)
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.json()["id"]
+
+
+# Тест на инкрементальное обновление статистики продавца всеми изменяющими ручками
+@pytest.mark.asyncio
+async def test_seller_stats(db_session, async_client):
+    seller = Seller(first_name="Ivan", last_name="Ivanov", e_mail="stats@mail.ru", password="secret")
+    db_session.add(seller)
+    await db_session.flush()
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"seller_id": seller.id, "book_count": 0, "total_pages": 0, "years": [], "top_authors": []}
+
+    first = await _create_book(async_client, seller.id, "Pushkin", 2021, 100)
+    second = await _create_book(async_client, seller.id, "Pushkin", 2022, 200)
+    third = await _create_book(async_client, seller.id, "Tolstoy", 2022, 300)
+
+    book = {"title": "Book", "author": "Gogol", "year": 2023, "pages": 50}
+    response = await async_client.put(f"/api/v1/books/{first}", json=book)
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.delete(f"/api/v1/books/{third}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    bulk = [{"title": "Bulk", "author": "Tolstoy", "year": 2022, "count_pages": 10, "seller_id": seller.id}] * 2
+    response = await async_client.post("/api/v1/books/bulk", json=bulk)
+    assert response.status_code == status.HTTP_201_CREATED
+    bulk_ids = [result["id"] for result in response.json()["results"]]
+    response = await async_client.put("/api/v1/books/bulk", json=[{"id": second, **book, "year": 2021}])
+    assert response.status_code == status.HTTP_200_OK
+    response = await async_client.request("DELETE", "/api/v1/books/bulk", json=bulk_ids[:1])
+    assert response.status_code == status.HTTP_200_OK
+
+    # Остались: Gogol 2023 (50 стр.), Gogol 2021 (50 стр.), Tolstoy 2022 (10 стр.)
+    expected = {
+        "seller_id": seller.id,
+        "book_count": 3,
+        "total_pages": 110,
+        "years": [{"year": 2021, "book_count": 1}, {"year": 2022, "book_count": 1}, {"year": 2023, "book_count": 1}],
+        "top_authors": [{"author": "Gogol", "book_count": 2}, {"author": "Tolstoy", "book_count": 1}],
+    }
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/stats")
+    assert response.json() == expected
+
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/stats", params={"top": 1})
+    assert response.json()["top_authors"] == [{"author": "Gogol", "book_count": 2}]
+
+    # Пересчет с нуля дает те же значения
+    await rebuild_book_stats(db_session, seller.id)
+    response = await async_client.get(f"/api/v1/seller/{seller.id}/stats")
+    assert response.json() == expected
+
+    response = await async_client.get("/api/v1/seller/0/stats")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def _queued_refreshes(db_session) -> int:
+    query = select(func.count()).select_from(Job).where(Job.kind == GLOBAL_STATS_REFRESH, text("status = 'queued'"))
+    return await db_session.scalar(query)
+
+
+# Тест на общую статистику: изменения ставят в очередь один пересчет сводки, пересчет и удаление продавца
+@pytest.mark.asyncio
+async def test_global_stats(db_session, async_client):
+    sellers = [Seller(first_name="Ivan", last_name="Ivanov", e_mail=f"global{i}@mail.ru", password="secret") for i in range(2)]
+    db_session.add_all(sellers)
+    await db_session.flush()
+
+    await _create_book(async_client, sellers[0].id, "Pushkin", 2021, 100)
+    await _create_book(async_client, sellers[1].id, "Pushkin", 2021, 150)
+    await _create_book(async_client, sellers[1].id, "Tolstoy", 2024, 200)
+    assert await _queued_refreshes(db_session) == 1
+
+    await refresh_global_stats(db_session)
+
+    expected = {
+        "book_count": 3,
+        "total_pages": 450,
+        "years": [{"year": 2021, "book_count": 2}, {"year": 2024, "book_count": 1}],
+        "top_authors": [{"author": "Pushkin", "book_count": 2}, {"author": "Tolstoy", "book_count": 1}],
+    }
+    response = await async_client.get("/api/v1/stats")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == expected
+
+    await rebuild_book_stats(db_session)
+    response = await async_client.get("/api/v1/stats")
+    assert response.json() == expected
+
+    response = await async_client.delete(f"/api/v1/seller/{sellers[1].id}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    await refresh_global_stats(db_session)
+
+    response = await async_client.get("/api/v1/stats")
+    assert response.json() == {
+        "book_count": 1,
+        "total_pages": 100,
+        "years": [{"year": 2021, "book_count": 1}],
+        "top_authors": [{"author": "Pushkin", "book_count": 1}],
+    }